@@ -1,11 +1,14 @@
 import pandas as pd
 
 from pes_match.cluster import cluster_number
+from pes_match.household import join_household_lists, load_household_lists
 from pes_match.parameters import (
     CEN_CLEAN_DATA,
+    CEN_HOUSEHOLD_LISTS,
     CLERICAL_PATH,
     OUTPUT_PATH,
     PES_CLEAN_DATA,
+    PES_HOUSEHOLD_LISTS,
     cen_variable_types,
     pes_variable_types,
 )
@@ -59,7 +62,6 @@ CROW_variables = [
     "marstat",
     "HoH",
     "Eaid",
-    "forename_list",
     "telephone",
 ]
 CROW_records_1 = CROW_records[
@@ -70,6 +72,12 @@ CROW_records_2 = CROW_records[
 ].drop_duplicates()
 CROW_records_1.columns = CROW_records_1.columns.str.replace(r"_cen$", "", regex=True)
 CROW_records_2.columns = CROW_records_2.columns.str.replace(r"_pes$", "", regex=True)
+CROW_records_1 = join_household_lists(
+    CROW_records_1, load_household_lists(CEN_HOUSEHOLD_LISTS), hh_id="hid"
+)
+CROW_records_2 = join_household_lists(
+    CROW_records_2, load_household_lists(PES_HOUSEHOLD_LISTS), hh_id="hid"
+)
 CROW_records_1["Source_Dataset"] = "cen"  # Dataset indicator
 CROW_records_2["Source_Dataset"] = "pes"  # Dataset indicator
 CROW_records_final = pd.concat([CROW_records_1, CROW_records_2], axis=0).sort_values(
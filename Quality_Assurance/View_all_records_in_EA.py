@@ -2,12 +2,14 @@ import pandas as pd
 
 from pes_match.parameters import (
     CEN_CLEAN_DATA,
+    CEN_REGISTRY,
     CLERICAL_PATH,
-    OUTPUT_PATH,
     PES_CLEAN_DATA,
+    PES_REGISTRY,
     cen_variable_types,
     pes_variable_types,
 )
+from pes_match.registry import load_registry, registry_mask
 
 # Cleaned data
 CEN = pd.read_csv(
@@ -17,17 +19,15 @@ PES = pd.read_csv(
     PES_CLEAN_DATA, dtype=pes_variable_types, iterator=False, index_col=False
 )
 
-# Add Matched Flag to all records
-matched_cen = pd.read_csv(OUTPUT_PATH + "Stage_1_All_Matches.csv")[
-    ["puid_cen"]
-].drop_duplicates()
-matched_pes = pd.read_csv(OUTPUT_PATH + "Stage_1_All_Matches.csv")[
-    ["puid_pes"]
-].drop_duplicates()
-matched_cen[["matched_cen"]] = 1
-matched_pes[["matched_pes"]] = 1
-CEN = CEN.merge(matched_cen, on="puid_cen", how="left")
-PES = PES.merge(matched_pes, on="puid_pes", how="left")
+# Add Matched Flag to all records matched in Stage 1
+cen_matched = registry_mask(
+    CEN, load_registry(CEN_REGISTRY), "puid_cen", stages=["Stage_1"]
+)
+pes_matched = registry_mask(
+    PES, load_registry(PES_REGISTRY), "puid_pes", stages=["Stage_1"]
+)
+CEN.loc[cen_matched, "matched_cen"] = 1
+PES.loc[pes_matched, "matched_pes"] = 1
 
 # Vars to view
 variables = [
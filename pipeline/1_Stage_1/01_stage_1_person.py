@@ -2,14 +2,19 @@ import os
 
 import pandas as pd
 
+from pes_match.cache import run_cached_matchkey
 from pes_match.crow import collect_conflicts, collect_uniques, save_for_crow
-from pes_match.matching import combine, run_single_matchkey
+from pes_match.household import load_household_lists
+from pes_match.matching import combine
 from pes_match.parameters import (
     CEN_CLEAN_DATA,
+    CEN_HOUSEHOLD_LISTS,
     CHECKPOINT_PATH,
     CLERICAL_PATH,
     CLERICAL_VARIABLES,
+    MATCHKEY_CACHE_PATH,
     PES_CLEAN_DATA,
+    PES_HOUSEHOLD_LISTS,
     cen_variable_types,
     pes_variable_types,
 )
@@ -35,13 +40,14 @@ mk_params = {
     "suffix_2": "_pes",
     "hh_id": "hid",
     "level": "hid",
+    "cache_path": MATCHKEY_CACHE_PATH,
 }
 
 # ---------- RUN MATCHKEYS ---------- #
-mk1 = run_single_matchkey(
+mk1 = run_cached_matchkey(
     **mk_params, variables=["forename_clean", "last_name_clean", "full_dob"]
 )
-mk2 = run_single_matchkey(**mk_params, variables=["telephone", "full_dob"])
+mk2 = run_cached_matchkey(**mk_params, variables=["telephone", "full_dob"])
 
 # Combine
 matches = combine(
@@ -70,4 +76,8 @@ save_for_crow(
     output_folder=CLERICAL_PATH + "Stage_1_CROW_Files",
     file_name="Stage_1_Matchkey_CROW_Conflicts",
     no_of_files=1,
+    household_lists={
+        "_cen": load_household_lists(CEN_HOUSEHOLD_LISTS),
+        "_pes": load_household_lists(PES_HOUSEHOLD_LISTS),
+    },
 )
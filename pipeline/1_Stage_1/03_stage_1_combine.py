@@ -2,7 +2,16 @@ import os
 
 import pandas as pd
 
-from pes_match.parameters import CHECKPOINT_PATH, OUTPUT_PATH, OUTPUT_VARIABLES
+from pes_match.parameters import (
+    CEN_CLEAN_DATA,
+    CEN_REGISTRY,
+    CHECKPOINT_PATH,
+    OUTPUT_PATH,
+    OUTPUT_VARIABLES,
+    PES_CLEAN_DATA,
+    PES_REGISTRY,
+)
+from pes_match.registry import create_registry, save_registry, update_registry
 
 if not os.path.exists(OUTPUT_PATH):
     os.makedirs(OUTPUT_PATH)
@@ -26,3 +35,14 @@ all_matches = pd.concat([df1, df2, df3]).reset_index(drop=True)
 
 # Save to output folder
 all_matches.to_csv(OUTPUT_PATH + "Stage_1_All_Matches.csv", header=True, index=False)
+
+# Record matched CEN & PES records in the registries used by later stages
+for data, registry_path, id_column in [
+    (CEN_CLEAN_DATA, CEN_REGISTRY, "puid_cen"),
+    (PES_CLEAN_DATA, PES_REGISTRY, "puid_pes"),
+]:
+    ids = pd.read_csv(data, usecols=[id_column], dtype=str, index_col=False)
+    registry = update_registry(
+        create_registry(ids[id_column]), all_matches, id_column, stage="Stage_1"
+    )
+    save_registry(registry, registry_path)
@@ -1,17 +1,24 @@
 import pandas as pd
 
+from pes_match.cache import run_cached_matchkey
 from pes_match.crow import collect_conflicts, collect_uniques, save_for_crow
-from pes_match.matching import combine, get_residuals, run_single_matchkey
+from pes_match.household import load_household_lists
+from pes_match.matching import combine
 from pes_match.parameters import (
     CEN_CLEAN_DATA,
+    CEN_HOUSEHOLD_LISTS,
+    CEN_REGISTRY,
     CHECKPOINT_PATH,
     CLERICAL_PATH,
     CLERICAL_VARIABLES,
-    OUTPUT_PATH,
+    MATCHKEY_CACHE_PATH,
     PES_CLEAN_DATA,
+    PES_HOUSEHOLD_LISTS,
+    PES_REGISTRY,
     cen_variable_types,
     pes_variable_types,
 )
+from pes_match.registry import load_registry, registry_residuals
 
 # Cleaned data
 CEN = pd.read_csv(
@@ -21,14 +28,13 @@ PES = pd.read_csv(
     PES_CLEAN_DATA, dtype=pes_variable_types, iterator=False, index_col=False
 )
 
-# Matches from previous stage
-prev_matches = pd.read_csv(
-    OUTPUT_PATH + "Stage_1_All_Matches.csv", iterator=False, index_col=False
+# Get residuals from records matched in previous stage
+CEN = registry_residuals(
+    CEN, load_registry(CEN_REGISTRY), id_column="puid_cen", stages=["Stage_1"]
+)
+PES = registry_residuals(
+    PES, load_registry(PES_REGISTRY), id_column="puid_pes", stages=["Stage_1"]
 )
-
-# Get residuals
-CEN = get_residuals(all_records=CEN, matched_records=prev_matches, id_column="puid_cen")
-PES = get_residuals(all_records=PES, matched_records=prev_matches, id_column="puid_pes")
 
 # MATCHKEY PARAMS
 mk_params = {
@@ -38,10 +44,11 @@ mk_params = {
     "suffix_2": "_pes",
     "hh_id": "hid",
     "level": "Eaid",
+    "cache_path": MATCHKEY_CACHE_PATH,
 }
 
 # ---------- RUN MATCHKEYS ---------- #
-mk1 = run_single_matchkey(
+mk1 = run_cached_matchkey(
     **mk_params, variables=["forename_clean", "middlenm_clean", "full_dob"]
 )
 
@@ -72,4 +79,8 @@ save_for_crow(
     output_folder=CLERICAL_PATH + "Stage_2_CROW_Files",
     file_name="Stage_2_Matchkey_CROW_Conflicts",
     no_of_files=1,
+    household_lists={
+        "_cen": load_household_lists(CEN_HOUSEHOLD_LISTS),
+        "_pes": load_household_lists(PES_HOUSEHOLD_LISTS),
+    },
 )
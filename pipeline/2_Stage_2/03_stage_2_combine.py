@@ -1,6 +1,13 @@
 import pandas as pd
 
-from pes_match.parameters import CHECKPOINT_PATH, OUTPUT_PATH, OUTPUT_VARIABLES
+from pes_match.parameters import (
+    CEN_REGISTRY,
+    CHECKPOINT_PATH,
+    OUTPUT_PATH,
+    OUTPUT_VARIABLES,
+    PES_REGISTRY,
+)
+from pes_match.registry import load_registry, save_registry, update_registry
 
 # Stage 2 File names
 matchkey_unique = "Stage_2_Matchkey_Unique_Matches"
@@ -27,3 +34,13 @@ all_matches = pd.concat([Stage_1_matches, Stage_2_matches])
 
 # Save to output folder
 all_matches.to_csv(OUTPUT_PATH + "Stage_2_All_Matches.csv", header=True, index=False)
+
+# Add Stage 2 matches to the registries
+for registry_path, id_column in [
+    (CEN_REGISTRY, "puid_cen"),
+    (PES_REGISTRY, "puid_pes"),
+]:
+    registry = update_registry(
+        load_registry(registry_path), Stage_2_matches, id_column, stage="Stage_2"
+    )
+    save_registry(registry, registry_path)
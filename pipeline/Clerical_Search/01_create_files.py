@@ -5,12 +5,14 @@ import pandas as pd
 
 from pes_match.parameters import (
     CEN_CLEAN_DATA,
+    CEN_REGISTRY,
     CLERICAL_PATH,
-    OUTPUT_PATH,
     PES_CLEAN_DATA,
+    PES_REGISTRY,
     cen_variable_types,
     pes_variable_types,
 )
+from pes_match.registry import load_registry, registry_mask
 
 if not os.path.exists(CLERICAL_PATH + "CLERICAL_SEARCH_DATA/"):
     os.makedirs(CLERICAL_PATH + "CLERICAL_SEARCH_DATA/")
@@ -26,18 +28,9 @@ PES = pd.read_csv(
 # Collect unique PES EAs to loop over
 PES_EA_list = PES["Eaid_pes"].drop_duplicates().tolist()
 
-# Add matched flag to all CEN & PES records
-matches = "Enter_file_name_of_all_matches.csv"
-matched_cen = pd.read_csv(OUTPUT_PATH + matches, iterator=False, index_col=False)[
-    ["puid_cen"]
-].drop_duplicates()
-matched_pes = pd.read_csv(OUTPUT_PATH + matches, iterator=False, index_col=False)[
-    ["puid_pes"]
-].drop_duplicates()
-matched_cen[["matched_cen"]] = 1
-matched_pes[["matched_pes"]] = 1
-CEN = CEN.merge(matched_cen, on="puid_cen", how="left")
-PES = PES.merge(matched_pes, on="puid_pes", how="left")
+# Add matched flag to all CEN & PES records matched up to clerical search
+CEN.loc[registry_mask(CEN, load_registry(CEN_REGISTRY), "puid_cen"), "matched_cen"] = 1
+PES.loc[registry_mask(PES, load_registry(PES_REGISTRY), "puid_pes"), "matched_pes"] = 1
 
 # Variables to view in Excel
 variables = [
@@ -1,3 +1,6 @@
+import os
+import shutil
+
 import numpy as np
 import pandas as pd
 
@@ -6,140 +9,228 @@ from pes_match.cleaning import (
     change_types,
     clean_name,
     concat,
-    derive_list,
-    n_gram,
+    n_grams,
     pad_column,
     replace_vals,
-    select,
     soundex,
 )
-from pes_match.parameters import CEN_CLEAN_DATA, DATA_PATH
+from pes_match.household import (
+    build_household_lists,
+    merge_household_lists,
+    save_household_lists,
+)
+from pes_match.parameters import (
+    CEN_CLEAN_DATA,
+    CEN_CLEAN_PARTITIONS,
+    CEN_HOUSEHOLD_LISTS,
+    DATA_PATH,
+    OUTPUT_PATH,
+)
+from pes_match.processing import (
+    cleaning_step,
+    run_cleaning,
+    stream_cleaning,
+    write_partitions,
+)
 
 # Raw data
-df = pd.read_csv(DATA_PATH + "Mock_Data_Census.csv", iterator=False, index_col=False)
+RAW_DATA = DATA_PATH + "Mock_Data_Census.csv"
+
+# Rows to clean at a time. If None, the raw data is cleaned in one go and saved
+# to CEN_CLEAN_DATA. Otherwise it is cleaned in chunks and each chunk is added
+# to CEN_CLEAN_DATA, and also to CEN_CLEAN_PARTITIONS, partitioned by district
+# (Dsid) and EA
+CHUNKSIZE = None
+
+# Chunks to clean at the same time, in separate processes (when CHUNKSIZE is set)
+PROCESSES = 4
+
+# Missing value sentinels
+STRING_MISSING = "-9"
+NUMBER_MISSING = 99
+YEAR_MISSING = 9999
+
+# Cleaning spec
+steps = []
 
 # Derive clean names
 for var in ["forename", "middlenm", "last_name"]:
-    df = clean_name(df, var)
+    steps.append(cleaning_step(clean_name, var, var + "_clean", name_column=var))
 
 # Derive full name
-df = concat(
-    df,
-    output_col="fullname",
-    sep=" ",
-    columns=["forename_clean", "middlenm_clean", "last_name_clean"],
+name_cols = ["forename_clean", "middlenm_clean", "last_name_clean"]
+steps.append(
+    cleaning_step(
+        concat, name_cols, "fullname", output_col="fullname", sep=" ", columns=name_cols
+    )
 )
 
 # Derive Alphaname
-df = alpha_name(df, input_col="fullname", output_col="alpha_name")
-
-# Replace nulls
-df = replace_vals(
-    df,
-    dic={"-9": np.NaN},
-    subset=[
-        "forename_clean",
-        "middlenm_clean",
-        "last_name_clean",
+steps.append(
+    cleaning_step(
+        alpha_name,
         "fullname",
         "alpha_name",
-    ],
-)
-
-# Collect list of clean forenames in each household
-df = derive_list(
-    df, partition_var="hid", list_var="forename_clean", output_col="forename_list"
+        input_col="fullname",
+        output_col="alpha_name",
+    )
 )
 
-# Initials
-df = n_gram(
-    df, input_col="forename_clean", output_col="forename_init", missing_value="-9", n=1
-)
-df = n_gram(
-    df,
-    input_col="last_name_clean",
-    output_col="last_name_init",
-    missing_value="-9",
-    n=1,
-)
+# Replace nulls
+for var in name_cols + ["fullname", "alpha_name"]:
+    steps.append(
+        cleaning_step(replace_vals, var, var, dic={STRING_MISSING: np.NaN}, subset=var)
+    )
 
-# Trigrams
-df = n_gram(
-    df, input_col="forename_clean", output_col="forename_tri", missing_value="-9", n=3
-)
-df = n_gram(
-    df, input_col="last_name_clean", output_col="last_name_tri", missing_value="-9", n=3
-)
-
-# Soundex
-df = soundex(
-    df, input_col="forename_clean", output_col="forename_sdx", missing_value="-9"
-)
-df = soundex(
-    df, input_col="last_name_clean", output_col="last_name_sdx", missing_value="-9"
-)
+# Initials, trigrams & soundex
+for var in ["forename", "last_name"]:
+    grams = [(1, var + "_init"), (3, var + "_tri")]
+    steps.append(
+        cleaning_step(
+            n_grams,
+            var + "_clean",
+            [output_col for _, output_col in grams],
+            input_col=var + "_clean",
+            grams=grams,
+            missing_value=STRING_MISSING,
+        )
+    )
+    steps.append(
+        cleaning_step(
+            soundex,
+            var + "_clean",
+            var + "_sdx",
+            input_col=var + "_clean",
+            output_col=var + "_sdx",
+            missing_value=STRING_MISSING,
+        )
+    )
 
 # Clean Day, Month, Age & Derive full_dob
-df = replace_vals(df, dic={99: np.NaN}, subset=["month", "age"])
-df = replace_vals(df, dic={9999: np.NaN}, subset=["year"])
-df = change_types(
-    change_types(df, input_cols=["year", "month", "age"], types="int"),
-    input_cols=["year", "month", "age"],
-    types="str",
+for var, missing in [
+    ("month", NUMBER_MISSING),
+    ("age", NUMBER_MISSING),
+    ("year", YEAR_MISSING),
+]:
+    steps.append(
+        cleaning_step(replace_vals, var, var, dic={missing: np.NaN}, subset=var)
+    )
+    for types in ["int", "str"]:
+        steps.append(cleaning_step(change_types, var, var, input_cols=var, types=types))
+steps.append(
+    cleaning_step(
+        pad_column, "month", "month", input_col="month", output_col="month", length=2
+    )
+)
+steps.append(
+    cleaning_step(
+        concat,
+        ["month", "year"],
+        "full_dob",
+        output_col="full_dob",
+        sep="/",
+        columns=["month", "year"],
+    )
 )
-df = pad_column(df, input_col="month", output_col="month", length=2)
-df = concat(df, output_col="full_dob", sep="/", columns=["month", "year"])
 
 # Clean other matching variables
-df = change_types(
-    replace_vals(df, dic={99: np.NaN}, subset=["marstat"]),
-    input_cols="marstat",
-    types=np.int64,
-)
-df = change_types(
-    replace_vals(df, dic={99: np.NaN}, subset=["relationship"]),
-    input_cols="relationship",
-    types=np.int64,
-)
-df = change_types(
-    replace_vals(df, dic={99: np.NaN}, subset=["telephone"]),
-    input_cols="telephone",
-    types=np.int64,
-)
+for var in ["marstat", "relationship", "telephone"]:
+    steps.append(
+        cleaning_step(replace_vals, var, var, dic={NUMBER_MISSING: np.NaN}, subset=var)
+    )
+    steps.append(cleaning_step(change_types, var, var, input_cols=var, types=np.int64))
 
 # Selected columns
-df = select(
-    df,
-    columns=[
-        "hid",
-        "puid",
-        "month",
-        "year",
-        "age",
-        "HoH",
-        "marstat",
-        "relationship",
-        "sex",
-        "telephone",
-        "Eaid",
-        "forename_clean",
-        "middlenm_clean",
-        "last_name_clean",
-        "fullname",
-        "alpha_name",
-        "forename_init",
-        "last_name_init",
-        "forename_tri",
-        "last_name_tri",
-        "forename_sdx",
-        "last_name_sdx",
-        "full_dob",
-        "forename_list",
-    ],
-)
+columns = [
+    "hid",
+    "puid",
+    "month",
+    "year",
+    "age",
+    "HoH",
+    "marstat",
+    "relationship",
+    "sex",
+    "telephone",
+    "Eaid",
+    "forename_clean",
+    "middlenm_clean",
+    "last_name_clean",
+    "fullname",
+    "alpha_name",
+    "forename_init",
+    "last_name_init",
+    "forename_tri",
+    "last_name_tri",
+    "forename_sdx",
+    "last_name_sdx",
+    "full_dob",
+]
+
+# Cleaning only runs when this script is run, not when it is imported by
+# the processes that clean each chunk
+if __name__ == "__main__":
+    timings = {}
+    if CHUNKSIZE is None:
+        df = pd.read_csv(RAW_DATA, iterator=False, index_col=False)
+        df = run_cleaning(df, steps, columns, timings=timings)
+
+        # Collect list of clean forenames in each household, stored once per household
+        household_lists = build_household_lists(
+            df, hh_id="hid", list_var="forename_clean", output_col="forename_list"
+        )
+
+        # Suffixes
+        df = df.add_suffix("_cen")
+
+        # Save
+        df.to_csv(CEN_CLEAN_DATA, header=True, index=False)
+    else:
+        # Partitions from previous runs are replaced, not added to
+        shutil.rmtree(CEN_CLEAN_PARTITIONS, ignore_errors=True)
+        chunks = stream_cleaning(
+            RAW_DATA,
+            steps,
+            columns + ["Dsid"],
+            chunksize=CHUNKSIZE,
+            hh_id="hid",
+            processes=PROCESSES,
+            timings=timings,
+            index_col=False,
+            dtype={var: str for var in ["forename", "middlenm", "last_name"]},
+        )
+
+        # Chunks are cleaned in parallel, but returned and written in order
+        household_lists = []
+        with open(CEN_CLEAN_DATA, "w", newline="") as file:
+            for i, df in enumerate(chunks):
+                household_lists.append(
+                    build_household_lists(
+                        df,
+                        hh_id="hid",
+                        list_var="forename_clean",
+                        output_col="forename_list",
+                    )
+                )
+                df = df.add_suffix("_cen")
+
+                # Later stages read the cleaned data from one file
+                df.drop(columns="Dsid_cen").to_csv(file, header=i == 0, index=False)
+                write_partitions(
+                    df,
+                    CEN_CLEAN_PARTITIONS,
+                    partition_cols=["Dsid_cen", "Eaid_cen"],
+                    name=f"part-{i:05d}",
+                )
+        household_lists = merge_household_lists(household_lists)
 
-# Suffixes
-df = df.add_suffix("_cen")
+    save_household_lists(household_lists, CEN_HOUSEHOLD_LISTS)
 
-# Save
-df.to_csv(CEN_CLEAN_DATA, header=True, index=False)
+    # Save time spent in each cleaning function, slowest first. Times of
+    # chunks cleaned in parallel processes are added together
+    if not os.path.exists(OUTPUT_PATH):
+        os.makedirs(OUTPUT_PATH)
+    timings = pd.Series(timings, name="seconds").rename_axis("function")
+    timings.sort_values(ascending=False).to_csv(
+        OUTPUT_PATH + "Census_Cleaning_Timings.csv", header=True
+    )
@@ -1,3 +1,5 @@
+import os
+
 import numpy as np
 import pandas as pd
 
@@ -6,110 +8,123 @@ from pes_match.cleaning import (
     change_types,
     clean_name,
     concat,
-    derive_list,
-    n_gram,
+    n_grams,
     pad_column,
     replace_vals,
-    select,
     soundex,
 )
-from pes_match.parameters import DATA_PATH, PES_CLEAN_DATA
+from pes_match.household import build_household_lists, save_household_lists
+from pes_match.parameters import (
+    DATA_PATH,
+    OUTPUT_PATH,
+    PES_CLEAN_DATA,
+    PES_HOUSEHOLD_LISTS,
+)
+from pes_match.processing import cleaning_step, run_cleaning
 
 # Raw data
 df = pd.read_csv(DATA_PATH + "Mock_Data_Pes.csv", iterator=False, index_col=False)
 
+# Missing value sentinels
+STRING_MISSING = "-8"
+NUMBER_MISSING = 88
+YEAR_MISSING = 8888
+
+# Cleaning spec
+steps = []
+
 # Derive clean names
 for var in ["forename", "middlenm", "last_name"]:
-    df = clean_name(df, var)
+    steps.append(cleaning_step(clean_name, var, var + "_clean", name_column=var))
 
 # Derive full name
-df = concat(
-    df,
-    output_col="fullname",
-    sep=" ",
-    columns=["forename_clean", "middlenm_clean", "last_name_clean"],
+name_cols = ["forename_clean", "middlenm_clean", "last_name_clean"]
+steps.append(
+    cleaning_step(
+        concat, name_cols, "fullname", output_col="fullname", sep=" ", columns=name_cols
+    )
 )
 
 # Derive Alphaname
-df = alpha_name(df, input_col="fullname", output_col="alpha_name")
-
-# Replace nulls
-df = replace_vals(
-    df,
-    dic={"-8": np.NaN},
-    subset=[
-        "forename_clean",
-        "middlenm_clean",
-        "last_name_clean",
+steps.append(
+    cleaning_step(
+        alpha_name,
         "fullname",
         "alpha_name",
-    ],
-)
-
-# Collect list of clean forenames in each household
-df = derive_list(
-    df, partition_var="hid", list_var="forename_clean", output_col="forename_list"
-)
-
-# Initials
-df = n_gram(
-    df, input_col="forename_clean", output_col="forename_init", missing_value="-8", n=1
-)
-df = n_gram(
-    df,
-    input_col="last_name_clean",
-    output_col="last_name_init",
-    missing_value="-8",
-    n=1,
+        input_col="fullname",
+        output_col="alpha_name",
+    )
 )
 
-# Trigrams
-df = n_gram(
-    df, input_col="forename_clean", output_col="forename_tri", missing_value="-8", n=3
-)
-df = n_gram(
-    df, input_col="last_name_clean", output_col="last_name_tri", missing_value="-8", n=3
-)
+# Replace nulls
+for var in name_cols + ["fullname", "alpha_name"]:
+    steps.append(
+        cleaning_step(replace_vals, var, var, dic={STRING_MISSING: np.NaN}, subset=var)
+    )
 
-# Soundex
-df = soundex(
-    df, input_col="forename_clean", output_col="forename_sdx", missing_value="-8"
-)
-df = soundex(
-    df, input_col="last_name_clean", output_col="last_name_sdx", missing_value="-8"
-)
+# Initials, trigrams & soundex
+for var in ["forename", "last_name"]:
+    grams = [(1, var + "_init"), (3, var + "_tri")]
+    steps.append(
+        cleaning_step(
+            n_grams,
+            var + "_clean",
+            [output_col for _, output_col in grams],
+            input_col=var + "_clean",
+            grams=grams,
+            missing_value=STRING_MISSING,
+        )
+    )
+    steps.append(
+        cleaning_step(
+            soundex,
+            var + "_clean",
+            var + "_sdx",
+            input_col=var + "_clean",
+            output_col=var + "_sdx",
+            missing_value=STRING_MISSING,
+        )
+    )
 
 # Clean Day, Month, Age & Derive full_dob
-df = replace_vals(df, dic={88: np.NaN}, subset=["month", "age"])
-df = replace_vals(df, dic={8888: np.NaN}, subset=["year"])
-df = change_types(
-    change_types(df, input_cols=["year", "month", "age"], types="int"),
-    input_cols=["year", "month", "age"],
-    types="str",
+for var, missing in [
+    ("month", NUMBER_MISSING),
+    ("age", NUMBER_MISSING),
+    ("year", YEAR_MISSING),
+]:
+    steps.append(
+        cleaning_step(replace_vals, var, var, dic={missing: np.NaN}, subset=var)
+    )
+    for types in ["int", "str"]:
+        steps.append(cleaning_step(change_types, var, var, input_cols=var, types=types))
+steps.append(
+    cleaning_step(
+        pad_column, "month", "month", input_col="month", output_col="month", length=2
+    )
+)
+steps.append(
+    cleaning_step(
+        concat,
+        ["month", "year"],
+        "full_dob",
+        output_col="full_dob",
+        sep="/",
+        columns=["month", "year"],
+    )
 )
-df = pad_column(df, input_col="month", output_col="month", length=2)
-df = concat(df, output_col="full_dob", sep="/", columns=["month", "year"])
 
 # Clean other matching variables
-df = change_types(
-    replace_vals(df, dic={88: np.NaN}, subset=["marstat"]),
-    input_cols="marstat",
-    types=np.int64,
-)
-df = change_types(
-    replace_vals(df, dic={88: np.NaN}, subset=["relationship"]),
-    input_cols="relationship",
-    types=np.int64,
-)
-df = change_types(
-    replace_vals(df, dic={88: np.NaN}, subset=["telephone"]),
-    input_cols="telephone",
-    types=np.int64,
-)
+for var in ["marstat", "relationship", "telephone"]:
+    steps.append(
+        cleaning_step(replace_vals, var, var, dic={NUMBER_MISSING: np.NaN}, subset=var)
+    )
+    steps.append(cleaning_step(change_types, var, var, input_cols=var, types=np.int64))
 
 # Selected columns
-df = select(
+timings = {}
+df = run_cleaning(
     df,
+    steps,
     columns=[
         "hid",
         "puid",
@@ -134,12 +149,26 @@ df = select(
         "forename_sdx",
         "last_name_sdx",
         "full_dob",
-        "forename_list",
     ],
+    timings=timings,
 )
 
+# Collect list of clean forenames in each household, stored once per household
+household_lists = build_household_lists(
+    df, hh_id="hid", list_var="forename_clean", output_col="forename_list"
+)
+save_household_lists(household_lists, PES_HOUSEHOLD_LISTS)
+
 # Suffixes
 df = df.add_suffix("_pes")
 
 # Save
 df.to_csv(PES_CLEAN_DATA, header=True, index=False)
+
+# Save time spent in each cleaning function, slowest first
+if not os.path.exists(OUTPUT_PATH):
+    os.makedirs(OUTPUT_PATH)
+timings = pd.Series(timings, name="seconds").rename_axis("function")
+timings.sort_values(ascending=False).to_csv(
+    OUTPUT_PATH + "PES_Cleaning_Timings.csv", header=True
+)
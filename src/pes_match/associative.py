@@ -0,0 +1,336 @@
+import networkx as nx
+import numpy as np
+import pandas as pd
+
+from pes_match.crow import collect_uniques
+from pes_match.matching import combine, run_single_matchkey
+
+
+def assoc_candidates(df1, df2, suffix_1, suffix_2, matches, person_id, hh_id):
+    """
+    Associative Matching Function. Equivalent to get_assoc_candidates, but
+    household pairs are encoded as integer keys and residuals are found
+    using boolean masks, rather than by merging. Unmatched person records
+    are paired with every household that their own household has been
+    matched to, using sorted offsets into the list of household pairs.
+
+    Parameters
+    ----------
+    df1: pandas.DataFrame
+        The first dataframe being matched - must contain a person_id and hh_id
+    df2: pandas.DataFrame
+        The second dataframe being matched - must contain a person_id and hh_id
+    suffix_1: str
+        Suffix used for columns in the first dataframe
+    suffix_2: str
+        Suffix used for columns in the second dataframe
+    matches: pandas.DataFrame
+        All unique person matches that will be used to make additional
+        associative matches. This DataFrame should contain two person
+        ID columns only
+    person_id: str
+        Name of person ID column (without suffixes)
+    hh_id: str
+        Name of household ID column (without suffixes)
+
+    Returns
+    -------
+    df1: pandas.DataFrame
+        Unmatched person records from df1 with additional household ID column from df2
+    df2: pandas.DataFrame
+        Unmatched person records from df2 with additional household ID column from df1
+
+    See Also
+    --------
+    get_assoc_candidates
+    run_associative_rounds
+
+    Example
+    --------
+    >>> import pandas as pd
+    >>> df1 = pd.DataFrame({'puid_1': [1, 2, 3, 4, 5],
+    ...                     'hhid_1': [1, 1, 1, 1, 1],
+    ...                     'name_1': ['CHARLIE', 'JOHN', 'STEVE',
+    ...                                'SAM', 'PAUL']})
+    >>> df2 = pd.DataFrame({'puid_2': [21, 22, 23, 24, 25],
+    ...                     'hhid_2': [2, 2, 2, 2, 2],
+    ...                     'name_2': ['CHARLES', 'JON',
+    ...                                'STEPHEN', 'SAMANTHA', 'PAUL']})
+    >>> matches = pd.DataFrame({'puid_1': [1, 5],
+    ...                         'puid_2': [21, 25]})
+    >>> df1, df2 = assoc_candidates(df1, df2, suffix_1='_1', suffix_2='_2',
+    ...                             matches=matches, person_id='puid',
+    ...                             hh_id='hhid')
+    >>> df1.head(n=5)
+       puid_1  hhid_1 name_1  hhid_2
+    0       2       1   JOHN       2
+    1       3       1  STEVE       2
+    2       4       1    SAM       2
+    >>> df2.head(n=5)
+       puid_2  hhid_2    name_2  hhid_1
+    0      22       2       JON       1
+    1      23       2   STEPHEN       1
+    2      24       2  SAMANTHA       1
+    """
+    df1 = df1.drop_duplicates([person_id + suffix_1]).reset_index(drop=True)
+    df2 = df2.drop_duplicates([person_id + suffix_2]).reset_index(drop=True)
+    households = _encode_households(
+        df1, df2, suffix_1, suffix_2, matches, person_id, hh_id
+    )
+    matched_1 = df1[person_id + suffix_1].isin(matches[person_id + suffix_1])
+    matched_2 = df2[person_id + suffix_2].isin(matches[person_id + suffix_2])
+    return _candidates_from_pairs(
+        df1,
+        df2,
+        suffix_1,
+        suffix_2,
+        hh_id,
+        households,
+        households["pairs"],
+        ~matched_1.to_numpy(),
+        ~matched_2.to_numpy(),
+    )
+
+
+def run_associative_rounds(
+    df1,
+    df2,
+    suffix_1,
+    suffix_2,
+    matches,
+    person_id,
+    hh_id,
+    matchkeys,
+    keep,
+    match_type,
+    max_rounds=10,
+):
+    """
+    Makes associative matches in repeated rounds until no new unique matches
+    can be made (or max_rounds is reached). In each round, the associative
+    matchkeys are run in order on the associative candidates that remain
+    unmatched, and the unique matches from each matchkey are accepted before
+    the next matchkey is run. Accepting a match removes its records from the
+    candidates, which can resolve conflicts for other matchkeys in the next
+    round. A matchkey is only rerun on households that are connected (via
+    household pairs) to a household that has received a new match since that
+    matchkey was last run.
+
+    This uses a different uniqueness rule from combining every associative
+    matchkey and then applying collect_uniques, as in the associative stage
+    scripts. There, a record matched to different records by two matchkeys
+    is a conflict and is not matched. Here, a unique match from an earlier
+    matchkey is accepted before later matchkeys run, so the later matchkey
+    cannot conflict with it. The two can therefore make different matches
+    from the same input (see the example below).
+
+    Parameters
+    ----------
+    df1: pandas.DataFrame
+        The first dataframe being matched - must contain a person_id and hh_id
+    df2: pandas.DataFrame
+        The second dataframe being matched - must contain a person_id and hh_id
+    suffix_1: str
+        Suffix used for columns in the first dataframe
+    suffix_2: str
+        Suffix used for columns in the second dataframe
+    matches: pandas.DataFrame
+        All person matches made so far, containing person ID columns
+        for both dataframes
+    person_id: str
+        Name of person ID column (without suffixes)
+    hh_id: str
+        Name of household ID column (without suffixes)
+    matchkeys: list of dict
+        One dict per associative matchkey in priority order, containing the
+        run_single_matchkey arguments for that matchkey
+        e.g. {'variables': ['forename']}.
+    keep: list of str
+        List of variables to retain in the matches. Suffixes not required.
+        Must include person_id.
+    match_type: str
+        Indicator that is added to specify which stage the matches were made on.
+    max_rounds: int, default = 10
+        Maximum number of rounds of associative matching.
+
+    Returns
+    -------
+    pandas.DataFrame
+        All unique associative matches made, with the columns from
+        collect_uniques, "MK" (position of the matchkey that made the match,
+        starting from 1) and "Round" (round in which the match was made).
+
+    See Also
+    --------
+    assoc_candidates
+    run_single_matchkey
+    collect_uniques
+
+    Example
+    --------
+    >>> import pandas as pd
+    >>> df1 = pd.DataFrame({'puid_1': [1, 2, 3],
+    ...                     'hhid_1': [1, 1, 1],
+    ...                     'name_1': ['JOHN', 'JOHN', 'PAUL'],
+    ...                     'dob_1': ['1990', '2000', '1950']})
+    >>> df2 = pd.DataFrame({'puid_2': [21, 22, 23],
+    ...                     'hhid_2': [2, 2, 2],
+    ...                     'name_2': ['JOHN', 'JON', 'PAUL'],
+    ...                     'dob_2': ['1991', '2000', '1950']})
+    >>> matches = pd.DataFrame({'puid_1': [3], 'puid_2': [23]})
+    >>> run_associative_rounds(df1, df2, suffix_1='_1', suffix_2='_2',
+    ...                        matches=matches, person_id='puid', hh_id='hhid',
+    ...                        matchkeys=[{'variables': ['name']},
+    ...                                   {'variables': ['dob']}],
+    ...                        keep=['puid'], match_type='Associative')
+       puid_1  puid_2  MK  CLERICAL   Match_Type  Round
+    0       2      22   2         0  Associative      1
+    1       1      21   1         0  Associative      2
+
+    Persons 1 and 2 both agree with person 21 on name, so neither is matched
+    in the first round. Once persons 2 and 22 are matched on date of birth,
+    the conflict is resolved and persons 1 and 21 are matched on name.
+    Combining both matchkeys and applying collect_uniques would make no
+    matches, as person 2 is matched to person 21 on name and to person 22
+    on date of birth.
+    """
+    id_1, id_2 = person_id + suffix_1, person_id + suffix_2
+    df1 = df1.drop_duplicates([id_1]).reset_index(drop=True)
+    df2 = df2.drop_duplicates([id_2]).reset_index(drop=True)
+    households = _encode_households(
+        df1, df2, suffix_1, suffix_2, matches, person_id, hh_id
+    )
+    pairs = households["pairs"]
+    n_hh_1 = len(households["values_1"])
+    n_hh_2 = len(households["values_2"])
+
+    # Label connected groups of households, since associative candidates
+    # (and so uniqueness decisions) never cross between groups
+    graph = nx.Graph()
+    graph.add_edges_from(zip(pairs // n_hh_2, n_hh_1 + pairs % n_hh_2))
+    component = np.zeros(n_hh_1 + n_hh_2, dtype=np.int64)
+    n_components = 0
+    for i, nodes in enumerate(nx.connected_components(graph)):
+        component[list(nodes)] = i
+        n_components = i + 1
+    pair_component = component[pairs // n_hh_2]
+
+    unmatched_1 = ~df1[id_1].isin(matches[id_1]).to_numpy()
+    unmatched_2 = ~df2[id_2].isin(matches[id_2]).to_numpy()
+    dirty = np.ones((len(matchkeys), n_components), dtype=bool)
+    results = []
+    for round_number in range(1, max_rounds + 1):
+        if not dirty.any():
+            break
+        for i, spec in enumerate(matchkeys):
+            active = pairs[dirty[i][pair_component]]
+            dirty[i] = False
+            if len(active) == 0:
+                continue
+            candidates_1, candidates_2 = _candidates_from_pairs(
+                df1,
+                df2,
+                suffix_1,
+                suffix_2,
+                hh_id,
+                households,
+                active,
+                unmatched_1,
+                unmatched_2,
+            )
+            mk = run_single_matchkey(
+                candidates_1,
+                candidates_2,
+                suffix_1,
+                suffix_2,
+                hh_id,
+                level="associative",
+                **spec,
+            )
+            new_matches = collect_uniques(
+                combine(
+                    matchkeys=[mk],
+                    person_id=person_id,
+                    suffix_1=suffix_1,
+                    suffix_2=suffix_2,
+                    keep=keep,
+                ),
+                id_1=id_1,
+                id_2=id_2,
+                match_type=match_type,
+            )
+            if len(new_matches) == 0:
+                continue
+            new_matches["MK"] = i + 1
+            new_matches["Round"] = round_number
+            results.append(new_matches)
+
+            # Update residuals and mark the affected households for rerunning
+            rows_1 = pd.Index(df1[id_1]).get_indexer(new_matches[id_1])
+            rows_2 = pd.Index(df2[id_2]).get_indexer(new_matches[id_2])
+            unmatched_1[rows_1] = False
+            unmatched_2[rows_2] = False
+            dirty[:, component[households["codes_1"][rows_1]]] = True
+    if not results:
+        return pd.DataFrame()
+    return pd.concat(results, axis=0).reset_index(drop=True)
+
+
+def _candidates_from_pairs(
+    df1, df2, suffix_1, suffix_2, hh_id, households, pairs, unmatched_1, unmatched_2
+):
+    """Builds associative candidates for a set of encoded household pairs."""
+    n_hh_2 = len(households["values_2"])
+    pair_codes_1, pair_codes_2 = pairs // n_hh_2, pairs % n_hh_2
+    rows_1, partners_1 = _expand_pairs(
+        households["codes_1"], unmatched_1, pair_codes_1, pair_codes_2
+    )
+    rows_2, partners_2 = _expand_pairs(
+        households["codes_2"], unmatched_2, pair_codes_2, pair_codes_1
+    )
+    df1 = df1.iloc[rows_1].reset_index(drop=True)
+    df2 = df2.iloc[rows_2].reset_index(drop=True)
+    df1[hh_id + suffix_2] = households["values_2"].take(partners_1)
+    df2[hh_id + suffix_1] = households["values_1"].take(partners_2)
+    return df1, df2
+
+
+def _encode_households(df1, df2, suffix_1, suffix_2, matches, person_id, hh_id):
+    """
+    Encodes household IDs as integer codes, and the household pairs from
+    matches as sorted int64 keys (code_1 * number of df2 households + code_2).
+    """
+    codes_1, values_1 = pd.factorize(df1[hh_id + suffix_1])
+    codes_2, values_2 = pd.factorize(df2[hh_id + suffix_2])
+    rows_1 = pd.Index(df1[person_id + suffix_1]).get_indexer(
+        matches[person_id + suffix_1]
+    )
+    rows_2 = pd.Index(df2[person_id + suffix_2]).get_indexer(
+        matches[person_id + suffix_2]
+    )
+    found = (rows_1 >= 0) & (rows_2 >= 0)
+    pair_codes_1 = codes_1[rows_1[found]].astype(np.int64)
+    pair_codes_2 = codes_2[rows_2[found]].astype(np.int64)
+    found = (pair_codes_1 >= 0) & (pair_codes_2 >= 0)
+    pairs = np.unique(pair_codes_1[found] * len(values_2) + pair_codes_2[found])
+    return {
+        "codes_1": codes_1,
+        "codes_2": codes_2,
+        "values_1": values_1,
+        "values_2": values_2,
+        "pairs": pairs,
+    }
+
+
+def _expand_pairs(own_codes, residual, pair_own, pair_other):
+    """
+    For every residual record, finds each household its own household is
+    paired with. Returns the repeated record positions and partner codes.
+    """
+    order = np.argsort(pair_own, kind="stable")
+    pair_own, pair_other = pair_own[order], pair_other[order]
+    rows = np.flatnonzero(residual & (own_codes >= 0))
+    starts = np.searchsorted(pair_own, own_codes[rows], side="left")
+    counts = np.searchsorted(pair_own, own_codes[rows], side="right") - starts
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return np.repeat(rows, counts), pair_other[np.repeat(starts, counts) + offsets]
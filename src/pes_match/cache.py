@@ -0,0 +1,202 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from pes_match.fingerprint import column_fingerprints
+from pes_match.matching import (
+    _pairs_from_rows,
+    _symmetric_swap_keys,
+    generate_matchkey,
+    run_single_matchkey,
+)
+
+
+def run_cached_matchkey(
+    df1,
+    df2,
+    suffix_1,
+    suffix_2,
+    hh_id,
+    level,
+    variables,
+    cache_path,
+    swap_variables=None,
+    lev_variables=None,
+    age_threshold=None,
+    keep_scores=False,
+    symmetric_swap=False,
+    max_bytes=1000000000,
+):
+    """
+    Cached version of run_single_matchkey. Results are stored on disk as
+    matched record positions, keyed by a fingerprint of the columns the
+    matchkey uses and the matchkey arguments. When a stage is rerun, only
+    matchkeys whose arguments or columns have changed are recomputed.
+    Other columns are taken from df1 and df2 as they are now.
+
+    Parameters
+    ----------
+    df1: pandas.DataFrame
+        The first dataframe being matched
+    df2: pandas.DataFrame
+        The second dataframe being matched
+    suffix_1: str
+        Suffix used for columns in the first dataframe
+    suffix_2: str
+        Suffix used for columns in the second dataframe
+    hh_id: str
+        Name of household ID column in df1 and df2 (without suffixes)
+        Required when level='associative'.
+    level: str
+        Level of geography to include in the matchkey e.g. household, EA etc.
+        If level = 'associative' then an associative matchkey is applied instead.
+    variables: list of str
+        List of variables to use in matchkey rule (exluding level of geography)
+    cache_path: str
+        Folder to store cached results in. Created if it does not exist.
+    swap_variables: list of tuple, optional
+        See run_single_matchkey.
+    lev_variables: list of tuple, optional
+        See run_single_matchkey.
+    age_threshold: bool, optional
+        See run_single_matchkey.
+    keep_scores: bool, default = False
+        See run_single_matchkey.
+    symmetric_swap: bool, default = False
+        See run_single_matchkey.
+    max_bytes: int, default = 1000000000
+        Maximum size of the cache folder. The least recently used results are
+        deleted when it is exceeded.
+
+    Returns
+    -------
+    matches: pandas.DataFrame
+        The same matches as run_single_matchkey.
+
+    See Also
+    --------
+    run_single_matchkey
+
+    Example
+    --------
+    >>> import pandas as pd
+    >>> import tempfile
+    >>> df1 = pd.DataFrame({'puid_1': [1, 2], 'EA_1': [1, 1],
+    ...                     'name_1': ['JOHN', 'PAUL']})
+    >>> df2 = pd.DataFrame({'puid_2': [21, 22], 'EA_2': [1, 1],
+    ...                     'name_2': ['PAUL', 'JOHN']})
+    >>> cache_path = tempfile.mkdtemp()
+    >>> run_cached_matchkey(df1, df2, suffix_1='_1', suffix_2='_2', hh_id='hid',
+    ...                     level='EA', variables=['name'], cache_path=cache_path)
+       puid_1  EA_1 name_1  puid_2  EA_2 name_2
+    0       1     1   JOHN      22     1   JOHN
+    1       2     1   PAUL      21     1   PAUL
+    >>> len(os.listdir(cache_path))
+    1
+    """
+    spec = {
+        "suffix_1": suffix_1,
+        "suffix_2": suffix_2,
+        "hh_id": hh_id,
+        "level": level,
+        "variables": list(variables),
+        "swap_variables": [list(pair) for pair in swap_variables or []],
+        "lev_variables": [
+            [lev[0], lev[1], float(lev[2])] for lev in lev_variables or []
+        ],
+        "age_threshold": bool(age_threshold),
+        "keep_scores": bool(keep_scores),
+        "symmetric_swap": bool(symmetric_swap),
+    }
+    columns_1, columns_2 = _columns_used(spec)
+    key = hashlib.blake2b(digest_size=16)
+    key.update(json.dumps(spec, sort_keys=True).encode())
+    for df, columns in [(df1, columns_1), (df2, columns_2)]:
+        key.update(str(len(df)).encode())
+        for column, fingerprint in column_fingerprints(df, columns).items():
+            key.update(column.encode() + fingerprint.encode())
+    os.makedirs(cache_path, exist_ok=True)
+    path = os.path.join(cache_path, key.hexdigest() + ".npz")
+
+    # Scores and orientations are stored alongside the matched positions
+    keys_1, keys_2 = generate_matchkey(
+        suffix_1, suffix_2, hh_id, level, variables, swap_variables
+    )
+    shared_keys = [col_1 for col_1, col_2 in zip(keys_1, keys_2) if col_1 == col_2]
+    if os.path.exists(path):
+        os.utime(path)
+        with np.load(path, allow_pickle=False) as data:
+            matches = _pairs_from_rows(
+                df1, df2, data["rows_1"], data["rows_2"], shared_keys
+            )
+            for name in data.files[2:]:
+                matches[name] = data[name]
+        return matches
+
+    matches = run_single_matchkey(
+        df1.assign(_row_1=np.arange(len(df1))),
+        df2.assign(_row_2=np.arange(len(df2))),
+        suffix_1,
+        suffix_2,
+        hh_id,
+        level,
+        variables,
+        swap_variables=swap_variables,
+        lev_variables=lev_variables,
+        age_threshold=age_threshold,
+        keep_scores=keep_scores,
+        symmetric_swap=symmetric_swap,
+    )
+    arrays = {
+        "rows_1": matches.pop("_row_1").to_numpy(dtype=np.int64),
+        "rows_2": matches.pop("_row_2").to_numpy(dtype=np.int64),
+    }
+    layout = _pairs_from_rows(df1, df2, [], [], shared_keys).columns
+    for col in matches.columns.difference(layout, sort=False):
+        values = matches[col].to_numpy()
+        arrays[col] = values.astype(str) if values.dtype == object else values
+    np.savez_compressed(path, **arrays)
+    _evict(cache_path, max_bytes)
+    return matches
+
+
+def _columns_used(spec):
+    """Columns of each dataframe that decide the matches of a matchkey."""
+    args = (
+        spec["suffix_1"],
+        spec["suffix_2"],
+        spec["hh_id"],
+        spec["level"],
+        spec["variables"],
+        spec["swap_variables"],
+    )
+    if spec["symmetric_swap"]:
+        columns_1, normal_2, swapped_2 = _symmetric_swap_keys(*args)
+        columns_2 = swapped_2 + normal_2
+    else:
+        columns_1, columns_2 = generate_matchkey(*args)
+    for lev in spec["lev_variables"]:
+        columns_1 = columns_1 + [lev[0]]
+        columns_2 = columns_2 + [lev[1]]
+    if spec["age_threshold"]:
+        columns_1 = columns_1 + ["age" + spec["suffix_1"]]
+        columns_2 = columns_2 + ["age" + spec["suffix_2"]]
+    return list(dict.fromkeys(columns_1)), list(dict.fromkeys(columns_2))
+
+
+def _evict(cache_path, max_bytes):
+    """Deletes the least recently used results until the cache fits max_bytes."""
+    files = [
+        os.path.join(cache_path, name)
+        for name in os.listdir(cache_path)
+        if name.endswith(".npz")
+    ]
+    files.sort(key=os.path.getmtime)
+    total = sum(os.path.getsize(file) for file in files)
+    for file in files[:-1]:
+        if total <= max_bytes:
+            break
+        total -= os.path.getsize(file)
+        os.remove(file)
@@ -1,7 +1,12 @@
 import re
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
+import pandas as pd
 import jellyfish
 
+PHONETIC_ENCODINGS = ["metaphone", "nysiis", "soundex"]
+
 
 def alpha_name(df, input_col, output_col):
     """
@@ -35,9 +40,9 @@ def alpha_name(df, input_col, output_col):
     0    ACEHILR
     Name: alphaname, dtype: object
     """
-    df[input_col + "_cleaned"] = [re.sub(r"[^A-Za-z]+", "", s) for s in df[input_col]]
-    df[output_col] = ["".join(sorted(x.upper())) for x in df[input_col + "_cleaned"]]
-    df = df.drop([input_col + "_cleaned"], axis=1)
+    df[output_col] = _apply_unique(
+        df[input_col], lambda x: "".join(sorted(re.sub(r"[^A-Za-z]+", "", x).upper()))
+    )
     return df
 
 
@@ -111,12 +116,13 @@ def clean_name(df, name_column, suffix=""):
     0  Charlie!        CHARLIE
     """
     df[name_column] = df[name_column].replace(np.nan, "")
-    df[name_column + "_clean" + suffix] = [
-        " ".join(x.upper().split()) for x in df[name_column]
-    ]
-    df[name_column + "_clean" + suffix] = [
-        re.sub(r"[^A-Za-z ]+", "", s) for s in df[name_column + "_clean" + suffix]
-    ]
+    df[name_column + "_clean" + suffix] = _transform_unique(
+        df[name_column],
+        lambda names: names.str.upper()
+        .str.replace(r"\s+", " ", regex=True)
+        .str.strip()
+        .str.replace(r"[^A-Za-z ]+", "", regex=True),
+    )
     df[name_column + "_clean" + suffix] = df[name_column + "_clean" + suffix].replace(
         "", np.nan
     )
@@ -154,7 +160,7 @@ def concat(df, columns, output_col, sep=" "):
     See Also
     --------
     replace_vals
-        Uses regular expressions to replace values within dataframe columns.
+        Replaces values within dataframe columns.
 
     Example
     -------
@@ -173,9 +179,19 @@ def concat(df, columns, output_col, sep=" "):
     if columns is None:
         columns = []
     df = replace_vals(df, dic={"": np.NaN}, subset=columns)
-    df[output_col] = df[columns].agg(sep.join, axis=1)
-    df[output_col] = [" ".join(x.split(sep)) for x in df[output_col].str.strip()]
-    df[output_col] = [sep.join(x.split()) for x in df[output_col]]
+    if columns:
+        joined = df[columns[0]].str.cat([df[col] for col in columns[1:]], sep=sep)
+    else:
+        joined = pd.Series("", index=df.index)
+    # Separators and runs of whitespace become a single separator
+    df[output_col] = _transform_unique(
+        joined,
+        lambda values: values.str.strip()
+        .str.replace(sep, " ", regex=False)
+        .str.replace(r"\s+", " ", regex=True)
+        .str.strip()
+        .str.replace(" ", sep, regex=False),
+    )
     df = replace_vals(df, dic={np.NaN: ""}, subset=columns)
     return df
 
@@ -260,18 +276,22 @@ def derive_names(df, clean_fullname_column, suffix=""):
     0  John Paul William Smith     John  Paul William     Smith
     """
     df[clean_fullname_column] = df[clean_fullname_column].str.replace("-", " ")
-    df["Name_count"] = [len(x.split()) for x in df[clean_fullname_column]]
-    df["forename" + suffix] = np.where(
-        df["Name_count"] > 0, df[clean_fullname_column].str.split().str.get(0), np.NaN
-    )
-    df["middle_name" + suffix] = [" ".join(x.split()[1:-1]) for x in df[clean_fullname_column]]
-    df["last_name" + suffix] = np.where(
-        df["Name_count"] > 1, df[clean_fullname_column].str.split().str.get(-1), np.NaN
+    codes, uniques = pd.factorize(df[clean_fullname_column], use_na_sentinel=False)
+    # Each distinct name is split into words once
+    words = [name.split() if isinstance(name, str) else [] for name in uniques]
+    counts = np.fromiter(map(len, words), dtype=np.int64, count=len(words))
+    ends = np.cumsum(counts)
+    flat = np.array([word for name in words for word in name] + [np.NaN], dtype=object)
+    # Names without a word for a component point at the final missing value
+    forename = flat[np.where(counts > 0, ends - counts, -1)]
+    last_name = flat[np.where(counts > 1, ends - 1, -1)]
+    middle_name = np.array(
+        [" ".join(name[1:-1]) or np.NaN for name in words], dtype=object
     )
-    df = replace_vals(df, dic={np.NaN: ''}, subset=["forename" + suffix,
-                                                    "middle_name" + suffix,
-                                                    "last_name" + suffix])
-    return df.drop(["Name_count"], axis=1)
+    df["forename" + suffix] = forename[codes]
+    df["middle_name" + suffix] = middle_name[codes]
+    df["last_name" + suffix] = last_name[codes]
+    return df
 
 
 def n_gram(df, input_col, output_col, missing_value, n):
@@ -312,13 +332,60 @@ def n_gram(df, input_col, output_col, missing_value, n):
     0  Jonathon        JO       ON
     1       NaN       NaN      NaN
     """
-    df[input_col] = df[input_col].replace(missing_value, "")
-    if n < 0:
-        df[output_col] = [x.upper()[n:] for x in df[input_col]]
-    else:
-        df[output_col] = [x.upper()[:n] for x in df[input_col]]
-    df[input_col] = df[input_col].replace("", missing_value)
-    df[output_col] = df[output_col].replace("", missing_value)
+    return n_grams(df, input_col, [(n, output_col)], missing_value)
+
+
+def n_grams(df, input_col, grams, missing_value):
+    """
+    Generates several upper case n-gram sequences (e.g. initials and
+    trigrams) for all strings in a column, from one pass over its distinct
+    values. input_col is left unchanged.
+
+    Parameters
+    ----------
+    df: pandas.DataFrame
+        Input dataframe with input_col present
+    input_col: str
+        name of column to apply n_grams to
+    grams: list of tuple
+        (n, output_col) for each n-gram, where n is the chosen n-gram (as in
+        n_gram) and output_col is the name of the column to be output
+    missing_value:
+        value that is used for missingness in input_col
+        will also be used for missingness in each output_col
+
+    Returns
+    -------
+    pandas.DataFrame
+        n_grams returns the dataframe with an additional column for each
+        n-gram
+
+    See Also
+    --------
+    n_gram
+
+    Example
+    --------
+    >>> import pandas as pd
+    >>> df = pd.DataFrame({'Forename': ['Jonathon', '-9']})
+    >>> df = n_grams(df, input_col='Forename', missing_value='-9',
+    ...              grams=[(1, 'Initial'), (3, 'First_Three'), (-2, 'Last_Two')])
+    >>> df.head(n=2)
+       Forename Initial First_Three Last_Two
+    0  Jonathon       J         JON       ON
+    1        -9      -9          -9       -9
+    """
+    codes, uniques = pd.factorize(df[input_col], use_na_sentinel=False)
+    missing = np.fromiter(
+        (_same_value(value, missing_value) for value in uniques),
+        dtype=bool,
+        count=len(uniques),
+    )
+    upper = pd.Series(uniques, dtype=object).str.upper()
+    for n, output_col in grams:
+        values = upper.str[n:] if n < 0 else upper.str[:n]
+        values = values.mask(missing | (values == ""), missing_value)
+        df[output_col] = values.infer_objects().to_numpy()[codes]
     return df
 
 
@@ -360,27 +427,91 @@ def pad_column(df, input_col, output_col, length):
     1    5        005
     2  100        100
     """
-    df[output_col] = [x.zfill(length) for x in df[input_col].astype("str")]
+    df[output_col] = _apply_unique(
+        df[input_col].astype("str"), lambda x: x.zfill(length)
+    )
+    return df
+
+
+def phonetic(df, input_col, output_col, missing_value, encoding):
+    """
+    Generates a phonetic encoding (soundex, metaphone or NYSIIS) for all
+    strings in a column. Each distinct string is encoded once.
+
+    Parameters
+    ----------
+    df: pandas.DataFrame
+        The dataframe to which the function is applied.
+    input_col: str
+        name of column to apply the encoding to
+    output_col: str
+        name of column to be output
+    missing_value:
+        value that is used for missing value in input_col
+        will also be used for missing value in output_col
+    encoding: str
+        One of 'soundex', 'metaphone' or 'nysiis'.
+
+    Returns
+    -------
+    pandas.DataFrame
+        phonetic returns the dataframe with additional column output_col
+
+    Raises
+    ------
+    ValueError
+        if encoding is not one of PHONETIC_ENCODINGS.
+
+    See Also
+    --------
+    soundex
+
+    Example
+    --------
+    >>> import pandas as pd
+    >>> df = pd.DataFrame({'Forename': ['Charlie', 'Rachel', '-9']})
+    >>> df = phonetic(df, input_col='Forename', output_col='nysiis_Forename',
+    ...               missing_value='-9', encoding='nysiis')
+    >>> df.head(n=3)
+      Forename nysiis_Forename
+    0  Charlie           CARLY
+    1   Rachel           RACAL
+    2       -9              -9
+    """
+    if encoding not in PHONETIC_ENCODINGS:
+        raise ValueError(f"encoding must be one of {PHONETIC_ENCODINGS}")
+    codes, uniques = pd.factorize(df[input_col].astype("str"))
+    uniques = np.asarray(uniques, dtype=object)
+    df[output_col] = _phonetic_codes(uniques, encoding)[codes]
+    missing_code = _phonetic_codes(np.array([missing_value], dtype=object), encoding)
+    df[output_col] = df[output_col].replace(missing_code[0], missing_value)
     return df
 
 
-def replace_vals(df, subset, dic):
+def replace_vals(df, subset, dic, n_jobs=1):
     """
-    Uses regular expressions to replace values within dataframe columns.
+    Replaces values within dataframe columns. Each replacement is applied
+    in turn, as if the dictionary entries were applied one after another,
+    but the entries are first composed into a single mapping so that each
+    column is only scanned once. Up to n_jobs columns are processed at the
+    same time in threads, but the lookups hold the GIL so the speed-up is
+    limited.
 
     Parameters
     ----------
     df : pandas.DataFrame
         The dataframe to which the function is applied.
     dic : dict
-        The values of the dictionary are the substrings
+        The values of the dictionary are the values
         that are being replaced within the subset of columns.
-        These must either be regex statements in the form of a
-        string, or numpy nan values. The key is the replacement.
-        The value is the regex to be replaced.
+        These are matched as whole values (not regular expressions),
+        and can be numpy nan values. The key is the replacement.
+        The value is the value to be replaced.
     subset : str or list of str
         The subset is the list of columns in the dataframe
         on which replace_vals is performing its actions.
+    n_jobs : int, default = 1
+        Number of columns to process at the same time.
 
     Returns
     -------
@@ -405,9 +536,15 @@ def replace_vals(df, subset, dic):
     """
     if not isinstance(subset, list):
         subset = [subset]
-    for col in subset:
-        for key, val in dic.items():
-            df[col] = df[col].replace(val, key)
+    mapping = _compose_replacements(dic)
+    if not mapping:
+        return df
+    with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+        columns = list(
+            executor.map(lambda col: _replace_column(df[col], mapping), subset)
+        )
+    for col, values in zip(subset, columns):
+        df[col] = values
     return df
 
 
@@ -472,6 +609,10 @@ def soundex(df, input_col, output_col, missing_value):
     pandas.DataFrame
         soundex returns the dataframe with additional column output_col
 
+    See Also
+    --------
+    phonetic
+
     Example
     --------
     >>> import pandas as pd
@@ -489,8 +630,70 @@ def soundex(df, input_col, output_col, missing_value):
     1   Rachel         R240
     2       -9           -9
     """
-    df[output_col] = [jellyfish.soundex(x) for x in df[input_col].astype("str")]
-    df[output_col] = df[output_col].replace(
-        jellyfish.soundex(missing_value), missing_value
-    )
-    return df
+    return phonetic(df, input_col, output_col, missing_value, "soundex")
+
+
+def _apply_unique(values, func):
+    """Applies func once per distinct value, broadcasting results back by code."""
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    results = pd.Series([func(x) for x in uniques], dtype=object).to_numpy()
+    return results[codes]
+
+
+def _compose_replacements(dic):
+    """Single {old: new} mapping with the effect of dic's replacements in turn."""
+    pairs = [(val, key) for key, val in dic.items()]
+    mapping = {}
+    for old, _ in pairs:
+        new = old
+        for src, dest in pairs:
+            if _same_value(new, src):
+                new = dest
+        mapping[old] = new
+    return mapping
+
+
+def _phonetic_codes(values, encoding):
+    """Phonetic codes for an object array of strings."""
+    encode = getattr(jellyfish, encoding)
+    return np.array([encode(value) for value in values], dtype=object)
+
+
+def _replace_column(values, mapping):
+    """Replaces values in one column by dictionary lookup over distinct values."""
+    # A single replacement is one vectorized comparison. The scalar form is
+    # used where possible, as the dict form re-infers an object column's dtype
+    if len(mapping) == 1 and None not in mapping:
+        return values.replace(*next(iter(mapping.items())))
+    if values.dtype != object or len(mapping) == 1:
+        return values.replace(mapping)
+    codes, uniques = pd.factorize(values)
+    missing = codes < 0
+    na_keys = [old for old in mapping if pd.isna(old)]
+    matched = np.array([value in mapping for value in uniques], dtype=bool)
+    if not matched.any() and not (na_keys and missing.any()):
+        return values
+    lookup = np.empty(len(uniques), dtype=object)
+    lookup[:] = [mapping.get(value, value) for value in uniques]
+    result = values.to_numpy(dtype=object, copy=True)
+    # Missing values take the code -1, which picks the trailing False
+    replace = np.append(matched, False)[codes]
+    result[replace] = lookup[codes[replace]]
+    if na_keys:
+        result[missing] = mapping[na_keys[0]]
+    # Series.replace infers the column dtype after a replacement
+    return pd.Series(result, index=values.index, name=values.name).infer_objects()
+
+
+def _same_value(value, other):
+    """Whether a value would be replaced by Series.replace(other, ...)."""
+    if pd.isna(value) or pd.isna(other):
+        return bool(pd.isna(value) and pd.isna(other))
+    return bool(value == other)
+
+
+def _transform_unique(values, func):
+    """Applies a vectorized func to the distinct values, broadcasting results back."""
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    results = func(pd.Series(uniques, dtype=object)).to_numpy(dtype=object)
+    return results[codes]
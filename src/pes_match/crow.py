@@ -5,6 +5,7 @@ import numpy as np
 import pandas as pd
 
 from pes_match.cluster import cluster_number
+from pes_match.household import join_household_lists
 from pes_match.parameters import CLERICAL_VARIABLES
 
 
@@ -325,7 +326,14 @@ def remove_large_clusters(df, n):
 
 
 def save_for_crow(
-    df, id_column, suffix_1, suffix_2, output_folder, file_name, no_of_files=1
+    df,
+    id_column,
+    suffix_1,
+    suffix_2,
+    output_folder,
+    file_name,
+    no_of_files=1,
+    household_lists=None,
 ):
     """
     Takes candidate matches, updates their format ready for CROW
@@ -350,6 +358,10 @@ def save_for_crow(
         e.g. "_1", "_2", etc.
     no_of_files: int, default = 1
         Number of csv files that the output will be split into.
+    household_lists: dict, optional
+        Household lists (see build_household_lists) to add to the records
+        of each data source, keyed by suffix e.g. {'_cen': cen_lists,
+        '_pes': pes_lists}. Records are matched to households on 'hid'.
 
     See Also
     --------
@@ -381,6 +393,13 @@ def save_for_crow(
     crow_records_2.columns = crow_records_2.columns.str.replace(
         suffix_2, "", regex=True
     )
+    if household_lists is not None:
+        crow_records_1 = join_household_lists(
+            crow_records_1, household_lists[suffix_1], hh_id="hid"
+        )
+        crow_records_2 = join_household_lists(
+            crow_records_2, household_lists[suffix_2], hh_id="hid"
+        )
     crow_records_1["Source_Dataset"] = suffix_1
     crow_records_2["Source_Dataset"] = suffix_2
     crow_input = pd.concat([crow_records_1, crow_records_2], axis=0).sort_values(
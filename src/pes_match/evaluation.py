@@ -0,0 +1,257 @@
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from pes_match.matching import _run_lattice_group, plan_matchkeys
+
+# Arguments shared by every group evaluated in a worker process
+_GROUP_ARGS = ()
+
+
+def evaluate_matchkeys(
+    df1,
+    df2,
+    truth,
+    matchkeys,
+    suffix_1,
+    suffix_2,
+    person_id,
+    hh_id,
+    level,
+    n_jobs=1,
+    max_candidates=10000000,
+):
+    """
+    Evaluates a set of candidate matchkeys against a labelled set of true
+    matches and returns a comparison table. Matchkeys that share blocking
+    variables are evaluated from a single shared join (see plan_matchkeys),
+    and groups of matchkeys can be evaluated in separate processes.
+
+    Parameters
+    ----------
+    df1: pandas.DataFrame
+        The first dataframe being matched
+    df2: pandas.DataFrame
+        The second dataframe being matched
+    truth: pandas.DataFrame
+        Labelled true matches, containing person_id + suffix_1 and
+        person_id + suffix_2 columns
+    matchkeys: list of dict
+        One dict per candidate matchkey, containing the run_single_matchkey
+        arguments for that matchkey e.g. {'variables': ['forename', 'dob']}.
+        Optional keys are 'level', 'swap_variables', 'lev_variables' and
+        'age_threshold'. See matchkey_grid to build a grid of matchkeys.
+    suffix_1: str
+        Suffix used for columns in the first dataframe
+    suffix_2: str
+        Suffix used for columns in the second dataframe
+    person_id: str
+        Name of person ID column (without suffixes)
+    hh_id: str
+        Name of household ID column (without suffixes)
+        Required when level='associative'.
+    level: str
+        Level of geography to include in every matchkey, unless a matchkey
+        supplies its own 'level'.
+    n_jobs: int, default = 1
+        Number of groups of matchkeys to evaluate at the same time, in
+        separate processes. Each process receives one copy of the columns of
+        df1 and df2 that the matchkeys use when it starts.
+    max_candidates: int, default = 10000000
+        Maximum number of candidate pairs allowed from a shared join.
+
+    Returns
+    -------
+    pandas.DataFrame
+        One row per matchkey, with columns 'MK' (position in matchkeys,
+        starting from 1), 'Matchkey' (description of the matchkey), 'Pairs'
+        (distinct pairs made), 'True_Pairs' (pairs found in truth),
+        'Precision', 'Recall' and 'Conflict_Rate' (proportion of pairs that
+        are not unique, i.e. would be sent to CROW).
+
+    See Also
+    --------
+    matchkey_grid
+    plan_matchkeys
+    run_matchkey_lattice
+
+    Example
+    --------
+    >>> import pandas as pd
+    >>> df1 = pd.DataFrame({'puid_1': [1, 2, 3],
+    ...                     'EA_1': [1, 1, 1],
+    ...                     'name_1': ['JOHN', 'JOHN', 'PAUL'],
+    ...                     'dob_1': ['01/2000', '02/2000', '03/1990']})
+    >>> df2 = pd.DataFrame({'puid_2': [21, 22],
+    ...                     'EA_2': [1, 1],
+    ...                     'name_2': ['JOHN', 'PAUL'],
+    ...                     'dob_2': ['01/2000', '04/1990']})
+    >>> truth = pd.DataFrame({'puid_1': [1, 3], 'puid_2': [21, 22]})
+    >>> evaluate_matchkeys(df1, df2, truth,
+    ...                    matchkeys=[{'variables': ['name', 'dob']},
+    ...                               {'variables': ['name']}],
+    ...                    suffix_1='_1', suffix_2='_2', person_id='puid',
+    ...                    hh_id='hid', level='EA')
+       MK        Matchkey  Pairs  True_Pairs  Precision  Recall  Conflict_Rate
+    0   1  name, dob | EA      1           1   1.000000     0.5       0.000000
+    1   2       name | EA      3           2   0.666667     1.0       0.666667
+    """
+    id_1, id_2 = person_id + suffix_1, person_id + suffix_2
+    plan = plan_matchkeys(
+        df1, df2, suffix_1, suffix_2, hh_id, level, matchkeys, max_candidates
+    )
+
+    # Encode IDs once, so pairs can be compared as single integer keys
+    ids_1 = pd.Index(df1[id_1].drop_duplicates())
+    ids_2 = pd.Index(df2[id_2].drop_duplicates())
+    truth_keys = _pair_keys(
+        ids_1.get_indexer(truth[id_1]), ids_2.get_indexer(truth[id_2]), len(ids_2)
+    )
+    truth_keys = np.unique(truth_keys[truth_keys >= 0])
+
+    # Only carry the columns that matchkeys need through the joins
+    columns_1, columns_2 = [id_1], [id_2]
+    for group in plan:
+        for pair in group["block"] + [p for c in group["conditions"] for p in c]:
+            columns_1.append(pair[0])
+            columns_2.append(pair[1])
+    for spec in matchkeys:
+        for lev in spec.get("lev_variables") or []:
+            columns_1.append(lev[0])
+            columns_2.append(lev[1])
+        if spec.get("age_threshold"):
+            columns_1.append("age" + suffix_1)
+            columns_2.append("age" + suffix_2)
+    df1 = df1[list(dict.fromkeys(columns_1))]
+    df2 = df2[list(dict.fromkeys(columns_2))]
+
+    args = (df1, df2, suffix_1, suffix_2, matchkeys, ids_1, ids_2, truth_keys)
+    if n_jobs == 1:
+        group_metrics = [_evaluate_group(group, *args) for group in plan]
+    else:
+        # Edit distance and age filters hold the GIL, so groups run in processes
+        # The dataframes are sent once to each process, not with every group
+        with ProcessPoolExecutor(
+            max_workers=n_jobs, initializer=_set_group_args, initargs=args
+        ) as executor:
+            group_metrics = list(executor.map(_evaluate_worker_group, plan))
+    results = [None] * len(matchkeys)
+    for group, metrics in zip(plan, group_metrics):
+        for i, row in zip(group["matchkeys"], metrics):
+            results[i] = row
+    table = pd.DataFrame(
+        results,
+        columns=["Pairs", "True_Pairs", "Precision", "Recall", "Conflict_Rate"],
+    )
+    table.insert(0, "MK", np.arange(1, len(matchkeys) + 1))
+    table.insert(1, "Matchkey", [_describe(spec, level) for spec in matchkeys])
+    return table
+
+
+def matchkey_grid(**options):
+    """
+    Builds a grid of candidate matchkeys from every combination of the
+    options supplied, for use in evaluate_matchkeys.
+
+    Parameters
+    ----------
+    **options: list
+        Lists of candidate values for each run_single_matchkey argument,
+        e.g. variables=[['forename', 'dob'], ['forename_tri', 'dob']].
+
+    Returns
+    -------
+    list of dict
+        One dict per combination of options.
+
+    See Also
+    --------
+    evaluate_matchkeys
+
+    Example
+    --------
+    >>> grid = matchkey_grid(variables=[['forename', 'dob'], ['surname', 'dob']],
+    ...                      level=['hid', 'Eaid'])
+    >>> len(grid)
+    4
+    >>> grid[1]
+    {'variables': ['forename', 'dob'], 'level': 'Eaid'}
+    """
+    names = list(options)
+    return [
+        dict(zip(names, values))
+        for values in itertools.product(*[options[name] for name in names])
+    ]
+
+
+def _describe(spec, level):
+    """Short readable description of a matchkey."""
+    description = ", ".join(spec["variables"]) + " | " + spec.get("level", level)
+    if spec.get("swap_variables"):
+        description += " | swap " + ", ".join(
+            "=".join(pair) for pair in spec["swap_variables"]
+        )
+    if spec.get("lev_variables"):
+        description += " | lev " + ", ".join(
+            f"{lev[0]}~{lev[1]}>={lev[2]}" for lev in spec["lev_variables"]
+        )
+    if spec.get("age_threshold"):
+        description += " | age"
+    return description
+
+
+def _evaluate_group(
+    group, df1, df2, suffix_1, suffix_2, matchkeys, ids_1, ids_2, truth_keys
+):
+    """Metrics for each matchkey in one group of the plan."""
+    id_1, id_2 = ids_1.name, ids_2.name
+    group_matches = _run_lattice_group(df1, df2, suffix_1, suffix_2, matchkeys, group)
+    return [
+        _pair_metrics(
+            ids_1.get_indexer(matches[id_1]),
+            ids_2.get_indexer(matches[id_2]),
+            len(ids_2),
+            truth_keys,
+        )
+        for matches in group_matches
+    ]
+
+
+def _evaluate_worker_group(group):
+    """_evaluate_group in a worker process, with the arguments it was started with."""
+    return _evaluate_group(group, *_GROUP_ARGS)
+
+
+def _pair_keys(codes_1, codes_2, n_2):
+    """Encodes pairs of ID codes as single int64 keys, -1 if either is unknown."""
+    codes_1 = np.asarray(codes_1, dtype=np.int64)
+    codes_2 = np.asarray(codes_2, dtype=np.int64)
+    return np.where((codes_1 < 0) | (codes_2 < 0), -1, codes_1 * n_2 + codes_2)
+
+
+def _pair_metrics(codes_1, codes_2, n_2, truth_keys):
+    """Pair counts, precision, recall and conflict rate for one matchkey."""
+    keys, first = np.unique(_pair_keys(codes_1, codes_2, n_2), return_index=True)
+    codes_1, codes_2 = np.asarray(codes_1)[first], np.asarray(codes_2)[first]
+    pairs = len(keys)
+    true_pairs = int(np.isin(keys, truth_keys, assume_unique=True).sum())
+    if pairs == 0:
+        return [0, 0, np.nan, 0.0 if len(truth_keys) else np.nan, np.nan]
+    _, inverse_1, counts_1 = np.unique(codes_1, return_inverse=True, return_counts=True)
+    _, inverse_2, counts_2 = np.unique(codes_2, return_inverse=True, return_counts=True)
+    conflicts = (counts_1[inverse_1] > 1) | (counts_2[inverse_2] > 1)
+    return [
+        pairs,
+        true_pairs,
+        true_pairs / pairs,
+        true_pairs / len(truth_keys) if len(truth_keys) else np.nan,
+        conflicts.mean(),
+    ]
+
+
+def _set_group_args(*args):
+    """Stores the arguments shared by every group in a worker process."""
+    global _GROUP_ARGS
+    _GROUP_ARGS = args
@@ -0,0 +1,135 @@
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+
+def column_fingerprints(df, columns=None):
+    """
+    Calculates a content hash of each column of a dataframe, directly from
+    the column's values rather than a CSV or pickle of the data. Numeric,
+    boolean and datetime columns are hashed from their NumPy buffers.
+    String and other object columns are dictionary encoded first, so only
+    the integer codes and each distinct value are hashed. Two columns have
+    the same fingerprint if they have the same dtype and the same values in
+    the same order.
+
+    Parameters
+    ----------
+    df: pandas.DataFrame
+        The dataframe to fingerprint e.g. the cleaned census or PES.
+    columns: list of str, optional
+        Columns to fingerprint. Default is every column.
+
+    Returns
+    -------
+    dict
+        Hexadecimal fingerprint of each column, keyed by column name.
+
+    See Also
+    --------
+    frame_fingerprint
+
+    Example
+    --------
+    >>> import pandas as pd
+    >>> df1 = pd.DataFrame({'puid': ['A1', 'A2'], 'age': [20, 35]})
+    >>> df2 = pd.DataFrame({'puid': ['A1', 'A2'], 'age': [20, 36]})
+    >>> fingerprints_1 = column_fingerprints(df1)
+    >>> fingerprints_2 = column_fingerprints(df2)
+    >>> [col for col in df1.columns if fingerprints_1[col] != fingerprints_2[col]]
+    ['age']
+    """
+    if columns is None:
+        columns = df.columns
+    return {column: _column_fingerprint(df[column]) for column in columns}
+
+
+def file_fingerprint(path, chunk_size=1048576):
+    """
+    Calculates a content hash of a file e.g. a checkpoint CSV, reading it
+    in chunks.
+
+    Parameters
+    ----------
+    path: str
+        Path to the file.
+    chunk_size: int, default = 1048576
+        Number of bytes to read at a time.
+
+    Returns
+    -------
+    str
+        Hexadecimal fingerprint of the file.
+
+    See Also
+    --------
+    frame_fingerprint
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def frame_fingerprint(df, columns=None):
+    """
+    Calculates a single content hash of a dataframe from the fingerprints of
+    its columns, their names and the number of rows.
+
+    Parameters
+    ----------
+    df: pandas.DataFrame
+        The dataframe to fingerprint.
+    columns: list of str, optional
+        Columns to include. Default is every column.
+
+    Returns
+    -------
+    str
+        Hexadecimal fingerprint of the dataframe.
+
+    See Also
+    --------
+    column_fingerprints
+    file_fingerprint
+
+    Example
+    --------
+    >>> import pandas as pd
+    >>> df = pd.DataFrame({'puid': ['A1', 'A2'], 'age': [20, 35]})
+    >>> frame_fingerprint(df) == frame_fingerprint(df.copy())
+    True
+    >>> frame_fingerprint(df) == frame_fingerprint(df[::-1])
+    False
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(str(len(df)).encode())
+    for column, fingerprint in column_fingerprints(df, columns).items():
+        digest.update(str(column).encode() + b"\x00" + fingerprint.encode())
+    return digest.hexdigest()
+
+
+def _column_fingerprint(series):
+    """Hash of a column's dtype and values."""
+    digest = hashlib.blake2b(str(series.dtype).encode(), digest_size=16)
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        digest.update(series.cat.codes.to_numpy().tobytes())
+        digest.update(_values_hash(series.cat.categories.to_series()))
+    elif isinstance(series.dtype, np.dtype) and series.dtype != object:
+        digest.update(np.ascontiguousarray(series.to_numpy()).tobytes())
+    else:
+        try:
+            codes, uniques = pd.factorize(series, use_na_sentinel=False)
+        except TypeError:
+            # Unhashable values, such as the lists made by derive_list
+            codes, uniques = pd.factorize(series.astype(str), use_na_sentinel=False)
+        digest.update(codes.tobytes())
+        digest.update(_values_hash(pd.Series(uniques, dtype=object)))
+    return digest.hexdigest()
+
+
+def _values_hash(values):
+    """Bytes of the row hashes of a (small) series of distinct values."""
+    return pd.util.hash_pandas_object(values, index=False).to_numpy().tobytes()
@@ -0,0 +1,234 @@
+import numpy as np
+import pandas as pd
+
+
+def build_household_lists(df, hh_id, list_var, output_col):
+    """
+    Collects the values of one column in each household into a
+    household-level side table, as an alternative to derive_list. Values
+    are stored once per household (as offsets into a single array of
+    values) rather than as a copy of the household's list on every person,
+    and are only joined back onto records when needed with
+    join_household_lists.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        Input dataframe with hh_id and list_var present
+    hh_id : str
+        Name of household ID column
+    list_var : str
+        Variable to collect list of values over each household e.g. names
+    output_col: str
+        Name of the list column created by join_household_lists
+
+    Returns
+    -------
+    dict
+        Household lists: household IDs ('keys', as sorted strings), the
+        positions in 'values' where each household starts and ends
+        ('offsets'), the values themselves (as strings) and which of them
+        are missing ('missing'). Whole number IDs are written without a
+        decimal part, so 5, 5.0 and '5' are the same household.
+
+    See Also
+    --------
+    derive_list
+    join_household_lists
+    save_household_lists
+
+    Example
+    --------
+    >>> import pandas as pd
+    >>> df = pd.DataFrame({'Forename': ['John', 'Steve', 'Charlie', 'James'],
+    ...                    'Household': [1, 1, 2, 2]})
+    >>> lists = build_household_lists(df, hh_id='Household', list_var='Forename',
+    ...                               output_col='Forename_List')
+    >>> lists['keys'].tolist(), lists['offsets'].tolist()
+    (['1', '2'], [0, 2, 4])
+    """
+    codes, keys = _household_codes(df[hh_id])
+    # Records with no household ID are not in any household's list
+    order = np.argsort(codes, kind="stable")
+    order = order[codes[order] >= 0]
+    values = df[list_var].to_numpy()[order]
+    missing = pd.isna(values)
+    counts = np.bincount(codes[order], minlength=len(keys))
+    return {
+        "name": output_col,
+        "keys": keys,
+        "offsets": np.concatenate([[0], np.cumsum(counts)]).astype(np.int64),
+        "values": np.where(missing, "", values).astype(str),
+        "missing": missing,
+    }
+
+
+def join_household_lists(df, lists, hh_id):
+    """
+    Adds the list of values in each record's household to a dataframe
+    from household lists, in the same format as derive_list. Intended for
+    output files such as CROW inputs, so lists are only created for the
+    records being output.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        Records to add household lists to
+    lists : dict
+        Household lists from build_household_lists or load_household_lists
+    hh_id : str
+        Name of household ID column in df. IDs are compared as in
+        build_household_lists, so 5, 5.0 and '5' are the same household.
+
+    Returns
+    -------
+    pandas.DataFrame
+        df with the list column added. Records whose household is not in
+        the household lists have a missing value.
+
+    See Also
+    --------
+    build_household_lists
+
+    Example
+    --------
+    >>> import pandas as pd
+    >>> df = pd.DataFrame({'Forename': ['John', 'Steve', 'Charlie', 'James'],
+    ...                    'Household': [1, 1, 2, 2]})
+    >>> lists = build_household_lists(df, hh_id='Household', list_var='Forename',
+    ...                               output_col='Forename_List')
+    >>> records = pd.DataFrame({'puid': ['A3', 'A1'], 'hid': ['2', '1']})
+    >>> join_household_lists(records, lists, hh_id='hid')
+      puid hid     Forename_List
+    0   A3   2  [Charlie, James]
+    1   A1   1     [John, Steve]
+    """
+    codes, keys = _household_codes(df[hh_id])
+    codes = np.append(pd.Index(lists["keys"]).get_indexer(keys), -1)[codes]
+    households, codes = np.unique(codes, return_inverse=True)
+    offsets, missing = lists["offsets"], lists["missing"]
+    values = lists["values"].astype(object)
+    values[missing] = np.nan
+    household_lists = np.empty(len(households), dtype=object)
+    for i, household in enumerate(households):
+        if household < 0:
+            household_lists[i] = np.nan
+        else:
+            start, end = offsets[household], offsets[household + 1]
+            household_lists[i] = values[start:end].tolist()
+    df[lists["name"]] = household_lists[codes]
+    return df
+
+
+def load_household_lists(path):
+    """
+    Loads household lists saved with save_household_lists.
+
+    Parameters
+    ----------
+    path: str
+        Path to the saved household lists (.npz file).
+
+    Returns
+    -------
+    dict
+        Household lists in the same format as build_household_lists.
+
+    See Also
+    --------
+    save_household_lists
+    """
+    with np.load(path, allow_pickle=False) as data:
+        return {
+            "name": str(data["name"]),
+            "keys": data["keys"],
+            "offsets": data["offsets"],
+            "values": data["values"],
+            "missing": data["missing"],
+        }
+
+
+def merge_household_lists(lists):
+    """
+    Combines household lists built from separate chunks of one dataset
+    (e.g. with stream_cleaning) into the household lists of the whole
+    dataset. Households split across chunks have their values in the order
+    of the chunks.
+
+    Parameters
+    ----------
+    lists : list of dict
+        Household lists from build_household_lists, one per chunk, in the
+        order the chunks were read.
+
+    Returns
+    -------
+    dict
+        Household lists in the same format as build_household_lists.
+
+    See Also
+    --------
+    build_household_lists
+
+    Example
+    --------
+    >>> import pandas as pd
+    >>> df = pd.DataFrame({'Forename': ['John', 'Steve', 'Charlie', 'James'],
+    ...                    'Household': [1, 1, 2, 2]})
+    >>> lists = [build_household_lists(chunk, hh_id='Household',
+    ...                                list_var='Forename',
+    ...                                output_col='Forename_List')
+    ...          for chunk in [df[:3], df[3:]]]
+    >>> lists = merge_household_lists(lists)
+    >>> lists['offsets'].tolist(), lists['values'].tolist()
+    ([0, 2, 4], ['John', 'Steve', 'Charlie', 'James'])
+    """
+    keys = np.concatenate(
+        [np.repeat(chunk["keys"], np.diff(chunk["offsets"])) for chunk in lists]
+    )
+    codes, keys = _household_codes(keys)
+    order = np.argsort(codes, kind="stable")
+    counts = np.bincount(codes, minlength=len(keys))
+    return {
+        "name": lists[0]["name"],
+        "keys": keys,
+        "offsets": np.concatenate([[0], np.cumsum(counts)]).astype(np.int64),
+        "values": np.concatenate([chunk["values"] for chunk in lists])[order],
+        "missing": np.concatenate([chunk["missing"] for chunk in lists])[order],
+    }
+
+
+def save_household_lists(lists, path):
+    """
+    Saves household lists in compressed numpy format, so that later stages
+    can add them to their outputs without re-parsing lists from CSV.
+
+    Parameters
+    ----------
+    lists: dict
+        Household lists created with build_household_lists.
+    path: str
+        Path to save the household lists to (.npz file).
+
+    See Also
+    --------
+    load_household_lists
+    """
+    np.savez_compressed(
+        path,
+        name=np.array(lists["name"]),
+        keys=lists["keys"],
+        offsets=lists["offsets"],
+        values=lists["values"],
+        missing=lists["missing"],
+    )
+
+
+def _household_codes(values):
+    """Codes and sorted string keys of household IDs, with 5, 5.0 and '5' alike."""
+    codes, uniques = pd.factorize(values)
+    keys = pd.Series(uniques, dtype=object).astype(str)
+    keys = keys.str.replace(r"^(-?\d+)\.0*$", r"\1", regex=True)
+    key_codes, keys = pd.factorize(keys, sort=True)
+    # Missing IDs take the code -1, which picks the trailing -1
+    return np.append(key_codes, -1)[codes], np.asarray(keys).astype(str)
@@ -0,0 +1,340 @@
+import numpy as np
+import pandas as pd
+
+from pes_match.fingerprint import frame_fingerprint
+from pes_match.matching import (
+    _symmetric_swap_keys,
+    combine,
+    generate_matchkey,
+    run_single_matchkey,
+)
+
+
+def build_matchkey_index(df1, suffix_1, suffix_2, hh_id, level, matchkeys):
+    """
+    Builds an index of the first dataframe for every matchkey, so that
+    records that arrive later in the second dataframe can be matched without
+    rerunning every matchkey on the full data (see match_delta). Each record
+    is indexed by a hash of its matchkey variables. Numbers are hashed by
+    value, so keys stored with different dtypes in each dataframe (e.g.
+    int64 and float64) still agree.
+
+    Parameters
+    ----------
+    df1: pandas.DataFrame
+        The first dataframe being matched e.g. the cleaned census
+    suffix_1: str
+        Suffix used for columns in the first dataframe
+    suffix_2: str
+        Suffix used for columns in the second dataframe
+    hh_id: str
+        Name of household ID column (without suffixes)
+    level: str
+        Level of geography to include in every matchkey, unless a matchkey
+        supplies its own 'level'. Associative matchkeys cannot be indexed.
+    matchkeys: list of dict
+        One dict per matchkey, containing the run_single_matchkey arguments
+        for that matchkey e.g. {'variables': ['forename', 'dob']}.
+
+    Returns
+    -------
+    dict
+        Index containing a fingerprint of the df1 columns used and, for each
+        matchkey, the df1 columns used, sorted hashes and record positions.
+
+    See Also
+    --------
+    match_delta
+    save_matchkey_index
+
+    Example
+    --------
+    >>> import pandas as pd
+    >>> df1 = pd.DataFrame({'puid_1': [1, 2, 3],
+    ...                     'EA_1': [1, 1, 2],
+    ...                     'name_1': ['JOHN', 'PAUL', 'JOHN']})
+    >>> index = build_matchkey_index(df1, suffix_1='_1', suffix_2='_2',
+    ...                              hh_id='hid', level='EA',
+    ...                              matchkeys=[{'variables': ['name']}])
+    >>> index['columns']
+    [['name_1', 'EA_1']]
+    """
+    index = {"columns": [], "hashes": [], "rows": []}
+    for spec in matchkeys:
+        if spec.get("level", level) == "associative":
+            raise ValueError("Associative matchkeys cannot be indexed")
+        df1_link_vars, _ = _link_vars(suffix_1, suffix_2, hh_id, level, spec)
+        hashes = _hash_keys(df1, df1_link_vars)
+        order = np.argsort(hashes, kind="stable")
+        index["columns"].append(df1_link_vars)
+        index["hashes"].append(hashes[order])
+        index["rows"].append(order.astype(np.int64))
+    index["fingerprint"] = _fingerprint(df1, index["columns"])
+    return index
+
+
+def load_matchkey_index(path):
+    """
+    Loads a matchkey index saved with save_matchkey_index.
+
+    Parameters
+    ----------
+    path: str
+        Path to the saved index (.npz file).
+
+    Returns
+    -------
+    dict
+        Index in the same format as build_matchkey_index.
+
+    See Also
+    --------
+    save_matchkey_index
+    """
+    with np.load(path, allow_pickle=False) as data:
+        n_matchkeys = int(data["n_matchkeys"])
+        return {
+            "fingerprint": str(data["fingerprint"]),
+            "columns": [data[f"columns_{i}"].tolist() for i in range(n_matchkeys)],
+            "hashes": [data[f"hashes_{i}"] for i in range(n_matchkeys)],
+            "rows": [data[f"rows_{i}"] for i in range(n_matchkeys)],
+        }
+
+
+def match_delta(df1, delta, index, suffix_1, suffix_2, hh_id, level, matchkeys):
+    """
+    Matches new records from the second dataset against the first dataset,
+    using a matchkey index. Only records of df1 that share matchkey values
+    with the new records are joined. For each matchkey, the matches are the
+    same as the matches involving the new records from a full rerun of
+    run_single_matchkey.
+
+    Parameters
+    ----------
+    df1: pandas.DataFrame
+        The first dataframe being matched, as used in build_matchkey_index
+    delta: pandas.DataFrame
+        New records from the second dataset
+    index: dict
+        Index of df1 from build_matchkey_index or load_matchkey_index
+    suffix_1: str
+        Suffix used for columns in the first dataframe
+    suffix_2: str
+        Suffix used for columns in the second dataframe
+    hh_id: str
+        Name of household ID column (without suffixes)
+    level: str
+        Level of geography to include in every matchkey, unless a matchkey
+        supplies its own 'level'.
+    matchkeys: list of dict
+        The matchkeys used in build_matchkey_index.
+
+    Returns
+    -------
+    list of pandas.DataFrame
+        Matches for the new records from each matchkey, in matchkey order.
+
+    See Also
+    --------
+    build_matchkey_index
+    update_matches
+
+    Example
+    --------
+    >>> import pandas as pd
+    >>> df1 = pd.DataFrame({'puid_1': [1, 2, 3],
+    ...                     'EA_1': [1, 1, 2],
+    ...                     'name_1': ['JOHN', 'PAUL', 'JOHN']})
+    >>> matchkeys = [{'variables': ['name']}]
+    >>> index = build_matchkey_index(df1, suffix_1='_1', suffix_2='_2',
+    ...                              hh_id='hid', level='EA', matchkeys=matchkeys)
+    >>> delta = pd.DataFrame({'puid_2': [24], 'EA_2': [2], 'name_2': ['JOHN']})
+    >>> match_delta(df1, delta, index, suffix_1='_1', suffix_2='_2',
+    ...             hh_id='hid', level='EA', matchkeys=matchkeys)[0]
+       puid_1  EA_1 name_1  puid_2  EA_2 name_2
+    0       3     2   JOHN      24     2   JOHN
+    """
+    if (
+        len(index["columns"]) != len(matchkeys)
+        or _fingerprint(df1, index["columns"]) != index["fingerprint"]
+    ):
+        raise ValueError("Index was built for a different dataframe or matchkeys")
+    results = []
+    for i, spec in enumerate(matchkeys):
+        df1_link_vars, df2_link_vars = _link_vars(
+            suffix_1, suffix_2, hh_id, level, spec
+        )
+        if df1_link_vars != index["columns"][i]:
+            raise ValueError("Index was built for a different dataframe or matchkeys")
+        lookups = [df2_link_vars]
+        if spec.get("symmetric_swap"):
+            lookups.append(
+                _symmetric_swap_keys(
+                    suffix_1,
+                    suffix_2,
+                    hh_id,
+                    spec.get("level", level),
+                    spec["variables"],
+                    spec.get("swap_variables"),
+                )[1]
+            )
+        hashes = np.concatenate([_hash_keys(delta, cols) for cols in lookups])
+        rows = np.unique(_lookup(index["hashes"][i], index["rows"][i], hashes))
+        results.append(
+            run_single_matchkey(
+                df1=df1.iloc[rows],
+                df2=delta,
+                suffix_1=suffix_1,
+                suffix_2=suffix_2,
+                hh_id=hh_id,
+                level=spec.get("level", level),
+                **{key: value for key, value in spec.items() if key != "level"},
+            )
+        )
+    return results
+
+
+def save_matchkey_index(index, path):
+    """
+    Saves a matchkey index in compressed numpy format, so that later batches
+    of records can be matched without rebuilding it.
+
+    Parameters
+    ----------
+    index: dict
+        Index created with build_matchkey_index.
+    path: str
+        Path to save the index to (.npz file).
+
+    See Also
+    --------
+    load_matchkey_index
+    """
+    arrays = {
+        "fingerprint": np.array(index["fingerprint"]),
+        "n_matchkeys": np.int64(len(index["columns"])),
+    }
+    for i, (columns, hashes, rows) in enumerate(
+        zip(index["columns"], index["hashes"], index["rows"])
+    ):
+        arrays[f"columns_{i}"] = np.array(columns, dtype=str)
+        arrays[f"hashes_{i}"] = hashes
+        arrays[f"rows_{i}"] = rows
+    np.savez_compressed(path, **arrays)
+
+
+def update_matches(matches, delta_matches, person_id, suffix_1, suffix_2, keep):
+    """
+    Adds the matches for new records from match_delta to previously combined
+    matches. Pass the result to collect_uniques and collect_conflicts to
+    update which matches are unique and which go to clerical resolution:
+    these are identical to a full rerun, once sorted.
+
+    Parameters
+    ----------
+    matches: pandas.DataFrame
+        Previous output of combine (or update_matches).
+    delta_matches: list of pandas.DataFrame
+        Output of match_delta.
+    person_id: str
+        Name of person ID column (without suffixes)
+    suffix_1: str
+        Suffix used for columns in the first dataframe
+    suffix_2: str
+        Suffix used for columns in the second dataframe
+    keep: list of str
+        List of variables to retain (without suffixes)
+
+    Returns
+    -------
+    pandas.DataFrame
+        Combined matches, ordered by MK.
+
+    See Also
+    --------
+    combine
+    match_delta
+
+    Example
+    --------
+    >>> import pandas as pd
+    >>> matches = pd.DataFrame({'puid_1': [1, 2], 'puid_2': [21, 22],
+    ...                         'MK': [1, 2]})
+    >>> delta_matches = [pd.DataFrame({'puid_1': [3], 'puid_2': [23]}),
+    ...                  pd.DataFrame({'puid_1': [3, 2], 'puid_2': [23, 24]})]
+    >>> update_matches(matches, delta_matches, person_id='puid', suffix_1='_1',
+    ...                suffix_2='_2', keep=['puid'])
+       puid_1  puid_2  MK
+    0       1      21   1
+    1       3      23   1
+    2       2      22   2
+    3       2      24   2
+    """
+    id_2 = person_id + suffix_2
+    delta_ids = pd.concat([df[id_2] for df in delta_matches])
+    if delta_ids.isin(matches[id_2]).any():
+        raise ValueError("delta_matches contains records that were already matched")
+    new_matches = combine(
+        matchkeys=[df.copy() for df in delta_matches],
+        person_id=person_id,
+        suffix_1=suffix_1,
+        suffix_2=suffix_2,
+        keep=keep,
+    )
+    return (
+        pd.concat([matches, new_matches], axis=0)
+        .sort_values("MK", kind="stable")
+        .reset_index(drop=True)
+    )
+
+
+def _fingerprint(df1, columns):
+    """Fingerprint of the df1 columns used by a set of matchkeys."""
+    return frame_fingerprint(df1, list(dict.fromkeys(sum(columns, []))))
+
+
+def _hash_keys(df, columns):
+    """Hashes of matchkey values, with numbers of any dtype hashed alike."""
+    keys = {}
+    for i, col in enumerate(columns):
+        # Each distinct value is normalised and hashed once
+        codes, uniques = pd.factorize(df[col].to_numpy(), use_na_sentinel=False)
+        values = pd.Series(uniques)
+        if pd.api.types.is_numeric_dtype(values):
+            numbers = values.astype(np.float64)
+        else:
+            # Numbers stored as strings are not equal to numbers in a join
+            if pd.api.types.infer_dtype(values) == "string":
+                text = values.notna()
+            else:
+                text = values.map(lambda value: isinstance(value, str))
+            numbers = pd.to_numeric(values.mask(text), errors="coerce")
+            numbers = numbers.astype(np.float64)
+        hashes = pd.util.hash_pandas_object(numbers, index=False).to_numpy()
+        other = (numbers.isna() & values.notna()).to_numpy()
+        if other.any():
+            hashes[other] = pd.util.hash_pandas_object(
+                values[other].astype(str), index=False
+            ).to_numpy()
+        keys[i] = hashes[codes]
+    return pd.util.hash_pandas_object(pd.DataFrame(keys), index=False).to_numpy()
+
+
+def _link_vars(suffix_1, suffix_2, hh_id, level, spec):
+    """Matchkey columns in each dataframe for one matchkey."""
+    return generate_matchkey(
+        suffix_1=suffix_1,
+        suffix_2=suffix_2,
+        hh_id=hh_id,
+        level=spec.get("level", level),
+        variables=spec["variables"],
+        swap_variables=spec.get("swap_variables"),
+    )
+
+
+def _lookup(hashes, rows, values):
+    """Positions of every indexed record whose hash is in values."""
+    starts = np.searchsorted(hashes, values, side="left")
+    counts = np.searchsorted(hashes, values, side="right") - starts
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return rows[np.repeat(starts, counts) + offsets]
@@ -0,0 +1,222 @@
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from pes_match.cluster import cluster_number
+from pes_match.matching import combine, run_single_matchkey
+
+
+def link_sources(sources, matchkeys, person_id, hh_id, level, n_jobs=1):
+    """
+    Links more than two datasets (e.g. census, PES and administrative
+    registers) by running the same matchkeys between every pair of
+    sources, with pairs of sources run in parallel. The matchkey variables
+    of every source are encoded to integers once, with a dictionary shared
+    by all sources, so every pairwise join is on integer columns.
+
+    Parameters
+    ----------
+    sources: dict
+        One dataframe per source, keyed by the suffix used for the columns
+        of that source e.g. {'_cen': CEN, '_pes': PES, '_hlt': HEALTH}.
+    matchkeys: list of dict
+        One dict per matchkey, in order of matchkey strength, containing the
+        run_single_matchkey arguments for that matchkey. Variables are given
+        without suffixes, including in 'swap_variables' and
+        'lev_variables', e.g. {'variables': ['dob'],
+        'lev_variables': [('forename', 'forename', 0.8)]}.
+    person_id: str
+        Name of person ID column (without suffixes)
+    hh_id: str
+        Name of household ID column (without suffixes)
+    level: str
+        Level of geography to include in every matchkey, unless a matchkey
+        supplies its own 'level'. Associative matchkeys are not supported.
+    n_jobs: int, default = 1
+        Number of pairs of sources to link at the same time.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Combined matches from every pair of sources, with columns
+        'Source_1', person_id + '_1', 'Source_2', person_id + '_2' and 'MK'.
+
+    See Also
+    --------
+    source_clusters
+
+    Example
+    --------
+    >>> import pandas as pd
+    >>> sources = {
+    ...     '_cen': pd.DataFrame({'puid_cen': ['C1', 'C2'], 'EA_cen': [1, 1],
+    ...                           'name_cen': ['JOHN', 'ANN']}),
+    ...     '_pes': pd.DataFrame({'puid_pes': ['P1'], 'EA_pes': [1],
+    ...                           'name_pes': ['JOHN']}),
+    ...     '_hlt': pd.DataFrame({'puid_hlt': ['H1', 'H2'], 'EA_hlt': [1, 1],
+    ...                           'name_hlt': ['JOHN', 'ANN']})}
+    >>> link_sources(sources, matchkeys=[{'variables': ['name']}],
+    ...              person_id='puid', hh_id='hid', level='EA')
+      Source_1 puid_1 Source_2 puid_2  MK
+    0     _cen     C1     _pes     P1   1
+    1     _cen     C1     _hlt     H1   1
+    2     _cen     C2     _hlt     H2   1
+    3     _pes     P1     _hlt     H1   1
+    """
+    if any(spec.get("level", level) == "associative" for spec in matchkeys):
+        raise ValueError("Associative matchkeys cannot be used across sources")
+    encoded = _encode_sources(sources, matchkeys, person_id, level)
+
+    def link_pair(pair):
+        suffix_1, suffix_2 = pair
+        results = [
+            run_single_matchkey(
+                encoded[suffix_1],
+                encoded[suffix_2],
+                suffix_1,
+                suffix_2,
+                hh_id,
+                spec.get("level", level),
+                spec["variables"],
+                swap_variables=[
+                    (var_1 + suffix_1, var_2 + suffix_2)
+                    for var_1, var_2 in spec.get("swap_variables") or []
+                ],
+                lev_variables=[
+                    ("_raw_" + var_1 + suffix_1, "_raw_" + var_2 + suffix_2, threshold)
+                    for var_1, var_2, threshold in spec.get("lev_variables") or []
+                ],
+                age_threshold=spec.get("age_threshold"),
+            )
+            for spec in matchkeys
+        ]
+        matches = combine(results, person_id, suffix_1, suffix_2, keep=[person_id])
+        return pd.DataFrame(
+            {
+                "Source_1": suffix_1,
+                person_id + "_1": matches[person_id + suffix_1].to_numpy(),
+                "Source_2": suffix_2,
+                person_id + "_2": matches[person_id + suffix_2].to_numpy(),
+                "MK": matches["MK"].to_numpy(),
+            }
+        )
+
+    pairs = list(itertools.combinations(sources, 2))
+    with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+        results = list(executor.map(link_pair, pairs))
+    return pd.concat(results, ignore_index=True)
+
+
+def source_clusters(matches, person_id):
+    """
+    Groups records linked across any number of sources into clusters using
+    cluster_number, so that records linked directly or through records from
+    other sources share a cluster.
+
+    Parameters
+    ----------
+    matches: pandas.DataFrame
+        Output of link_sources.
+    person_id: str
+        Name of person ID column (without suffixes)
+
+    Returns
+    -------
+    pandas.DataFrame
+        One row per linked record, with columns 'Source_Dataset', person_id
+        and 'Cluster_Number', sorted by cluster.
+
+    See Also
+    --------
+    link_sources
+    cluster_number
+
+    Example
+    --------
+    >>> import pandas as pd
+    >>> matches = pd.DataFrame({'Source_1': ['_cen', '_pes', '_cen'],
+    ...                         'puid_1': ['C1', 'P1', 'C2'],
+    ...                         'Source_2': ['_pes', '_hlt', '_hlt'],
+    ...                         'puid_2': ['P1', 'H1', 'H2'],
+    ...                         'MK': [1, 1, 2]})
+    >>> source_clusters(matches, person_id='puid')
+      Source_Dataset puid  Cluster_Number
+    0           _cen   C1               1
+    1           _pes   P1               1
+    2           _hlt   H1               1
+    3           _cen   C2               2
+    4           _hlt   H2               2
+    """
+    # Records are numbered once, as IDs may repeat across sources
+    ends = [("Source_1", person_id + "_1"), ("Source_2", person_id + "_2")]
+    records = pd.concat(
+        [
+            matches[[source, id_column]].set_axis(["Source_Dataset", person_id], axis=1)
+            for source, id_column in ends
+        ],
+        ignore_index=True,
+    )
+    nodes = pd.MultiIndex.from_frame(records).factorize()[0]
+    edges = pd.DataFrame(
+        {
+            "node_1": nodes[: len(matches)],
+            "node_2": nodes[len(matches) :],
+            "edge": np.arange(len(matches)),
+        }
+    )
+    edges = cluster_number(edges, id_column="node", suffix_1="_1", suffix_2="_2")
+    clusters = edges.sort_values("edge")["Cluster_Number"].to_numpy()
+    records["Cluster_Number"] = np.tile(clusters, 2).astype(np.int64)
+    return (
+        records.drop_duplicates(["Source_Dataset", person_id])
+        .sort_values("Cluster_Number", kind="stable")
+        .reset_index(drop=True)
+    )
+
+
+def _encode_sources(sources, matchkeys, person_id, level):
+    """
+    Narrow copies of each source, with the matchkey variables encoded to
+    integers from one dictionary shared across sources and variables.
+    """
+    key_vars, raw_vars = set(), set()
+    for spec in matchkeys:
+        key_vars.update(spec["variables"])
+        key_vars.add(spec.get("level", level))
+        key_vars.update(
+            var for pair in spec.get("swap_variables") or [] for var in pair
+        )
+        raw_vars.update(
+            var for lev in spec.get("lev_variables") or [] for var in lev[:2]
+        )
+    # Ages are compared by difference, so are never encoded
+    if any(spec.get("age_threshold") for spec in matchkeys):
+        key_vars.discard("age")
+        extra_vars = ["age"]
+    else:
+        extra_vars = []
+    key_vars = sorted(key_vars)
+
+    values = pd.concat(
+        [
+            pd.Series(df[var + suffix].to_numpy(dtype=object))
+            for suffix, df in sources.items()
+            for var in key_vars
+        ],
+        ignore_index=True,
+    )
+    codes = pd.factorize(values, use_na_sentinel=False)[0]
+
+    encoded, start = {}, 0
+    for suffix, df in sources.items():
+        narrow = df[[person_id + suffix] + [var + suffix for var in extra_vars]].copy()
+        # Variables compared by edit distance are also kept as they are
+        for var in sorted(raw_vars):
+            narrow["_raw_" + var + suffix] = df[var + suffix]
+        for var in key_vars:
+            narrow[var + suffix] = codes[start : start + len(df)]
+            start += len(df)
+        encoded[suffix] = narrow
+    return encoded
@@ -1,4 +1,5 @@
 import jellyfish
+import numpy as np
 import pandas as pd
 
 
@@ -47,10 +48,7 @@ def age_diff_filter(df, age_1, age_2):
     1     25     22
     2     50     52
     """
-    df["Age_Diff"] = df[[age_1, age_2]].apply(
-        lambda x: age_tolerance((x[0]), (x[1])), axis=1
-    )
-    df = df[df.Age_Diff].drop(["Age_Diff"], axis=1)
+    df = df[_age_tolerance_mask(df[age_1], df[age_2])]
     df.reset_index(drop=True, inplace=True)
     return df
 
@@ -102,12 +100,13 @@ def age_tolerance(val1, val2):
     return False
 
 
-def combine(matchkeys, person_id, suffix_1, suffix_2, keep):
+def combine(matchkeys, person_id, suffix_1, suffix_2, keep, flags=False):
     """
     Takes results from a set of matchkeys and combines into a
     single deduplicated dataframe. If duplicate matches are made
     across matchkeys, the version with the lowest matchkey
-    number is retained.
+    number is retained. Optionally, a bitmask of every matchkey
+    that made each match can also be retained.
 
     Parameters
     ----------
@@ -123,6 +122,17 @@ def combine(matchkeys, person_id, suffix_1, suffix_2, keep):
     keep: list of str
         List of variables to retain. Suffixes not required.
         New matchkey column "MK" will also be retained
+    flags: bool, default = False
+        If True, an additional column "MK_Flags" is retained, recording
+        every matchkey that made each match as a bitmask (bit 0 for
+        matchkey 1, bit 1 for matchkey 2 etc.). "MK" is unchanged and is
+        always the first set bit. The bitmask is uint32 for up to 32
+        matchkeys and uint64 for up to 64 matchkeys.
+
+    Raises
+    ------
+    ValueError
+        if flags is True and more than 64 matchkeys are supplied.
 
     See Also
     --------
@@ -171,7 +181,39 @@ def combine(matchkeys, person_id, suffix_1, suffix_2, keep):
     5       3    STEVE      30    STEUE   2
     6       6     MARK      31     MARL   2
     7       7     DAVE      32     DAVE   2
+    >>> matches = combine(matchkeys=[mk1, mk2], suffix_1="_1", suffix_2="_2",
+    ...                   person_id="puid", keep=['puid'], flags=True)
+    >>> matches.head(n=8)
+       puid_1  puid_2  MK  MK_Flags
+    0       1      21   1         3
+    1       2      22   1         3
+    2       3      23   1         1
+    3       4      24   1         1
+    4       5      25   1         1
+    5       3      30   2         2
+    6       6      31   2         2
+    7       7      32   2         2
     """
+    # With no matchkeys there are no matches to flag
+    if flags and matchkeys:
+        if len(matchkeys) > 64:
+            raise ValueError("flags can only be recorded for up to 64 matchkeys")
+        flag_type = np.uint32 if len(matchkeys) <= 32 else np.uint64
+        ids = [person_id + suffix_1, person_id + suffix_2]
+        mk_flags = pd.concat(
+            [matches[ids].assign(MK=i + 1) for i, matches in enumerate(matchkeys)],
+            axis=0,
+        ).drop_duplicates()
+        mk_flags["MK_Flags"] = np.left_shift(
+            np.uint64(1), (mk_flags["MK"] - 1).to_numpy(dtype=np.uint64)
+        )
+        # Each bit appears at most once per pair, so the group sum is a group OR
+        mk_flags = (
+            mk_flags.groupby(ids, sort=False)["MK_Flags"]
+            .sum()
+            .astype(flag_type)
+            .reset_index()
+        )
     df = pd.DataFrame()
     for i, matches in enumerate(matchkeys):
         matches["MK"] = i + 1
@@ -182,9 +224,158 @@ def combine(matchkeys, person_id, suffix_1, suffix_2, keep):
         df = df[df.Min_MK == df.MK].drop(["Min_MK"], axis=1)
         df = df[[x + suffix_1 for x in keep] + [x + suffix_2 for x in keep] + ["MK"]]
         df = df.reset_index(drop=True)
+    if flags and matchkeys:
+        df = df.merge(mk_flags, on=ids, how="left")
     return df
 
 
+def combine_stream(matchkeys, person_id, suffix_1, suffix_2, keep):
+    """
+    Combines matches from streamed matchkeys, such as those from
+    iter_single_matchkey, one chunk at a time. Each chunk is reduced to the
+    keep variables and yielded as soon as it is read, without pairs already
+    found by a stronger matchkey. Only the ID pairs found so far are held in
+    memory. Together, the chunks are the same as combine on the concatenated
+    chunks of each matchkey.
+
+    Parameters
+    ----------
+    matchkeys: list of iterables
+        One iterable of pandas.DataFrame chunks per matchkey,
+        in order of matchkey strength.
+    person_id: str
+        Name of person ID column (without suffixes)
+    suffix_1: str
+        Suffix used for columns in the first dataframe
+    suffix_2: str
+        Suffix used for columns in the second dataframe
+    keep: list of str
+        List of variables to retain (without suffixes)
+
+    Yields
+    ------
+    pandas.DataFrame
+        Chunks of combined matches, in the same format as combine.
+        Empty chunks are not yielded.
+
+    See Also
+    --------
+    combine
+    iter_single_matchkey
+
+    Example
+    --------
+    >>> import pandas as pd
+    >>> mk1 = [pd.DataFrame({'puid_1': [1, 2], 'puid_2': [21, 22]}),
+    ...        pd.DataFrame({'puid_1': [3], 'puid_2': [23]})]
+    >>> mk2 = [pd.DataFrame({'puid_1': [1, 4], 'puid_2': [21, 24]})]
+    >>> chunks = combine_stream(matchkeys=[mk1, mk2], person_id='puid',
+    ...                         suffix_1='_1', suffix_2='_2', keep=['puid'])
+    >>> pd.concat(chunks, ignore_index=True)
+       puid_1  puid_2  MK
+    0       1      21   1
+    1       2      22   1
+    2       3      23   1
+    3       4      24   2
+    """
+    ids = [person_id + suffix_1, person_id + suffix_2]
+    columns = [x + suffix_1 for x in keep] + [x + suffix_2 for x in keep] + ["MK"]
+    seen = None
+    for i, chunks in enumerate(matchkeys):
+        # Pairs of this matchkey are only excluded from weaker matchkeys
+        current = []
+        for chunk in chunks:
+            chunk = chunk.assign(MK=i + 1)[columns]
+            pairs = pd.MultiIndex.from_frame(chunk[ids])
+            if seen is not None:
+                new = ~pairs.isin(seen)
+                chunk, pairs = chunk[new], pairs[new]
+            if len(chunk):
+                current.append(pairs.unique())
+                yield chunk.reset_index(drop=True)
+        for pairs in current:
+            seen = pairs if seen is None else seen.union(pairs)
+
+
+def filter_matches(
+    df, suffix_1, suffix_2, lev_variables=None, age_threshold=None, keep_scores=False
+):
+    """
+    Applies the partial agreement (std_lev_filter) and age (age_diff_filter)
+    filters of a matchkey in a single pass. Each filter is evaluated as a
+    boolean mask, cheapest and most selective first: the age filter, then
+    the edit distance filters in order of decreasing threshold. Edit
+    distances are only calculated for record pairs that have passed every
+    earlier filter, and the filtered dataframe is only created once.
+
+    Parameters
+    ----------
+    df: pandas.DataFrame
+        The dataframe to which the function is applied.
+    suffix_1: str
+        Suffix used for columns in the first dataset
+    suffix_2: str
+        Suffix used for columns in the second dataset
+    lev_variables: list of tuple, optional
+        Edit distance filters to apply, one tuple per filter.
+        For example, to apply to forenames (threshold = 0.80):
+        lev_variables = [('forename_1', 'forename_2', 0.80)]
+    age_threshold: bool, optional
+        If True, the age tolerances from age_diff_filter are applied to
+        "age" + suffix_1 and "age" + suffix_2.
+    keep_scores: bool, default = False
+        If True, the edit distance score for each tuple in lev_variables is
+        retained in a float32 column named "EDIT_" + the first column name.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Filtered pandas dataframe, identical to applying std_lev_filter
+        for each tuple in lev_variables followed by age_diff_filter.
+
+    See Also
+    --------
+    age_diff_filter
+    std_lev_filter
+    run_single_matchkey
+
+    Example
+    --------
+    >>> import pandas as pd
+    >>> df = pd.DataFrame({'name_1': ['CHARLES', 'JOHN', 'C', 'PAUL'],
+    ...                    'name_2': ['CHARLIE', 'JON', 'CHARLIE', 'PAUL'],
+    ...                    'age_1': [5, 15, 25, 50],
+    ...                    'age_2': [5, 20, 25, 52]})
+    >>> filter_matches(df, suffix_1='_1', suffix_2='_2',
+    ...                lev_variables=[('name_1', 'name_2', 0.60)],
+    ...                age_threshold=True, keep_scores=True)
+        name_1   name_2  age_1  age_2  EDIT_name_1
+    0  CHARLES  CHARLIE      5      5     0.714286
+    1     PAUL     PAUL     50     52     1.000000
+    """
+    lev_variables = lev_variables or []
+    mask = np.ones(len(df), dtype=bool)
+    if age_threshold:
+        mask &= _age_tolerance_mask(df["age" + suffix_1], df["age" + suffix_2])
+    scores = {}
+    for col_1, col_2, threshold in sorted(lev_variables, key=lambda x: -x[2]):
+        rows = np.flatnonzero(mask)
+        if keep_scores:
+            scores["EDIT_" + col_1] = np.full(len(df), np.nan, dtype=np.float32)
+        # Pairs already removed by an earlier filter are not scored
+        if len(rows) == 0:
+            continue
+        score = _std_lev_scores(df.iloc[rows], col_1, col_2)
+        mask[rows] = score >= threshold
+        if keep_scores:
+            scores["EDIT_" + col_1][rows] = score
+    df = df[mask]
+    if keep_scores:
+        names = dict.fromkeys("EDIT_" + i[0] for i in lev_variables)
+        df = df.assign(**{name: scores[name][mask] for name in names})
+    return df.reset_index(drop=True)
+
+
 def generate_matchkey(
     suffix_1,
     suffix_2,
@@ -419,6 +610,154 @@ def get_residuals(all_records, matched_records, id_column):
     return df
 
 
+def iter_single_matchkey(
+    df1,
+    df2,
+    suffix_1,
+    suffix_2,
+    hh_id,
+    level,
+    variables,
+    swap_variables=None,
+    lev_variables=None,
+    age_threshold=None,
+    keep_scores=False,
+    symmetric_swap=False,
+    chunk_size=1000000,
+):
+    """
+    Streaming version of run_single_matchkey. Records are matched block by
+    block (one level of geography, or household pair if level='associative',
+    at a time) and filtered matches are yielded in chunks, so the full set
+    of candidate pairs is never held in memory at once.
+
+    Parameters
+    ----------
+    df1: pandas.DataFrame
+        The first dataframe being matched
+    df2: pandas.DataFrame
+        The second dataframe being matched
+    suffix_1: str
+        Suffix used for columns in the first dataframe
+    suffix_2: str
+        Suffix used for columns in the second dataframe
+    hh_id: str
+        Name of household ID column in df1 and df2 (without suffixes)
+        Required when level='associative'.
+    level: str
+        Level of geography to include in the matchkey e.g. household, EA etc.
+        If level = 'associative' then an associative matchkey is applied instead.
+    variables: list of str
+        List of variables to use in matchkey rule (exluding level of geography)
+    swap_variables: list of tuple, optional
+        See run_single_matchkey.
+    lev_variables: list of tuple, optional
+        See run_single_matchkey.
+    age_threshold: bool, optional
+        See run_single_matchkey.
+    keep_scores: bool, default = False
+        See run_single_matchkey.
+    symmetric_swap: bool, default = False
+        See run_single_matchkey.
+    chunk_size: int, default = 1000000
+        Maximum number of candidate pairs joined for each chunk, before
+        filtering. A chunk can only be larger when a single df1 record has
+        more candidates than this. Candidates are counted on the swapped
+        variables, so symmetric_swap chunks may be larger.
+
+    Yields
+    ------
+    pandas.DataFrame
+        Chunks of matches. Together, the chunks contain the same matches as
+        run_single_matchkey, in block order. Empty chunks are not yielded.
+
+    See Also
+    --------
+    run_single_matchkey
+    combine_stream
+
+    Example
+    --------
+    >>> import pandas as pd
+    >>> df1 = pd.DataFrame({'puid_1': [1, 2, 3],
+    ...                     'EA_1': [1, 2, 2],
+    ...                     'name_1': ['JOHN', 'PAUL', 'ANN']})
+    >>> df2 = pd.DataFrame({'puid_2': [21, 22, 23],
+    ...                     'EA_2': [2, 1, 2],
+    ...                     'name_2': ['PAUL', 'JOHN', 'ANN']})
+    >>> for chunk in iter_single_matchkey(df1, df2, suffix_1='_1', suffix_2='_2',
+    ...                                   hh_id='hid', level='EA',
+    ...                                   variables=['name'], chunk_size=1):
+    ...     print(chunk[['puid_1', 'puid_2']])
+       puid_1  puid_2
+    0       1      22
+       puid_1  puid_2
+    0       2      21
+       puid_1  puid_2
+    0       3      23
+    """
+    df1_link_vars, df2_link_vars = generate_matchkey(
+        suffix_1=suffix_1,
+        suffix_2=suffix_2,
+        hh_id=hh_id,
+        level=level,
+        variables=variables,
+        swap_variables=swap_variables,
+    )
+    if level == "associative":
+        block_1 = block_2 = [hh_id + suffix_1, hh_id + suffix_2]
+    else:
+        block_1, block_2 = [level + suffix_1], [level + suffix_2]
+
+    # Number each block, then sort both dataframes so blocks are contiguous
+    names = [f"_block_{i}" for i in range(len(block_1))]
+    blocks = pd.concat(
+        [df1[block_1].set_axis(names, axis=1), df2[block_2].set_axis(names, axis=1)],
+        ignore_index=True,
+    )
+    codes = blocks.groupby(names, sort=False, dropna=False).ngroup().to_numpy()
+    codes_1, codes_2 = codes[: len(df1)], codes[len(df1) :]
+    order_1 = np.argsort(codes_1, kind="stable")
+    order_2 = np.argsort(codes_2, kind="stable")
+    codes_1, codes_2 = codes_1[order_1], codes_2[order_2]
+
+    # Candidate pairs for each df1 record, from counts of df2 matchkey values
+    counts_2 = pd.util.hash_pandas_object(df2[df2_link_vars], index=False)
+    counts_2 = counts_2.value_counts()
+    candidates = (
+        pd.util.hash_pandas_object(df1[df1_link_vars], index=False)
+        .map(counts_2)
+        .fillna(0)
+        .to_numpy(dtype=np.int64)[order_1]
+    )
+    cumulative = np.concatenate([[0], np.cumsum(candidates)])
+
+    start = 0
+    while start < len(df1):
+        end = np.searchsorted(cumulative, cumulative[start] + chunk_size, "right")
+        end = max(end - 1, start + 1)
+        if cumulative[end] > cumulative[start]:
+            first = np.searchsorted(codes_2, codes_1[start], side="left")
+            last = np.searchsorted(codes_2, codes_1[end - 1], side="right")
+            matches = run_single_matchkey(
+                df1.iloc[order_1[start:end]],
+                df2.iloc[order_2[first:last]],
+                suffix_1,
+                suffix_2,
+                hh_id,
+                level,
+                variables,
+                swap_variables=swap_variables,
+                lev_variables=lev_variables,
+                age_threshold=age_threshold,
+                keep_scores=keep_scores,
+                symmetric_swap=symmetric_swap,
+            )
+            if len(matches):
+                yield matches
+        start = end
+
+
 def mult_match(df, hh_id_1, hh_id_2):
     """
     Filters a set of matched records by retaining only those where 2 or
@@ -439,14 +778,262 @@ def mult_match(df, hh_id_1, hh_id_2):
         Retains cases where mutliple matches have been made between two households.
         Other cases are discarded.
     """
-    counts = pd.DataFrame(df[[hh_id_1, hh_id_2]].value_counts()).reset_index()
-    counts.columns = [hh_id_1, hh_id_2, "count"]
-    df = df.merge(counts, on=[hh_id_1, hh_id_2], how="left")
-    df = df[df["count"] > 1].drop(["count"], axis=1)
+    pair_codes = df.groupby([hh_id_1, hh_id_2], sort=False).ngroup()
+    pair_codes = pair_codes.fillna(-1).to_numpy(dtype=np.int64)
+    counts = np.bincount(pair_codes[pair_codes >= 0], minlength=1)
+    df = df[(pair_codes >= 0) & (counts[pair_codes] > 1)]
     df.reset_index(drop=True, inplace=True)
     return df
 
 
+def plan_matchkeys(
+    df1, df2, suffix_1, suffix_2, hh_id, level, matchkeys, max_candidates=10000000
+):
+    """
+    Groups a set of matchkeys by the blocking variables they share, so that
+    each group can be evaluated from a single join on its shared (coarse)
+    blocking key. A matchkey is only added to a group if the estimated number
+    of candidate pairs from the coarser join stays within max_candidates.
+    Otherwise it is placed in a new group, joined on its own variables.
+
+    Parameters
+    ----------
+    df1: pandas.DataFrame
+        The first dataframe being matched
+    df2: pandas.DataFrame
+        The second dataframe being matched
+    suffix_1: str
+        Suffix used for columns in the first dataframe
+    suffix_2: str
+        Suffix used for columns in the second dataframe
+    hh_id: str
+        Name of household ID column in df1 and df2 (without suffixes)
+        Required when level='associative'.
+    level: str
+        Level of geography to include in every matchkey, unless a matchkey
+        supplies its own 'level'.
+    matchkeys: list of dict
+        One dict per matchkey, containing the run_single_matchkey arguments
+        for that matchkey e.g. {'variables': ['forename', 'dob']}.
+        Optional keys are 'level', 'swap_variables', 'lev_variables',
+        'age_threshold' and 'keep_scores'. 'symmetric_swap' is not supported.
+    max_candidates: int, default = 10000000
+        Maximum number of candidate pairs allowed from a shared join.
+
+    Returns
+    -------
+    list of dict
+        One dict per group with keys 'matchkeys' (positions of the matchkeys
+        in the group), 'block' (list of column pairs joined on), 'conditions'
+        (list of remaining column pairs for each matchkey in the group) and
+        'candidates' (estimated number of candidate pairs from the join).
+
+    See Also
+    --------
+    run_matchkey_lattice
+
+    Example
+    --------
+    >>> import pandas as pd
+    >>> df1 = pd.DataFrame({'name_1': ['JOHN', 'JOHN', 'PAUL'],
+    ...                     'dob_1': ['01/2000', '02/2000', '03/1990'],
+    ...                     'year_1': ['2000', '2000', '1990'],
+    ...                     'EA_1': [1, 1, 1]})
+    >>> df2 = pd.DataFrame({'name_2': ['JOHN', 'PAUL'],
+    ...                     'dob_2': ['01/2000', '04/1990'],
+    ...                     'year_2': ['2000', '1990'],
+    ...                     'EA_2': [1, 1]})
+    >>> plan = plan_matchkeys(df1, df2, suffix_1='_1', suffix_2='_2',
+    ...                       hh_id='hid', level='EA',
+    ...                       matchkeys=[{'variables': ['name', 'dob']},
+    ...                                  {'variables': ['name', 'year']}])
+    >>> len(plan)
+    1
+    >>> plan[0]['block']
+    [('name_1', 'name_2'), ('EA_1', 'EA_2')]
+    >>> plan[0]['conditions']
+    [[('dob_1', 'dob_2')], [('year_1', 'year_2')]]
+    """
+    estimates = {}
+
+    def estimate(block):
+        key = frozenset(block)
+        if key not in estimates:
+            estimates[key] = _estimate_candidates(df1, df2, block)
+        return estimates[key]
+
+    all_pairs = [
+        _matchkey_pairs(suffix_1, suffix_2, hh_id, level, spec) for spec in matchkeys
+    ]
+    plan = []
+    for i, pairs in enumerate(all_pairs):
+        required = {pair for pair in pairs if pair[0] == pair[1]}
+        best = None
+        for group in plan:
+            block = [pair for pair in group["block"] if pair in pairs]
+            if (
+                not block
+                or not (group["required"] | required).issubset(block)
+                or (best is not None and len(block) <= len(best[1]))
+            ):
+                continue
+            if estimate(block) <= max_candidates:
+                best = (group, block)
+        if best is None:
+            plan.append({"matchkeys": [i], "block": pairs, "required": required})
+        else:
+            best[0]["matchkeys"].append(i)
+            best[0]["block"] = best[1]
+            best[0]["required"] = best[0]["required"] | required
+    for group in plan:
+        del group["required"]
+        group["conditions"] = [
+            [pair for pair in all_pairs[i] if pair not in group["block"]]
+            for i in group["matchkeys"]
+        ]
+        group["candidates"] = estimate(group["block"])
+    return plan
+
+
+def run_matchkey_lattice(
+    df1, df2, suffix_1, suffix_2, hh_id, level, matchkeys, max_candidates=10000000
+):
+    """
+    Collects matches from a set of matchkeys, sharing work between matchkeys
+    that have blocking variables in common. Matchkeys are grouped using
+    plan_matchkeys, each group is joined once on its shared blocking key and
+    the remaining agreement conditions of each matchkey are then evaluated
+    as boolean masks on that shared set of candidates. Partial agreement and
+    age filters are then applied to each matchkey as in run_single_matchkey.
+
+    Parameters
+    ----------
+    df1: pandas.DataFrame
+        The first dataframe being matched
+    df2: pandas.DataFrame
+        The second dataframe being matched
+    suffix_1: str
+        Suffix used for columns in the first dataframe
+    suffix_2: str
+        Suffix used for columns in the second dataframe
+    hh_id: str
+        Name of household ID column in df1 and df2 (without suffixes)
+        Required when level='associative'.
+    level: str
+        Level of geography to include in every matchkey, unless a matchkey
+        supplies its own 'level'.
+    matchkeys: list of dict
+        One dict per matchkey, containing the run_single_matchkey arguments
+        for that matchkey e.g. {'variables': ['forename', 'dob']}.
+        Optional keys are 'level', 'swap_variables', 'lev_variables',
+        'age_threshold' and 'keep_scores'.
+    max_candidates: int, default = 10000000
+        Maximum number of candidate pairs allowed from a shared join.
+        Matchkeys that would exceed this are joined separately.
+
+    Returns
+    -------
+    list of pandas.DataFrame
+        All matches made from each matchkey, in the same order as matchkeys.
+        Each dataframe contains the same pairs as run_single_matchkey and can
+        be passed directly to combine.
+
+    See Also
+    --------
+    plan_matchkeys
+    run_single_matchkey
+    combine
+    """
+    results = [None] * len(matchkeys)
+    plan = plan_matchkeys(
+        df1, df2, suffix_1, suffix_2, hh_id, level, matchkeys, max_candidates
+    )
+    for group in plan:
+        group_matches = _run_lattice_group(
+            df1, df2, suffix_1, suffix_2, matchkeys, group
+        )
+        for i, matches in zip(group["matchkeys"], group_matches):
+            results[i] = matches
+    return results
+
+
+def run_self_matchkey(
+    df,
+    suffix,
+    level,
+    variables,
+    lev_variables=None,
+    age_threshold=None,
+    keep_scores=False,
+):
+    """
+    Function to collect duplicate records within a single dataframe from a
+    chosen matchkey. The dataframe is joined to itself and only pairs of
+    different records are kept, each pair once (the record that comes first
+    in df is on the left), so there are no self or mirrored pairs.
+    Columns from the two records are suffixed with "_1" and "_2", so
+    the output can be combined with combine and clustered with
+    cluster_number using the suffixes suffix + "_1" and suffix + "_2".
+
+    Parameters
+    ----------
+    df: pandas.DataFrame
+        The dataframe to deduplicate
+    suffix: str
+        Suffix used for columns in df
+    level: str
+        Level of geography to include in the matchkey e.g. household, EA etc.
+    variables: list of str
+        List of variables to use in matchkey rule (exluding level of geography)
+    lev_variables: list of tuple, optional
+        Use if you want to apply the std_lev_filter function within the
+        matchkey. Column names include both suffixes e.g.
+        lev_variables = [('forename_cen_1', 'forename_cen_2', 0.80)]
+    age_threshold: bool, optional
+        Use if you want to apply the age_diff_filter function within the matchkey.
+        To apply, simply set age_threshold = True
+    keep_scores: bool, default = False
+        See run_single_matchkey.
+
+    Returns
+    -------
+    matches: pandas.DataFrame
+        All pairs of duplicate records made from chosen matchkey
+
+    See Also
+    --------
+    run_single_matchkey
+    combine
+    cluster_number
+
+    Example
+    --------
+    >>> import pandas as pd
+    >>> df = pd.DataFrame({'puid_cen': ['C1', 'C2', 'C3', 'C4'],
+    ...                    'Eaid_cen': [1, 1, 1, 2],
+    ...                    'name_cen': ['JOHN', 'PAUL', 'JOHN', 'JOHN']})
+    >>> run_self_matchkey(df, suffix='_cen', level='Eaid', variables=['name'])
+      puid_cen_1  Eaid_cen_1 name_cen_1 puid_cen_2  Eaid_cen_2 name_cen_2
+    0         C1           1       JOHN         C3           1       JOHN
+    """
+    if level == "associative":
+        raise ValueError("Associative matchkeys cannot be used within a dataframe")
+    keys = [var + suffix for var in variables] + [level + suffix]
+    narrow = df[keys].assign(_row=np.arange(len(df)))
+    pairs = pd.merge(narrow, narrow, how="inner", on=keys, suffixes=("_1", "_2"))
+    pairs = pairs[pairs["_row_1"] < pairs["_row_2"]].sort_values(["_row_1", "_row_2"])
+    matches = pd.concat(
+        [
+            df.iloc[pairs["_row_1"]].add_suffix("_1").reset_index(drop=True),
+            df.iloc[pairs["_row_2"]].add_suffix("_2").reset_index(drop=True),
+        ],
+        axis=1,
+    )
+    return filter_matches(
+        matches, suffix + "_1", suffix + "_2", lev_variables, age_threshold, keep_scores
+    )
+
+
 def run_single_matchkey(
     df1,
     df2,
@@ -458,6 +1045,8 @@ def run_single_matchkey(
     swap_variables=None,
     lev_variables=None,
     age_threshold=None,
+    keep_scores=False,
+    symmetric_swap=False,
 ):
     """
     Function to collect matches from a chosen matchkey.
@@ -496,6 +1085,18 @@ def run_single_matchkey(
     age_threshold: bool, optional
         Use if you want to apply the age_diff_filter function within the matchkey.
         To apply, simply set age_threshold = True
+    keep_scores: bool, default = False
+        If True, the edit distance score for each tuple in lev_variables is
+        retained in a float32 column named "EDIT_" + the first column name
+        e.g. "EDIT_forename_1".
+    symmetric_swap: bool, default = False
+        If True, pairs are matched on the swapped variables or on the same
+        variables without swapping, in a single join. For example, with
+        swap_variables = [('forename_1', 'surname_2'), ('surname_1', 'forename_2')]
+        names agree either as recorded or transposed. An 'Orientation'
+        column records whether each pair matched the 'normal' or 'swapped'
+        variables, or 'both'. Requires swap_variables, each pairing one
+        column from df1 with one column from df2.
 
     Returns
     -------
@@ -505,9 +1106,40 @@ def run_single_matchkey(
     See Also
     --------
     generate_matchkey
+    filter_matches
     std_lev_filter
     age_diff_filter
+
+    Example
+    --------
+    >>> import pandas as pd
+    >>> df1 = pd.DataFrame({'puid_1': [1, 2, 3],
+    ...                     'EA_1': [1, 1, 1],
+    ...                     'forename_1': ['JOHN', 'SMITH', 'ANN'],
+    ...                     'surname_1': ['SMITH', 'JOHN', 'ANN']})
+    >>> df2 = pd.DataFrame({'puid_2': [21, 22],
+    ...                     'EA_2': [1, 1],
+    ...                     'forename_2': ['JOHN', 'ANN'],
+    ...                     'surname_2': ['SMITH', 'ANN']})
+    >>> matches = run_single_matchkey(
+    ...     df1, df2, suffix_1='_1', suffix_2='_2', hh_id='hid', level='EA',
+    ...     variables=[],
+    ...     swap_variables=[('forename_1', 'surname_2'),
+    ...                     ('surname_1', 'forename_2')],
+    ...     symmetric_swap=True)
+    >>> matches[['puid_1', 'puid_2', 'Orientation']]
+       puid_1  puid_2 Orientation
+    0       1      21      normal
+    1       2      21     swapped
+    2       3      22        both
     """
+    if symmetric_swap:
+        matches = _symmetric_swap_pairs(
+            df1, df2, suffix_1, suffix_2, hh_id, level, variables, swap_variables
+        )
+        return filter_matches(
+            matches, suffix_1, suffix_2, lev_variables, age_threshold, keep_scores
+        )
     link_vars = generate_matchkey(
         suffix_1=suffix_1,
         suffix_2=suffix_2,
@@ -521,12 +1153,9 @@ def run_single_matchkey(
     matches = pd.merge(
         left=df1, right=df2, how="inner", left_on=df1_link_vars, right_on=df2_link_vars
     )
-    if lev_variables:
-        for i in lev_variables:
-            matches = std_lev_filter(matches, i[0], i[1], i[2])
-    if age_threshold:
-        matches = age_diff_filter(matches, "age" + suffix_1, "age" + suffix_2)
-    return matches
+    return filter_matches(
+        matches, suffix_1, suffix_2, lev_variables, age_threshold, keep_scores
+    )
 
 
 def std_lev(string1, string2):
@@ -573,7 +1202,7 @@ def std_lev(string1, string2):
     return 1 - (lev / max_length)
 
 
-def std_lev_filter(df, column1, column2, threshold):
+def std_lev_filter(df, column1, column2, threshold, score_column=None):
     """
     Filters a set of matched records to keep only records where names
     have a similarity greater than a chosen threshold.
@@ -589,6 +1218,9 @@ def std_lev_filter(df, column1, column2, threshold):
     threshold: float
         Record pairs with a std levenstein edit distance
         Below this threshold will be discarded
+    score_column: str, optional
+        If supplied, the edit distance score is retained in a float32
+        column with this name.
 
     Returns
     -------
@@ -601,6 +1233,8 @@ def std_lev_filter(df, column1, column2, threshold):
     std_lev
         Function that compares two strings (usually names) and returns
         the standardised levenstein edit distance score, between 0 and 1.
+    std_lev_score
+        Adds the score without filtering.
 
     Example
     --------
@@ -621,9 +1255,305 @@ def std_lev_filter(df, column1, column2, threshold):
     0  CHARLES  CHARLIE
     1  CH4RL1E  CHARLIE
     """
-    df["EDIT"] = df[[column1, column2]].apply(
-        lambda x: std_lev(str(x[0]), str(x[1])), axis=1
-    )
-    df = df[df.EDIT >= threshold].drop(["EDIT"], axis=1)
+    scores = _std_lev_scores(df, column1, column2)
+    mask = scores >= threshold
+    df = df[mask]
+    if score_column is not None:
+        df = df.assign(**{score_column: scores[mask].astype(np.float32)})
     df.reset_index(drop=True, inplace=True)
     return df
+
+
+def std_lev_score(df, column1, column2, output_col):
+    """
+    Adds the standardised levenstein edit distance score between two
+    columns to a set of matched records, without filtering. Each distinct
+    pair of values is only scored once. Scores are stored as float32.
+
+    Parameters
+    ----------
+    df: pandas.DataFrame
+        The dataframe to which the function is applied.
+    column1: str
+        Name column (string type) from first dataset
+    column2: str
+        Name column (string type) from second dataset
+    output_col: str
+        Name of score column to be output
+
+    Returns
+    -------
+    pandas.DataFrame
+        Pandas dataframe with score column output_col appended.
+
+    See Also
+    --------
+    std_lev_filter
+    std_lev_sweep
+
+    Example
+    --------
+    >>> import pandas as pd
+    >>> df = pd.DataFrame({'name_1': ['CHARLES', None, 'CHARLES'],
+    ...                    'name_2': ['CHARLIE', 'CHARLIE', 'CHARLIE']})
+    >>> df = std_lev_score(df, column1='name_1', column2='name_2',
+    ...                    output_col='name_lev')
+    >>> df.head(n=3)
+        name_1   name_2  name_lev
+    0  CHARLES  CHARLIE  0.714286
+    1     None  CHARLIE  0.000000
+    2  CHARLES  CHARLIE  0.714286
+    >>> df.dtypes['name_lev']
+    dtype('float32')
+    """
+    df[output_col] = _std_lev_scores(df, column1, column2).astype(np.float32)
+    return df
+
+
+def std_lev_sweep(df, score_columns, thresholds):
+    """
+    Applies a range of thresholds to score columns that have already been
+    added using std_lev_score, so that many thresholds can be compared from
+    a single scoring pass. Record pairs are kept for a threshold if every
+    score column is greater than or equal to that threshold.
+
+    Scores and thresholds are compared as float64, after rounding each
+    threshold to the dtype of its score column. A float32 score column
+    therefore gives the same pairs as std_lev_filter at that threshold,
+    unless the threshold lies within float32 rounding (about 1e-7) of a
+    score.
+
+    Parameters
+    ----------
+    df: pandas.DataFrame
+        The dataframe to which the function is applied.
+    score_columns: str or list of str
+        Name(s) of score columns from std_lev_score
+    thresholds: list of float or list of tuple
+        Thresholds to apply. Use a tuple containing one threshold per score
+        column to apply different thresholds to each score column.
+
+    Returns
+    -------
+    counts: pandas.DataFrame
+        Number of record pairs kept at each threshold
+    views: dict
+        Filtered pandas dataframe for each threshold, keyed by threshold.
+        The index of df is retained.
+
+    See Also
+    --------
+    std_lev_score
+
+    Example
+    --------
+    >>> import pandas as pd
+    >>> df = pd.DataFrame({'name_1': ['CHARLES', 'C', 'CH4RL1E'],
+    ...                    'name_2': ['CHARLIE', 'CHARLIE', 'CHARLIE']})
+    >>> df = std_lev_score(df, column1='name_1', column2='name_2',
+    ...                    output_col='name_lev')
+    >>> counts, views = std_lev_sweep(df, score_columns='name_lev',
+    ...                               thresholds=[0.1, 0.6, 0.9])
+    >>> counts
+       Threshold  Pairs
+    0        0.1      3
+    1        0.6      2
+    2        0.9      0
+    >>> views[0.6]
+        name_1   name_2  name_lev
+    0  CHARLES  CHARLIE  0.714286
+    2  CH4RL1E  CHARLIE  0.714286
+    """
+    if not isinstance(score_columns, list):
+        score_columns = [score_columns]
+    scores = df[score_columns].to_numpy(dtype=np.float64)
+    dtypes = df[score_columns].dtypes.tolist()
+    counts, views = [], {}
+    for threshold in thresholds:
+        limits = np.broadcast_to(
+            np.asarray(threshold, dtype=np.float64), (len(score_columns),)
+        )
+        limits = np.array(
+            [np.asarray(limit).astype(dtype) for limit, dtype in zip(limits, dtypes)],
+            dtype=np.float64,
+        )
+        mask = (scores >= limits).all(axis=1)
+        counts.append(int(mask.sum()))
+        views[threshold] = df[mask]
+    return pd.DataFrame({"Threshold": list(thresholds), "Pairs": counts}), views
+
+
+def _age_tolerance_mask(age_1, age_2):
+    """Vectorised age_tolerance, returning a boolean array."""
+    age_1 = np.asarray(age_1, dtype=np.float64)
+    age_2 = np.asarray(age_2, dtype=np.float64)
+    diff = np.abs(age_1 - age_2)
+
+    def either_between(low, high):
+        return ((low <= age_1) & (age_1 <= high)) | ((low <= age_2) & (age_2 <= high))
+
+    return (
+        ((diff < 2) & either_between(0, 10))
+        | ((diff < 3) & either_between(11, 20))
+        | ((diff < 4) & either_between(21, 40))
+        | ((diff < 5) & ((age_1 > 40) | (age_2 > 40)))
+    )
+
+
+def _equal_mask(values_1, values_2):
+    """Elementwise equality with missing values treated as equal, as in a merge."""
+    return (values_1 == values_2) | (pd.isna(values_1) & pd.isna(values_2))
+
+
+def _estimate_candidates(df1, df2, block):
+    """Number of pairs an inner join of df1 and df2 on block would produce."""
+    cols_1 = [pair[0] for pair in block]
+    cols_2 = [pair[1] for pair in block]
+    counts_1 = pd.util.hash_pandas_object(df1[cols_1], index=False).value_counts()
+    counts_2 = pd.util.hash_pandas_object(df2[cols_2], index=False).value_counts()
+    common = counts_1.index.intersection(counts_2.index)
+    return int((counts_1[common] * counts_2[common]).sum())
+
+
+def _matchkey_pairs(suffix_1, suffix_2, hh_id, level, spec):
+    """List of (df1 column, df2 column) pairs that must agree for a matchkey."""
+    if spec.get("symmetric_swap"):
+        raise ValueError("symmetric_swap matchkeys cannot share a join")
+    df1_link_vars, df2_link_vars = generate_matchkey(
+        suffix_1=suffix_1,
+        suffix_2=suffix_2,
+        hh_id=hh_id,
+        level=spec.get("level", level),
+        variables=spec["variables"],
+        swap_variables=spec.get("swap_variables"),
+    )
+    return list(zip(df1_link_vars, df2_link_vars))
+
+
+def _pairs_from_rows(df1, df2, rows_1, rows_2, shared_keys):
+    """
+    Builds matched pairs from row positions, laid out like a pandas merge.
+    Key columns that have the same name in both dataframes are kept once.
+    """
+    left = df1.iloc[rows_1].reset_index(drop=True)
+    right = df2.iloc[rows_2].reset_index(drop=True).drop(shared_keys, axis=1)
+    overlap = left.columns.intersection(right.columns)
+    left = left.rename(columns={col: col + "_x" for col in overlap})
+    right = right.rename(columns={col: col + "_y" for col in overlap})
+    return pd.concat([left, right], axis=1)
+
+
+def _run_lattice_group(df1, df2, suffix_1, suffix_2, matchkeys, group):
+    """Evaluates every matchkey in a group from plan_matchkeys with one join."""
+    block = group["block"]
+    mask_pairs = list(dict.fromkeys(p for c in group["conditions"] for p in c))
+    cols_1 = list(dict.fromkeys([p[0] for p in block + mask_pairs]))
+    left = df1[cols_1].assign(_row_1=np.arange(len(df1)))
+    # Masked columns are renamed to avoid clashes with the left-hand columns
+    right = pd.concat(
+        [
+            df2[list(dict.fromkeys(p[1] for p in block))],
+            df2[list(dict.fromkeys(p[1] for p in mask_pairs))].add_suffix("_right"),
+        ],
+        axis=1,
+    ).assign(_row_2=np.arange(len(df2)))
+    shared_keys = [pair[0] for pair in block if pair[0] == pair[1]]
+    candidates = pd.merge(
+        left=left,
+        right=right,
+        how="inner",
+        left_on=[pair[0] for pair in block],
+        right_on=[pair[1] for pair in block],
+    )
+    results = []
+    for i, conditions in zip(group["matchkeys"], group["conditions"]):
+        mask = np.ones(len(candidates), dtype=bool)
+        for col_1, col_2 in conditions:
+            mask &= _equal_mask(
+                candidates[col_1].to_numpy(), candidates[col_2 + "_right"].to_numpy()
+            )
+        matches = _pairs_from_rows(
+            df1,
+            df2,
+            candidates["_row_1"].to_numpy()[mask],
+            candidates["_row_2"].to_numpy()[mask],
+            shared_keys,
+        )
+        spec = matchkeys[i]
+        results.append(
+            filter_matches(
+                matches,
+                suffix_1,
+                suffix_2,
+                spec.get("lev_variables"),
+                spec.get("age_threshold"),
+                spec.get("keep_scores", False),
+            )
+        )
+    return results
+
+
+def _std_lev_scores(df, column1, column2):
+    """std_lev scores (float64) for two columns, scoring each distinct pair once."""
+    # An empty MultiIndex cannot be factorized
+    if df.empty:
+        return np.empty(0, dtype=np.float64)
+    values = df[[column1, column2]].astype(str)
+    codes, uniques = pd.MultiIndex.from_frame(values).factorize()
+    scores = np.array([std_lev(x, y) for x, y in uniques], dtype=np.float64)
+    return scores[codes]
+
+
+def _symmetric_swap_pairs(
+    df1, df2, suffix_1, suffix_2, hh_id, level, variables, swap_variables
+):
+    """
+    Matches df1 to df2 on the normal and swapped matchkey variables in one
+    join, by stacking both sets of df2 key values, tagging each pair with
+    the orientation that matched.
+    """
+    keys_1, normal_2, swapped_2 = _symmetric_swap_keys(
+        suffix_1, suffix_2, hh_id, level, variables, swap_variables
+    )
+    names = [f"_key_{i}" for i in range(len(keys_1))]
+    left = df1[keys_1].set_axis(names, axis=1).assign(_row_1=np.arange(len(df1)))
+    normal = df2[normal_2].set_axis(names, axis=1).assign(_row_2=np.arange(len(df2)))
+    swapped = df2[swapped_2].set_axis(names, axis=1).assign(_row_2=np.arange(len(df2)))
+
+    # Rows whose normal and swapped keys agree are only joined once
+    both = np.ones(len(df2), dtype=bool)
+    for name in names:
+        both &= _equal_mask(normal[name].to_numpy(), swapped[name].to_numpy())
+    normal["Orientation"] = np.where(both, "both", "normal")
+    swapped = swapped[~both].assign(Orientation="swapped")
+    pairs = pd.merge(
+        left=left,
+        right=pd.concat([normal, swapped], ignore_index=True),
+        how="inner",
+        on=names,
+    ).sort_values(["_row_1", "_row_2"], kind="stable")
+
+    shared_keys = [col for col, col_2 in zip(keys_1, swapped_2) if col == col_2]
+    matches = _pairs_from_rows(
+        df1, df2, pairs["_row_1"].to_numpy(), pairs["_row_2"].to_numpy(), shared_keys
+    )
+    matches["Orientation"] = pairs["Orientation"].to_numpy()
+    return matches
+
+
+def _symmetric_swap_keys(suffix_1, suffix_2, hh_id, level, variables, swap_variables):
+    """df1 keys with the normal and swapped df2 keys of a symmetric swap matchkey."""
+    if not swap_variables:
+        raise ValueError("symmetric_swap requires swap_variables")
+    keys_1, swapped_2 = generate_matchkey(
+        suffix_1, suffix_2, hh_id, level, variables, swap_variables
+    )
+    n = len(generate_matchkey(suffix_1, suffix_2, hh_id, level, variables)[0])
+    swap_1 = keys_1[n:]
+    if len(swap_1) != len(swapped_2) - n:
+        raise ValueError(
+            "symmetric_swap requires swap_variables pairing one column from each"
+            " dataframe"
+        )
+    normal_2 = swapped_2[:n] + [col[: -len(suffix_1)] + suffix_2 for col in swap_1]
+    return keys_1, normal_2, swapped_2
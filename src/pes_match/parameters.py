@@ -10,6 +10,20 @@ OUTPUT_PATH = DATA_PATH + "Outputs/"
 CEN_CLEAN_DATA = DATA_PATH + "cen_cleaned_CT.csv"
 PES_CLEAN_DATA = DATA_PATH + "pes_cleaned_CT.csv"
 
+# Cleaned census partitioned by district and EA, when cleaned in chunks
+CEN_CLEAN_PARTITIONS = DATA_PATH + "cen_cleaned_CT/"
+
+# Household-level lists (e.g. forenames in each household)
+CEN_HOUSEHOLD_LISTS = DATA_PATH + "cen_household_lists.npz"
+PES_HOUSEHOLD_LISTS = DATA_PATH + "pes_household_lists.npz"
+
+# Matched-record registry paths
+CEN_REGISTRY = CHECKPOINT_PATH + "cen_registry.npz"
+PES_REGISTRY = CHECKPOINT_PATH + "pes_registry.npz"
+
+# Cached matchkey results
+MATCHKEY_CACHE_PATH = CHECKPOINT_PATH + "Matchkey_Cache/"
+
 # Variables to save in crow outputs & final outputs
 CLERICAL_VARIABLES = [
     "puid",
@@ -21,7 +35,6 @@ CLERICAL_VARIABLES = [
     "sex",
     "marstat",
     "telephone",
-    "forename_list",
     "Eaid",
 ]
 OUTPUT_VARIABLES = ["puid_cen", "puid_pes", "MK", "Match_Type", "CLERICAL"]
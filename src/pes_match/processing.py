@@ -0,0 +1,460 @@
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import quote
+
+import pandas as pd
+
+
+def cleaning_step(function, inputs, outputs, **kwargs):
+    """
+    Declares one step of a cleaning spec: a function from pes_match.cleaning
+    (or any function with the same df-in, df-out signature), the columns it
+    reads, the columns it writes and its keyword arguments. Sentinel values
+    for missing data are given as arguments, as when calling the function
+    directly e.g. missing_value='-9' or a replace_vals dic.
+
+    Parameters
+    ----------
+    function: callable
+        Function taking a dataframe as its first argument and returning a
+        dataframe e.g. clean_name or n_gram.
+    inputs: str or list of str
+        Columns read by the function.
+    outputs: str or list of str
+        Columns written by the function. Any other changes the function
+        makes to its inputs are discarded.
+    **kwargs
+        Keyword arguments passed to function.
+
+    Returns
+    -------
+    dict
+        Cleaning step, for use in plan_cleaning and run_cleaning.
+
+    See Also
+    --------
+    run_cleaning
+
+    Example
+    --------
+    >>> from pes_match.cleaning import n_gram
+    >>> step = cleaning_step(n_gram, inputs='forename', outputs='forename_init',
+    ...                      input_col='forename', output_col='forename_init',
+    ...                      missing_value='-9', n=1)
+    >>> step['inputs'], step['outputs']
+    (['forename'], ['forename_init'])
+    """
+    if not isinstance(inputs, list):
+        inputs = [inputs]
+    if not isinstance(outputs, list):
+        outputs = [outputs]
+    return {
+        "function": function,
+        "inputs": inputs,
+        "outputs": outputs,
+        "kwargs": kwargs,
+    }
+
+
+def plan_cleaning(steps, columns, available):
+    """
+    Plans which steps of a cleaning spec are needed to derive the selected
+    columns, and the order they can run in. Steps may overwrite columns
+    written by earlier steps, so each step reads the version of each input
+    written by the last step before it. Steps that no selected column
+    depends on are dropped.
+
+    Parameters
+    ----------
+    steps: list of dict
+        Cleaning steps created with cleaning_step, in the order they would
+        be applied one after another.
+    columns: list of str
+        Columns to derive.
+    available: list of str
+        Columns of the raw data.
+
+    Returns
+    -------
+    dict
+        'waves': list of lists of step positions. Steps in the same wave do
+        not depend on each other.
+        'sources': for each needed step, the step position that wrote each
+        of its inputs (None for raw data).
+        'columns': the step position that wrote each selected column.
+
+    Raises
+    ------
+    ValueError
+        if a step input or selected column is not in the raw data and is not
+        written by an earlier step.
+
+    See Also
+    --------
+    run_cleaning
+
+    Example
+    --------
+    >>> from pes_match.cleaning import clean_name, n_gram
+    >>> steps = [
+    ...     cleaning_step(clean_name, 'forename', 'forename_clean',
+    ...                   name_column='forename'),
+    ...     cleaning_step(clean_name, 'last_name', 'last_name_clean',
+    ...                   name_column='last_name'),
+    ...     cleaning_step(n_gram, 'forename_clean', 'forename_init',
+    ...                   input_col='forename_clean', output_col='forename_init',
+    ...                   missing_value='-9', n=1)]
+    >>> plan_cleaning(steps, columns=['forename_init'],
+    ...               available=['forename', 'last_name'])['waves']
+    [[0], [2]]
+    """
+    current = {column: None for column in available}
+    sources = []
+    for i, step in enumerate(steps):
+        missing = [column for column in step["inputs"] if column not in current]
+        if missing:
+            raise ValueError(f"Step {i} reads columns that do not exist: {missing}")
+        sources.append({column: current[column] for column in step["inputs"]})
+        for column in step["outputs"]:
+            current[column] = i
+    missing = [column for column in columns if column not in current]
+    if missing:
+        raise ValueError(f"Selected columns do not exist: {missing}")
+    selected = {column: current[column] for column in columns}
+
+    needed = set()
+    pending = [i for i in selected.values() if i is not None]
+    while pending:
+        i = pending.pop()
+        if i not in needed:
+            needed.add(i)
+            pending.extend(j for j in sources[i].values() if j is not None)
+
+    waves, depth = [], {}
+    for i in sorted(needed):
+        depth[i] = max(
+            (depth[j] + 1 for j in sources[i].values() if j is not None), default=0
+        )
+        if depth[i] == len(waves):
+            waves.append([])
+        waves[depth[i]].append(i)
+    return {
+        "waves": waves,
+        "sources": {i: sources[i] for i in sorted(needed)},
+        "columns": selected,
+    }
+
+
+def read_partitions(path, file_format="csv", **kwargs):
+    """
+    Reads every file written to a partitioned folder by write_partitions
+    into one dataframe, in a fixed order (by folder, then file name).
+
+    Parameters
+    ----------
+    path: str
+        Folder the partitions were written to.
+    file_format: str, default = 'csv'
+        'csv' or 'parquet', as used in write_partitions.
+    **kwargs
+        Keyword arguments passed to pandas.read_csv or pandas.read_parquet
+        e.g. dtype.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Records from every partition, including the partition columns.
+
+    See Also
+    --------
+    write_partitions
+    """
+    files = sorted(
+        os.path.join(folder, name)
+        for folder, _, names in os.walk(path)
+        for name in names
+        if name.endswith("." + file_format)
+    )
+    read = pd.read_parquet if file_format == "parquet" else pd.read_csv
+    return pd.concat([read(file, **kwargs) for file in files], ignore_index=True)
+
+
+def run_cleaning(df, steps, columns, timings=None):
+    """
+    Runs a cleaning spec on a dataframe. Only the steps needed for the
+    selected columns are run, each on a dataframe of just its input
+    columns, so the full dataframe is never copied or reassigned between
+    steps. Intermediate columns are derived once and reused by every step
+    that reads them. Steps run one at a time, in the order of the plan: they
+    hold the GIL, so running them in threads gives no speed-up. Use
+    stream_cleaning to clean chunks of rows in separate processes.
+
+    Parameters
+    ----------
+    df: pandas.DataFrame
+        Raw data e.g. the census or PES.
+    steps: list of dict
+        Cleaning steps created with cleaning_step, in the order they would
+        be applied one after another.
+    columns: list of str
+        Columns to return.
+    timings: dict, optional
+        If given, the seconds spent in each cleaning function are added to
+        it, keyed by function name. Steps run one at a time, so the times do
+        not overlap and add up to no more than the time taken by the call.
+
+    Returns
+    -------
+    pandas.DataFrame
+        The selected columns, as they would be after applying every step in
+        order. Has the same index as df.
+
+    See Also
+    --------
+    cleaning_step
+    plan_cleaning
+
+    Example
+    --------
+    >>> import numpy as np
+    >>> import pandas as pd
+    >>> from pes_match.cleaning import clean_name, n_gram, replace_vals
+    >>> df = pd.DataFrame({'forename': ['Charlie!', None], 'age': [20, 30]})
+    >>> steps = [
+    ...     cleaning_step(clean_name, 'forename', 'forename_clean',
+    ...                   name_column='forename'),
+    ...     cleaning_step(replace_vals, 'forename_clean', 'forename_clean',
+    ...                   dic={'-9': np.NaN}, subset='forename_clean'),
+    ...     cleaning_step(n_gram, 'forename_clean', 'forename_init',
+    ...                   input_col='forename_clean', output_col='forename_init',
+    ...                   missing_value='-9', n=1)]
+    >>> run_cleaning(df, steps, columns=['age', 'forename_clean', 'forename_init'])
+       age forename_clean forename_init
+    0   20        CHARLIE             C
+    1   30             -9            -9
+    """
+    plan = plan_cleaning(steps, columns, available=list(df.columns))
+    results = {}
+
+    def value(column, source):
+        return df[column] if source is None else results[source][column]
+
+    for wave in plan["waves"]:
+        for i in wave:
+            inputs = pd.DataFrame(
+                {
+                    column: value(column, source)
+                    for column, source in plan["sources"][i].items()
+                },
+                index=df.index,
+                copy=True,
+            )
+            step = steps[i]
+            start = time.perf_counter()
+            output = step["function"](inputs, **step["kwargs"])
+            seconds = time.perf_counter() - start
+            results[i] = {
+                column: pd.Series(
+                    output[column].to_numpy(), index=df.index, name=column
+                )
+                for column in step["outputs"]
+            }
+            if timings is not None:
+                name = step["function"].__name__
+                timings[name] = timings.get(name, 0) + seconds
+    return pd.DataFrame(
+        {column: value(column, source) for column, source in plan["columns"].items()},
+        index=df.index,
+    )
+
+
+def stream_cleaning(
+    path,
+    steps,
+    columns,
+    chunksize,
+    hh_id=None,
+    processes=1,
+    timings=None,
+    **kwargs,
+):
+    """
+    Runs a cleaning spec on a raw CSV file one chunk of rows at a time, so
+    that only a few chunks of the raw data are held in memory. Chunks can
+    be cleaned in separate processes, and are always returned in the order
+    they were read. Derivations that need every record in a household
+    (e.g. household lists) must either be collected from each chunk and
+    combined afterwards, or use hh_id so that households are not split
+    across chunks.
+
+    Parameters
+    ----------
+    path: str
+        Path to the raw data e.g. the census.
+    steps: list of dict
+        Cleaning steps created with cleaning_step, in the order they would
+        be applied one after another.
+    columns: list of str
+        Columns to return.
+    chunksize: int
+        Number of rows to read and clean at a time.
+    hh_id: str, optional
+        Name of household ID column. If given, each chunk ends at the end of
+        a household, with the records of the last household in a chunk of
+        rows cleaned with the next chunk instead. Records of a household
+        must be next to each other in the raw data e.g. sorted by hh_id.
+    processes: int, default = 1
+        Number of chunks to clean at the same time, in separate processes.
+    timings: dict, optional
+        If given, the seconds spent in each cleaning function (across all
+        chunks and processes) are added to it, keyed by function name. With
+        more than one process, chunks are cleaned at the same time, so the
+        times can add up to more than the time taken to clean the file.
+    **kwargs
+        Keyword arguments passed to pandas.read_csv e.g. dtype. Columns that
+        are read as strings in the full file should be given a string dtype,
+        as a chunk may have no values in them.
+
+    Yields
+    ------
+    pandas.DataFrame
+        The selected columns of each chunk, cleaned with run_cleaning.
+
+    See Also
+    --------
+    run_cleaning
+    write_partitions
+
+    Example
+    --------
+    >>> import io
+    >>> from pes_match.cleaning import clean_name
+    >>> raw = io.StringIO('puid,forename\\n1,john!\\n2,\\n3,Ann\\n')
+    >>> steps = [cleaning_step(clean_name, 'forename', 'forename_clean',
+    ...                        name_column='forename')]
+    >>> for df in stream_cleaning(raw, steps, ['puid', 'forename_clean'],
+    ...                           chunksize=2, dtype={'forename': str}):
+    ...     print(df)
+       puid forename_clean
+    0     1           JOHN
+    1     2            NaN
+       puid forename_clean
+    2     3            ANN
+    """
+    with pd.read_csv(path, chunksize=chunksize, **kwargs) as reader:
+        chunks = reader if hh_id is None else _household_chunks(reader, hh_id)
+        if processes == 1:
+            for chunk in chunks:
+                yield run_cleaning(chunk, steps, columns, timings)
+            return
+
+        # A few chunks are read ahead, so every process has one to clean
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            pending = deque()
+            for chunk in chunks:
+                pending.append(executor.submit(_clean_chunk, chunk, steps, columns))
+                if len(pending) > processes:
+                    yield _collect_chunk(pending.popleft(), timings)
+            while pending:
+                yield _collect_chunk(pending.popleft(), timings)
+
+
+def write_partitions(df, path, partition_cols, name, file_format="csv"):
+    """
+    Writes a dataframe to a folder partitioned by geography e.g. by district
+    and then by EA. Each partition is a folder named column=value for each
+    partition column in turn, and each call writes one file, called name,
+    to the folder of every partition in df. Chunks of one dataset can be
+    written in turn with different names.
+
+    Parameters
+    ----------
+    df: pandas.DataFrame
+        Records to write, with partition_cols present. Partition columns are
+        kept in the files.
+    path: str
+        Folder to write partitions to. Created if it does not exist.
+    partition_cols: list of str
+        Columns to partition by, from the outermost folder level inwards.
+    name: str
+        Name of the file to write to each partition, without extension.
+    file_format: str, default = 'csv'
+        'csv' or 'parquet'. Writing parquet requires pyarrow (or
+        fastparquet) to be installed.
+
+    See Also
+    --------
+    read_partitions
+    stream_cleaning
+
+    Example
+    --------
+    >>> import pandas as pd
+    >>> import tempfile
+    >>> df = pd.DataFrame({'puid': [1, 2, 3], 'Dsid': ['A', 'A', 'B'],
+    ...                    'Eaid': ['A1', 'A2', 'B1']})
+    >>> path = tempfile.mkdtemp()
+    >>> write_partitions(df, path, partition_cols=['Dsid', 'Eaid'],
+    ...                  name='part-0')
+    >>> sorted(os.listdir(os.path.join(path, 'Dsid=A')))
+    ['Eaid=A1', 'Eaid=A2']
+    >>> read_partitions(path)
+       puid Dsid Eaid
+    0     1    A   A1
+    1     2    A   A2
+    2     3    B   B1
+    """
+    if file_format not in ["csv", "parquet"]:
+        raise ValueError("file_format must be 'csv' or 'parquet'")
+    keys = partition_cols[0] if len(partition_cols) == 1 else partition_cols
+    for values, part in df.groupby(keys, dropna=False, sort=False):
+        if len(partition_cols) == 1:
+            values = (values,)
+        folder = os.path.join(
+            path,
+            *[
+                column + "=" + quote(str(value), safe="")
+                for column, value in zip(partition_cols, values)
+            ],
+        )
+        os.makedirs(folder, exist_ok=True)
+        file = os.path.join(folder, name + "." + file_format)
+        if file_format == "parquet":
+            part.to_parquet(file, index=False)
+        else:
+            part.to_csv(file, header=True, index=False)
+
+
+def _clean_chunk(chunk, steps, columns):
+    """Cleans one chunk in a worker process, with the time spent per function."""
+    timings = {}
+    return run_cleaning(chunk, steps, columns, timings), timings
+
+
+def _collect_chunk(future, timings):
+    """Result of _clean_chunk, adding its timings to timings."""
+    cleaned, chunk_timings = future.result()
+    if timings is not None:
+        for name, seconds in chunk_timings.items():
+            timings[name] = timings.get(name, 0) + seconds
+    return cleaned
+
+
+def _household_chunks(chunks, hh_id):
+    """Chunks of records grouped by household, moved so no household is split."""
+    held = None
+    for chunk in chunks:
+        if held is not None:
+            chunk = pd.concat([held, chunk])
+        # The last household in a chunk may continue in the next one
+        households = chunk[hh_id]
+        last = households.iloc[-1]
+        in_last = (households == last) | (households.isna() & pd.isna(last))
+        end = len(chunk) - int(in_last.to_numpy()[::-1].cumprod().sum())
+        held = chunk.iloc[end:]
+        if end:
+            yield chunk.iloc[:end]
+    if held is not None and len(held):
+        yield held
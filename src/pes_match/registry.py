@@ -0,0 +1,297 @@
+import numpy as np
+import pandas as pd
+
+
+def create_registry(ids):
+    """
+    Creates an empty matched-record registry for a set of person IDs. The
+    registry records, for every ID, which stages and match types it has been
+    matched on and whether it was matched clerically, so that residuals and
+    matched flags can be selected with array masks instead of merges.
+
+    Parameters
+    ----------
+    ids: array-like
+        Person IDs (including suffixes) of all records in a dataset.
+        Duplicate IDs are only registered once.
+
+    Returns
+    -------
+    dict
+        Registry containing 'ids', one 'stage' and one 'match_type' bitmask
+        (numpy.uint32) per ID, a boolean 'clerical' array, and the names
+        of the bits in 'stages' and 'match_types'.
+
+    See Also
+    --------
+    update_registry
+    registry_mask
+    registry_residuals
+
+    Example
+    --------
+    >>> registry = create_registry([1, 2, 3])
+    >>> registry['ids']
+    array([1, 2, 3])
+    >>> registry['stage']
+    array([0, 0, 0], dtype=uint32)
+    """
+    ids = pd.unique(pd.Series(ids))
+    return {
+        "ids": np.asarray(ids),
+        "stage": np.zeros(len(ids), dtype=np.uint32),
+        "match_type": np.zeros(len(ids), dtype=np.uint32),
+        "clerical": np.zeros(len(ids), dtype=bool),
+        "stages": [],
+        "match_types": [],
+    }
+
+
+def load_registry(path):
+    """
+    Loads a matched-record registry saved with save_registry.
+
+    Parameters
+    ----------
+    path: str
+        Path to the saved registry (.npz file).
+
+    Returns
+    -------
+    dict
+        Registry in the same format as create_registry.
+
+    See Also
+    --------
+    save_registry
+    """
+    with np.load(path, allow_pickle=False) as data:
+        ids = data["ids"]
+        if ids.dtype.kind == "U":
+            ids = ids.astype(object)
+        return {
+            "ids": ids,
+            "stage": data["stage"],
+            "match_type": data["match_type"],
+            "clerical": data["clerical"],
+            "stages": data["stages"].tolist(),
+            "match_types": data["match_types"].tolist(),
+        }
+
+
+def registry_mask(df, registry, id_column, stages=None, match_types=None):
+    """
+    Flags the records in a dataframe that have been matched, according to a
+    matched-record registry. IDs that are not in the registry are treated as
+    unmatched.
+
+    Parameters
+    ----------
+    df: pandas.DataFrame
+        The dataframe containing person records.
+    registry: dict
+        Registry created with create_registry and update_registry.
+    id_column: str
+        Name of person ID column (including suffixes)
+    stages: list of str, optional
+        Only count matches made on these stages. Default is all stages.
+    match_types: list of str, optional
+        Only count matches of these match types. Default is all match types.
+
+    Returns
+    -------
+    numpy.ndarray
+        Boolean array, True for every matched record in df.
+
+    See Also
+    --------
+    registry_residuals
+
+    Example
+    --------
+    >>> import pandas as pd
+    >>> df = pd.DataFrame({'puid_1': [1, 2, 3, 4]})
+    >>> matches = pd.DataFrame({'puid_1': [1, 3],
+    ...                         'Match_Type': ['Matchkeys', 'Associative']})
+    >>> registry = update_registry(create_registry(df['puid_1']), matches,
+    ...                            id_column='puid_1', stage='Stage_1')
+    >>> registry_mask(df, registry, id_column='puid_1')
+    array([ True, False,  True, False])
+    >>> registry_mask(df, registry, id_column='puid_1', match_types=['Matchkeys'])
+    array([ True, False, False, False])
+    """
+    codes = pd.Index(registry["ids"]).get_indexer(df[id_column])
+    known = codes >= 0
+    codes = codes[known]
+    matched = (registry["stage"][codes] & _bits(registry["stages"], stages)) != 0
+    if match_types is not None:
+        matched &= (
+            registry["match_type"][codes] & _bits(registry["match_types"], match_types)
+        ) != 0
+    mask = np.zeros(len(df), dtype=bool)
+    mask[known] = matched
+    return mask
+
+
+def registry_residuals(df, registry, id_column, stages=None):
+    """
+    Removes all matched records from a dataframe using a matched-record
+    registry, leaving only the residuals. Equivalent to get_residuals with
+    the matches recorded in the registry.
+
+    Parameters
+    ----------
+    df: pandas.DataFrame
+        The dataframe containing all person records.
+    registry: dict
+        Registry created with create_registry and update_registry.
+    id_column: str
+        Name of person ID column (including suffixes)
+    stages: list of str, optional
+        Only remove records matched on these stages. Default is all stages.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Matched records removed, leaving only the residuals.
+
+    See Also
+    --------
+    get_residuals
+    registry_mask
+
+    Example
+    --------
+    >>> import pandas as pd
+    >>> all_records = pd.DataFrame({'puid_1': [1, 2, 3, 4, 5]})
+    >>> matched_records = pd.DataFrame({'puid_1': [1, 2, 3],
+    ...                                 'puid_2': [21, 22, 23]})
+    >>> registry = update_registry(create_registry(all_records['puid_1']),
+    ...                            matched_records, id_column='puid_1',
+    ...                            stage='Stage_1')
+    >>> registry_residuals(all_records, registry, id_column='puid_1')
+       puid_1
+    0       4
+    1       5
+    """
+    mask = registry_mask(df, registry, id_column, stages=stages)
+    return df[~mask].reset_index(drop=True)
+
+
+def save_registry(registry, path):
+    """
+    Saves a matched-record registry in compressed numpy format, so that later
+    stages can load it instead of re-reading and merging earlier matches.
+
+    Parameters
+    ----------
+    registry: dict
+        Registry created with create_registry and update_registry.
+    path: str
+        Path to save the registry to (.npz file).
+
+    See Also
+    --------
+    load_registry
+    """
+    ids = registry["ids"]
+    if ids.dtype == object:
+        ids = ids.astype(str)
+    np.savez_compressed(
+        path,
+        ids=ids,
+        stage=registry["stage"],
+        match_type=registry["match_type"],
+        clerical=registry["clerical"],
+        stages=np.array(registry["stages"], dtype=str),
+        match_types=np.array(registry["match_types"], dtype=str),
+    )
+
+
+def update_registry(registry, matches, id_column, stage):
+    """
+    Records a set of matches in a matched-record registry. Match types are
+    taken from the 'Match_Type' column and clerical status from the
+    'CLERICAL' column of matches, when present.
+
+    Parameters
+    ----------
+    registry: dict
+        Registry created with create_registry.
+    matches: pandas.DataFrame
+        Matches made on this stage e.g. the output of collect_uniques.
+    id_column: str
+        Name of person ID column (including suffixes)
+    stage: str
+        Name of the stage the matches were made on.
+
+    Returns
+    -------
+    dict
+        Updated copy of the registry.
+
+    Raises
+    ------
+    ValueError
+        If matches contains IDs that are not in the registry, or more than
+        32 stages or match types are recorded.
+
+    See Also
+    --------
+    create_registry
+    registry_mask
+
+    Example
+    --------
+    >>> import pandas as pd
+    >>> matches = pd.DataFrame({'puid_1': [1, 3],
+    ...                         'Match_Type': ['Matchkeys', 'Associative'],
+    ...                         'CLERICAL': [0, 1]})
+    >>> registry = update_registry(create_registry([1, 2, 3]), matches,
+    ...                            id_column='puid_1', stage='Stage_1')
+    >>> registry['stage']
+    array([1, 0, 1], dtype=uint32)
+    >>> registry['match_type']
+    array([1, 0, 2], dtype=uint32)
+    >>> registry['clerical']
+    array([False, False,  True])
+    """
+    codes = pd.Index(registry["ids"]).get_indexer(matches[id_column])
+    if (codes < 0).any():
+        raise ValueError(
+            f"{int((codes < 0).sum())} IDs in matches are not in the registry"
+        )
+    registry = {
+        key: value.copy() if isinstance(value, (list, np.ndarray)) else value
+        for key, value in registry.items()
+    }
+    registry["stage"][codes] |= _bits(registry["stages"], [stage], add=True)
+    if "Match_Type" in matches.columns:
+        type_codes, types = pd.factorize(matches["Match_Type"])
+        type_bits = np.array(
+            [_bits(registry["match_types"], [t], add=True) for t in types],
+            dtype=np.uint32,
+        )
+        known = type_codes >= 0
+        np.bitwise_or.at(
+            registry["match_type"], codes[known], type_bits[type_codes[known]]
+        )
+    if "CLERICAL" in matches.columns:
+        registry["clerical"][codes[matches["CLERICAL"].to_numpy() == 1]] = True
+    return registry
+
+
+def _bits(names, selected, add=False):
+    """Bitmask for selected names, optionally adding unseen names to names."""
+    if selected is None:
+        return np.uint32(0xFFFFFFFF)
+    mask = 0
+    for name in selected:
+        if name not in names:
+            if not add:
+                raise ValueError(f"{name} is not recorded in the registry")
+            if len(names) == 32:
+                raise ValueError("Registry can record at most 32 names per flag")
+            names.append(name)
+        mask |= 1 << names.index(name)
+    return np.uint32(mask)
@@ -0,0 +1,308 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+
+def create_store(ids_1, ids_2, path, memory_limit=1000000000):
+    """
+    Creates a candidate store for matchkey outputs. Matched pairs are held in
+    memory as integer pairs until memory_limit is reached, then written to
+    disk as sorted runs, so matchkeys with more pairs than fit in memory can
+    be combined. Use store_matches to add matches, merge_store to combine
+    them, then store_uniques and store_conflicts to collect the results.
+
+    Parameters
+    ----------
+    ids_1: array-like
+        Person IDs (including suffixes) of all records in the first dataset.
+    ids_2: array-like
+        Person IDs (including suffixes) of all records in the second dataset.
+    path: str
+        Folder to write sorted runs to. Created if it does not exist.
+    memory_limit: int, default = 1000000000
+        Number of bytes of pairs to hold in memory before writing a run to
+        disk. Each pair uses 9 bytes.
+
+    Returns
+    -------
+    dict
+        Candidate store.
+
+    See Also
+    --------
+    store_matches
+    merge_store
+
+    Example
+    --------
+    >>> import pandas as pd
+    >>> import tempfile
+    >>> mk1 = pd.DataFrame({'puid_1': ['A1', 'A2', 'A3'],
+    ...                     'puid_2': ['B1', 'B2', 'B2']})
+    >>> mk2 = pd.DataFrame({'puid_1': ['A1', 'A4'],
+    ...                     'puid_2': ['B1', 'B4']})
+    >>> store = create_store(['A1', 'A2', 'A3', 'A4'], ['B1', 'B2', 'B3', 'B4'],
+    ...                      path=tempfile.mkdtemp(), memory_limit=20)
+    >>> store_matches(store, mk1, id_1='puid_1', id_2='puid_2', mk=1)
+    >>> store_matches(store, mk2, id_1='puid_1', id_2='puid_2', mk=2)
+    >>> len(store['runs'])
+    1
+    >>> merge_store(store)
+    >>> store_uniques(store, id_1='puid_1', id_2='puid_2', match_type='Matchkeys')
+      puid_1 puid_2  MK  CLERICAL Match_Type
+    0     A1     B1   1         0  Matchkeys
+    1     A4     B4   2         0  Matchkeys
+    >>> store_conflicts(store, id_1='puid_1', id_2='puid_2')
+      puid_1 puid_2  MK  CLERICAL
+    0     A2     B2   1         1
+    1     A3     B2   1         1
+    """
+    ids_1 = pd.Index(pd.unique(pd.Series(ids_1)))
+    ids_2 = pd.Index(pd.unique(pd.Series(ids_2)))
+    if max(len(ids_1), len(ids_2)) >= 2**32:
+        raise ValueError("Candidate stores can hold at most 2**32 IDs per dataset")
+    os.makedirs(path, exist_ok=True)
+    return {
+        "ids_1": ids_1,
+        "ids_2": ids_2,
+        "path": path,
+        "memory_limit": memory_limit,
+        "keys": [],
+        "mks": [],
+        "buffered": 0,
+        "runs": [],
+        "merged": None,
+    }
+
+
+def merge_store(store, batch_size=1000000):
+    """
+    Combines all pairs in a candidate store with an external merge over the
+    sorted runs on disk, keeping each pair once with its lowest MK (as in
+    combine), and counts how many pairs each ID is in. At most batch_size
+    pairs from each run are read into memory at a time. The store is
+    updated in place.
+
+    Parameters
+    ----------
+    store: dict
+        Candidate store created with create_store.
+    batch_size: int, default = 1000000
+        Number of pairs to read from each run at a time.
+
+    See Also
+    --------
+    store_uniques
+    store_conflicts
+    """
+    if store["keys"]:
+        _spill(store)
+    runs = [
+        (
+            np.load(run + "_keys.npy", mmap_mode="r"),
+            np.load(run + "_mk.npy", mmap_mode="r"),
+        )
+        for run in store["runs"]
+    ]
+    total = sum(len(keys) for keys, _ in runs)
+    base = os.path.join(store["path"], "merged")
+    merged_keys = np.lib.format.open_memmap(
+        base + "_keys.npy", mode="w+", dtype=np.uint64, shape=(total,)
+    )
+    merged_mks = np.lib.format.open_memmap(
+        base + "_mk.npy", mode="w+", dtype=np.uint8, shape=(total,)
+    )
+    counts_1 = np.zeros(len(store["ids_1"]), dtype=np.int64)
+    counts_2 = np.zeros(len(store["ids_2"]), dtype=np.int64)
+    positions = [0] * len(runs)
+    n = 0
+    while True:
+        active = [i for i, (keys, _) in enumerate(runs) if positions[i] < len(keys)]
+        if not active:
+            break
+        # Every key up to the smallest last key of the windows is in a window
+        windows = {
+            i: runs[i][0][positions[i] : positions[i] + batch_size] for i in active
+        }
+        bound = min(window[-1] for window in windows.values())
+        batch_keys, batch_mks = [], []
+        for i, window in windows.items():
+            end = positions[i] + np.searchsorted(window, bound, side="right")
+            batch_keys.append(runs[i][0][positions[i] : end])
+            batch_mks.append(runs[i][1][positions[i] : end])
+            positions[i] = end
+        keys, mks = _min_mk(np.concatenate(batch_keys), np.concatenate(batch_mks))
+        merged_keys[n : n + len(keys)] = keys
+        merged_mks[n : n + len(keys)] = mks
+        n += len(keys)
+        codes_1, codes_2 = _decode(keys)
+        counts_1 += np.bincount(codes_1, minlength=len(counts_1))
+        counts_2 += np.bincount(codes_2, minlength=len(counts_2))
+    merged_keys.flush()
+    merged_mks.flush()
+    store["merged"] = {"path": base, "length": n, "counts": (counts_1, counts_2)}
+
+
+def store_conflicts(store, id_1, id_2, batch_size=1000000):
+    """
+    Collects non-unique matches from a merged candidate store, as
+    collect_conflicts does for the output of combine.
+
+    Parameters
+    ----------
+    store: dict
+        Candidate store, merged with merge_store.
+    id_1: str
+        ID column in first DataFrame (including suffix).
+    id_2: str
+        ID column in second DataFrame (including suffix).
+    batch_size: int, default = 1000000
+        Number of pairs to read from disk at a time.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Non-unique matches with 'MK' and 'CLERICAL' columns, sorted by ID.
+
+    See Also
+    --------
+    collect_conflicts
+    store_uniques
+    """
+    df = _collect(store, id_1, id_2, batch_size, unique=False)
+    df["CLERICAL"] = np.int32(1)
+    return df
+
+
+def store_matches(store, matches, id_1, id_2, mk):
+    """
+    Adds the matches made by one matchkey to a candidate store. Pairs are
+    written to disk as a sorted run once the store's memory limit is
+    reached. The store is updated in place.
+
+    Parameters
+    ----------
+    store: dict
+        Candidate store created with create_store.
+    matches: pandas.DataFrame
+        Matches from a matchkey e.g. run_single_matchkey output, or a chunk
+        from iter_single_matchkey.
+    id_1: str
+        ID column in first DataFrame (including suffix).
+    id_2: str
+        ID column in second DataFrame (including suffix).
+    mk: int
+        Matchkey number, between 1 and 255. Lower numbers are kept when
+        a pair is made by more than one matchkey.
+
+    See Also
+    --------
+    create_store
+    merge_store
+    """
+    if not 1 <= mk <= 255:
+        raise ValueError("mk must be between 1 and 255")
+    codes_1 = store["ids_1"].get_indexer(matches[id_1])
+    codes_2 = store["ids_2"].get_indexer(matches[id_2])
+    if (codes_1 < 0).any() or (codes_2 < 0).any():
+        raise ValueError("matches contains IDs that are not in the store")
+    keys = (codes_1.astype(np.uint64) << np.uint64(32)) | codes_2.astype(np.uint64)
+    store["keys"].append(keys)
+    store["mks"].append(np.full(len(keys), mk, dtype=np.uint8))
+    store["buffered"] += len(keys) * 9
+    store["merged"] = None
+    if store["buffered"] >= store["memory_limit"]:
+        _spill(store)
+
+
+def store_uniques(store, id_1, id_2, match_type, batch_size=1000000):
+    """
+    Collects unique matches from a merged candidate store, as
+    collect_uniques does for the output of combine.
+
+    Parameters
+    ----------
+    store: dict
+        Candidate store, merged with merge_store.
+    id_1: str
+        ID column in first DataFrame (including suffix).
+    id_2: str
+        ID column in second DataFrame (including suffix).
+    match_type: str
+        Indicator that is added to specify which stage the matches were made on.
+    batch_size: int, default = 1000000
+        Number of pairs to read from disk at a time.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Unique matches with 'MK', 'CLERICAL' and 'Match_Type' columns,
+        sorted by ID.
+
+    See Also
+    --------
+    collect_uniques
+    store_conflicts
+    """
+    df = _collect(store, id_1, id_2, batch_size, unique=True)
+    df["CLERICAL"] = np.int32(0)
+    df["Match_Type"] = match_type
+    return df
+
+
+def _collect(store, id_1, id_2, batch_size, unique):
+    """Reads merged pairs whose IDs are (or are not) each in a single pair."""
+    if store["merged"] is None:
+        raise ValueError("Candidate store must be merged with merge_store first")
+    base, length = store["merged"]["path"], store["merged"]["length"]
+    counts_1, counts_2 = store["merged"]["counts"]
+    merged_keys = np.load(base + "_keys.npy", mmap_mode="r")
+    merged_mks = np.load(base + "_mk.npy", mmap_mode="r")
+    codes_1, codes_2, mks = [], [], []
+    for start in range(0, length, batch_size):
+        end = min(start + batch_size, length)
+        batch_1, batch_2 = _decode(merged_keys[start:end])
+        keep = (counts_1[batch_1] == 1) & (counts_2[batch_2] == 1)
+        if not unique:
+            keep = ~keep
+        codes_1.append(batch_1[keep])
+        codes_2.append(batch_2[keep])
+        mks.append(np.asarray(merged_mks[start:end])[keep])
+    codes_1 = np.concatenate(codes_1) if codes_1 else np.array([], dtype=np.int64)
+    codes_2 = np.concatenate(codes_2) if codes_2 else np.array([], dtype=np.int64)
+    mks = np.concatenate(mks) if mks else np.array([], dtype=np.uint8)
+    return pd.DataFrame(
+        {
+            id_1: store["ids_1"][codes_1],
+            id_2: store["ids_2"][codes_2],
+            "MK": mks.astype(np.int64),
+        }
+    )
+
+
+def _decode(keys):
+    """Splits pair keys into first and second dataset ID codes."""
+    keys = np.asarray(keys, dtype=np.uint64)
+    codes_1 = (keys >> np.uint64(32)).astype(np.int64)
+    codes_2 = (keys & np.uint64(0xFFFFFFFF)).astype(np.int64)
+    return codes_1, codes_2
+
+
+def _min_mk(keys, mks):
+    """Sorts pairs by key, keeping each key once with its lowest MK."""
+    order = np.lexsort((mks, keys))
+    keys, mks = keys[order], mks[order]
+    first = np.ones(len(keys), dtype=bool)
+    first[1:] = keys[1:] != keys[:-1]
+    return keys[first], mks[first]
+
+
+def _spill(store):
+    """Writes the pairs held in memory to disk as a sorted run."""
+    keys, mks = _min_mk(np.concatenate(store["keys"]), np.concatenate(store["mks"]))
+    run = os.path.join(store["path"], f"run_{len(store['runs'])}")
+    np.save(run + "_keys.npy", keys)
+    np.save(run + "_mk.npy", mks)
+    store["runs"].append(run)
+    store["keys"], store["mks"], store["buffered"] = [], [], 0
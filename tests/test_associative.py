@@ -0,0 +1,181 @@
+import numpy as np
+import pandas as pd
+
+from pes_match.associative import assoc_candidates, run_associative_rounds
+from pes_match.crow import collect_uniques
+from pes_match.matching import combine, get_assoc_candidates, run_single_matchkey
+
+
+def test_assoc_candidates():
+    test_1 = pd.DataFrame(
+        {
+            "puid_1": [1, 2, 3, 4, 5, 6],
+            "hhid_1": [1, 1, 1, 1, 1, 3],
+            "name_1": ["CHARLIE", "JOHN", "STEVE", "SAM", "PAUL", "MARK"],
+        }
+    )
+    test_2 = pd.DataFrame(
+        {
+            "puid_2": [21, 22, 23, 24, 25, 26],
+            "hhid_2": [2, 2, 2, 4, 4, 4],
+            "name_2": ["CHARLES", "JON", "STEPHEN", "SAMANTHA", "PAUL", "MARK"],
+        }
+    )
+    test_matches = pd.DataFrame({"puid_1": [1, 5], "puid_2": [21, 25]})
+    intended = get_assoc_candidates(
+        test_1,
+        test_2,
+        suffix_1="_1",
+        suffix_2="_2",
+        matches=test_matches,
+        person_id="puid",
+        hh_id="hhid",
+    )
+    result = assoc_candidates(
+        test_1,
+        test_2,
+        suffix_1="_1",
+        suffix_2="_2",
+        matches=test_matches,
+        person_id="puid",
+        hh_id="hhid",
+    )
+    pd.testing.assert_frame_equal(
+        intended[0].sort_values(["puid_1", "hhid_2"]).reset_index(drop=True),
+        result[0].sort_values(["puid_1", "hhid_2"]).reset_index(drop=True),
+    )
+    pd.testing.assert_frame_equal(
+        intended[1].sort_values(["puid_2", "hhid_1"]).reset_index(drop=True),
+        result[1].sort_values(["puid_2", "hhid_1"]).reset_index(drop=True),
+    )
+    assert len(result[0]) == 6
+    assert len(result[1]) == 4
+
+
+def test_run_associative_rounds():
+    intended = pd.DataFrame(
+        {
+            "puid_1": [4, 2, 1],
+            "puid_2": [24, 22, 21],
+            "MK": [1, 2, 1],
+            "CLERICAL": np.array([0, 0, 0], dtype=np.int32),
+            "Match_Type": ["Associative", "Associative", "Associative"],
+            "Round": [1, 1, 2],
+        }
+    )
+    test_1 = pd.DataFrame(
+        {
+            "puid_1": [1, 2, 3, 4, 5],
+            "hhid_1": [1, 1, 1, 2, 2],
+            "name_1": ["JOHN", "JOHN", "PAUL", "SAM", "TOM"],
+            "dob_1": ["1990", "2000", "1950", "1980", "1990"],
+        }
+    )
+    test_2 = pd.DataFrame(
+        {
+            "puid_2": [21, 22, 23, 24, 25, 26],
+            "hhid_2": [5, 5, 5, 6, 6, 7],
+            "name_2": ["JOHN", "JON", "PAUL", "SAM", "TOM", "MARK"],
+            "dob_2": ["1991", "2000", "1950", "1980", "1990", "1970"],
+        }
+    )
+    test_matches = pd.DataFrame({"puid_1": [3, 5], "puid_2": [23, 25]})
+    result = run_associative_rounds(
+        test_1,
+        test_2,
+        suffix_1="_1",
+        suffix_2="_2",
+        matches=test_matches,
+        person_id="puid",
+        hh_id="hhid",
+        matchkeys=[{"variables": ["name"]}, {"variables": ["dob"]}],
+        keep=["puid"],
+        match_type="Associative",
+    )
+    pd.testing.assert_frame_equal(intended, result)
+
+    result = run_associative_rounds(
+        test_1,
+        test_2,
+        suffix_1="_1",
+        suffix_2="_2",
+        matches=test_matches,
+        person_id="puid",
+        hh_id="hhid",
+        matchkeys=[{"variables": ["name"]}, {"variables": ["dob"]}],
+        keep=["puid"],
+        match_type="Associative",
+        max_rounds=1,
+    )
+    pd.testing.assert_frame_equal(intended.iloc[:2], result)
+
+
+def test_run_associative_rounds_uniqueness():
+    # Person 1 agrees with 21 on name and with 22 on date of birth
+    test_1 = pd.DataFrame(
+        {
+            "puid_1": [1, 2, 3],
+            "hhid_1": [1, 1, 1],
+            "name_1": ["JOHN", "MARY", "PAUL"],
+            "dob_1": ["1990", "2000", "1950"],
+        }
+    )
+    test_2 = pd.DataFrame(
+        {
+            "puid_2": [21, 22, 23],
+            "hhid_2": [2, 2, 2],
+            "name_2": ["JOHN", "MAY", "PAUL"],
+            "dob_2": ["1991", "1990", "1950"],
+        }
+    )
+    test_matches = pd.DataFrame({"puid_1": [3], "puid_2": [23]})
+    matchkeys = [{"variables": ["name"]}, {"variables": ["dob"]}]
+
+    # The associative stage scripts treat person 1 as a conflict
+    candidates = get_assoc_candidates(
+        test_1,
+        test_2,
+        suffix_1="_1",
+        suffix_2="_2",
+        matches=test_matches,
+        person_id="puid",
+        hh_id="hhid",
+    )
+    stage = collect_uniques(
+        combine(
+            [
+                run_single_matchkey(
+                    *candidates,
+                    suffix_1="_1",
+                    suffix_2="_2",
+                    hh_id="hhid",
+                    level="associative",
+                    **spec,
+                )
+                for spec in matchkeys
+            ],
+            person_id="puid",
+            suffix_1="_1",
+            suffix_2="_2",
+            keep=["puid"],
+        ),
+        id_1="puid_1",
+        id_2="puid_2",
+        match_type="Associative",
+    )
+    assert stage.empty
+
+    # Rounds accept the name match before the date of birth matchkey runs
+    result = run_associative_rounds(
+        test_1,
+        test_2,
+        suffix_1="_1",
+        suffix_2="_2",
+        matches=test_matches,
+        person_id="puid",
+        hh_id="hhid",
+        matchkeys=matchkeys,
+        keep=["puid"],
+        match_type="Associative",
+    )
+    assert list(zip(result["puid_1"], result["puid_2"], result["MK"])) == [(1, 21, 1)]
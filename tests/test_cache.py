@@ -0,0 +1,100 @@
+import os
+
+import pandas as pd
+import pytest
+
+from pes_match.cache import run_cached_matchkey
+from pes_match.matching import run_single_matchkey
+
+
+@pytest.fixture(name="data")
+def setup_fixture():
+    test_1 = pd.DataFrame(
+        {
+            "puid_1": [1, 2, 3, 4, 5],
+            "EA_1": [1, 1, 1, 2, 2],
+            "name_1": ["JOHN", "JOHN", "STEVE", "SAM", "PAUL"],
+            "dob_1": ["01/2000", "02/2000", "03/1990", "04/1980", "05/1950"],
+            "age_1": [20, 20, 30, 40, 70],
+        }
+    )
+    test_2 = pd.DataFrame(
+        {
+            "puid_2": [21, 22, 23, 24, 25],
+            "EA_2": [1, 1, 1, 2, 2],
+            "name_2": ["JOHN", "STEVE", "STEVEN", "SAM", "PAUL"],
+            "dob_2": ["01/2000", "03/1990", "03/1990", "04/1980", "05/1950"],
+            "age_2": [20, 30, 30, 40, 60],
+        }
+    )
+    return test_1, test_2
+
+
+def test_run_cached_matchkey(data, tmp_path):
+    test_1, test_2 = data
+    spec = {
+        "variables": ["dob"],
+        "lev_variables": [("name_1", "name_2", 0.5)],
+        "age_threshold": True,
+        "keep_scores": True,
+    }
+    intended = run_single_matchkey(
+        test_1, test_2, suffix_1="_1", suffix_2="_2", hh_id="hid", level="EA", **spec
+    )
+    for _ in range(2):
+        result = run_cached_matchkey(
+            test_1,
+            test_2,
+            suffix_1="_1",
+            suffix_2="_2",
+            hh_id="hid",
+            level="EA",
+            cache_path=str(tmp_path),
+            **spec,
+        )
+        pd.testing.assert_frame_equal(intended, result)
+    assert len(os.listdir(tmp_path)) == 1
+
+    # Columns not used by the matchkey are read from the current data
+    test_1["name_1"] = test_1["name_1"].str.lower()
+    spec["lev_variables"] = None
+    run_cached_matchkey(
+        test_1,
+        test_2,
+        suffix_1="_1",
+        suffix_2="_2",
+        hh_id="hid",
+        level="EA",
+        cache_path=str(tmp_path),
+        **spec,
+    )
+    test_1["puid_1"] = test_1["puid_1"] + 100
+    result = run_cached_matchkey(
+        test_1,
+        test_2,
+        suffix_1="_1",
+        suffix_2="_2",
+        hh_id="hid",
+        level="EA",
+        cache_path=str(tmp_path),
+        **spec,
+    )
+    assert len(os.listdir(tmp_path)) == 2
+    assert list(result["puid_1"]) == [101, 103, 103, 104]
+
+
+def test_run_cached_matchkey_eviction(data, tmp_path):
+    test_1, test_2 = data
+    for variables in [["name"], ["dob"], ["name", "dob"]]:
+        run_cached_matchkey(
+            test_1,
+            test_2,
+            suffix_1="_1",
+            suffix_2="_2",
+            hh_id="hid",
+            level="EA",
+            variables=variables,
+            cache_path=str(tmp_path),
+            max_bytes=1,
+        )
+        assert len(os.listdir(tmp_path)) == 1
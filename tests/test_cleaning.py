@@ -10,7 +10,9 @@ from pes_match.cleaning import (
     derive_list,
     derive_names,
     n_gram,
+    n_grams,
     pad_column,
+    phonetic,
     replace_vals,
     select,
     soundex,
@@ -70,6 +72,14 @@ class TestCleanName:
             intended[["surname_clean_pes"]], result[["surname_clean_pes"]]
         )
 
+    def test_clean_name_whitespace(self):
+        test = pd.DataFrame({"name": [" mary -\tann ", "o'neil\xa0smith", None, "--"]})
+        intended = pd.DataFrame(
+            {"name_clean": ["MARY  ANN", "ONEIL SMITH", np.nan, np.nan]}
+        )
+        result = clean_name(test, name_column="name")
+        pd.testing.assert_frame_equal(intended[["name_clean"]], result[["name_clean"]])
+
 
 def test_concat():
     test = pd.DataFrame(
@@ -90,6 +100,14 @@ def test_concat():
     pd.testing.assert_frame_equal(intended[["fullname"]], result[["fullname"]])
 
 
+def test_concat_separator():
+    test = pd.DataFrame({"month": [" 01", "", "12/"], "year": ["1990", "2000", None]})
+    intended = pd.DataFrame({"full_dob": ["01/1990", "2000", "12"]})
+    result = concat(test, output_col="full_dob", sep="/", columns=["month", "year"])
+    pd.testing.assert_frame_equal(intended[["full_dob"]], result[["full_dob"]])
+    assert result["month"].isna().tolist() == [False, True, False]
+
+
 def test_derive_list():
     test = pd.DataFrame(
         {
@@ -136,6 +154,20 @@ def test_derive_names():
     pd.testing.assert_frame_equal(intended, result)
 
 
+def test_derive_names_separators():
+    test = pd.DataFrame({"fullname": ["ANNE-MARIE  SMITH", "JO-ANN", "  "]})
+    intended = pd.DataFrame(
+        {
+            "fullname": ["ANNE MARIE  SMITH", "JO ANN", "  "],
+            "forename": ["ANNE", "JO", np.NaN],
+            "middle_name": ["MARIE", np.NaN, np.NaN],
+            "last_name": ["SMITH", "ANN", np.NaN],
+        }
+    )
+    result = derive_names(test, clean_fullname_column="fullname")
+    pd.testing.assert_frame_equal(intended, result)
+
+
 class TestNGram:
     def test_n_gram_forename(self, df):
         intended = pd.DataFrame({"fn_first_3": ["CHA", "RAC", "JHO", ""]})
@@ -151,6 +183,24 @@ class TestNGram:
         )
         pd.testing.assert_frame_equal(intended[["sn_last_2"]], result[["sn_last_2"]])
 
+    def test_n_grams(self):
+        test = pd.DataFrame({"forename": ["Charlie", "-9", "jo", ""]})
+        intended = pd.DataFrame(
+            {
+                "forename": ["Charlie", "-9", "jo", ""],
+                "fn_init": ["C", "-9", "J", "-9"],
+                "fn_first_3": ["CHA", "-9", "JO", "-9"],
+                "fn_last_2": ["IE", "-9", "JO", "-9"],
+            }
+        )
+        result = n_grams(
+            test,
+            input_col="forename",
+            grams=[(1, "fn_init"), (3, "fn_first_3"), (-2, "fn_last_2")],
+            missing_value="-9",
+        )
+        pd.testing.assert_frame_equal(intended, result)
+
 
 def test_pad_column(df):
     intended = pd.DataFrame({"hhid_pad": ["00001", "00001", "00015", "00020"]})
@@ -176,6 +226,38 @@ class TestReplaceValues:
         result = replace_vals(df, subset=["sex"], dic={"MALE": 1, "FEMALE": 2})
         pd.testing.assert_frame_equal(intended[["sex"]], result[["sex"]])
 
+    def test_replace_vals_in_turn(self):
+        test = pd.DataFrame(
+            {
+                "forename": ["A", "B", None, "", "C"],
+                "surname": ["B", np.nan, "A", "C", ""],
+            }
+        )
+        intended = pd.DataFrame(
+            {
+                "forename": ["C", "C", "-9", "-9", "C"],
+                "surname": ["C", "-9", "C", "C", "-9"],
+            }
+        )
+        result = replace_vals(
+            test,
+            subset=["forename", "surname"],
+            dic={"B": "A", "C": "B", np.NaN: "", "-9": np.NaN},
+            n_jobs=2,
+        )
+        pd.testing.assert_frame_equal(intended, result)
+
+    def test_replace_vals_dtype(self):
+        test = pd.DataFrame(
+            {"code": pd.Series([1, None, 2.0], dtype=object), "empty": [None] * 3}
+        )
+        result = replace_vals(test.copy(), subset=["code"], dic={"C": "1"})
+        pd.testing.assert_frame_equal(test, result)
+        result = replace_vals(
+            test.copy(), subset=["empty"], dic={"C": np.nan, "A": "B"}
+        )
+        assert list(result["empty"]) == ["C"] * 3
+
 
 def test_select(df):
     intended = pd.DataFrame(
@@ -189,6 +271,32 @@ def test_select(df):
     pd.testing.assert_frame_equal(intended, result)
 
 
+def test_phonetic(df):
+    intended = pd.DataFrame(
+        {
+            "surname_mtp": ["SM0", "0MPSN", "", "JNS"],
+            "surname_nys": ["SNAT", "TANPSAN", "", "JAN"],
+        }
+    )
+    result = phonetic(
+        df,
+        input_col="surname",
+        output_col="surname_mtp",
+        missing_value="",
+        encoding="metaphone",
+    )
+    result = phonetic(
+        result,
+        input_col="surname",
+        output_col="surname_nys",
+        missing_value="",
+        encoding="nysiis",
+    )
+    pd.testing.assert_frame_equal(intended, result[["surname_mtp", "surname_nys"]])
+    with pytest.raises(ValueError):
+        phonetic(df, "surname", "out", missing_value="", encoding="caverphone")
+
+
 def test_soundex(df):
     intended = pd.DataFrame({"surname_sdx": ["S530", "T512", "", "J520"]})
     result = soundex(
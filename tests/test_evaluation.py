@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pes_match.evaluation import evaluate_matchkeys, matchkey_grid
+
+
+@pytest.fixture(name="data")
+def setup_fixture():
+    test_1 = pd.DataFrame(
+        {
+            "puid_1": [1, 2, 3, 4, 5],
+            "EA_1": [1, 1, 1, 2, 2],
+            "name_1": ["JOHN", "JOHN", "STEVE", "SAM", "PAUL"],
+            "dob_1": ["01/2000", "02/2000", "03/1990", "04/1980", "05/1950"],
+            "age_1": [20, 20, 30, 40, 70],
+        }
+    )
+    test_2 = pd.DataFrame(
+        {
+            "puid_2": [21, 22, 23, 24, 25],
+            "EA_2": [1, 1, 1, 2, 2],
+            "name_2": ["JOHN", "STEVE", "STEVEN", "SAM", "PAUL"],
+            "dob_2": ["01/2000", "03/1990", "03/1990", "04/1980", "05/1950"],
+            "age_2": [20, 30, 30, 40, 60],
+        }
+    )
+    truth = pd.DataFrame({"puid_1": [1, 3, 4, 5], "puid_2": [21, 22, 24, 25]})
+    return test_1, test_2, truth
+
+
+def test_evaluate_matchkeys(data):
+    test_1, test_2, truth = data
+    intended = pd.DataFrame(
+        {
+            "MK": [1, 2, 3],
+            "Matchkey": [
+                "name, dob | EA",
+                "dob | EA | lev name_1~name_2>=0.8",
+                "name | EA | age",
+            ],
+            "Pairs": [4, 5, 4],
+            "True_Pairs": [4, 4, 3],
+            "Precision": [1.0, 0.8, 0.75],
+            "Recall": [1.0, 1.0, 0.75],
+            "Conflict_Rate": [0.0, 0.4, 0.5],
+        }
+    )
+    matchkeys = [
+        {"variables": ["name", "dob"]},
+        {"variables": ["dob"], "lev_variables": [("name_1", "name_2", 0.8)]},
+        {"variables": ["name"], "age_threshold": True},
+    ]
+    for n_jobs in [1, 2]:
+        result = evaluate_matchkeys(
+            test_1,
+            test_2,
+            truth,
+            matchkeys=matchkeys,
+            suffix_1="_1",
+            suffix_2="_2",
+            person_id="puid",
+            hh_id="hid",
+            level="EA",
+            n_jobs=n_jobs,
+        )
+        pd.testing.assert_frame_equal(intended, result)
+
+
+def test_evaluate_matchkeys_options(data):
+    test_1, test_2, truth = data
+    result = evaluate_matchkeys(
+        test_1,
+        test_2,
+        truth,
+        matchkeys=[{"variables": ["name"], "level": "dob"}],
+        suffix_1="_1",
+        suffix_2="_2",
+        person_id="puid",
+        hh_id="hid",
+        level="EA",
+    )
+    assert result["Pairs"][0] == 4
+    result = evaluate_matchkeys(
+        test_1,
+        test_2,
+        truth.iloc[:0],
+        matchkeys=[{"variables": ["age"]}],
+        suffix_1="_1",
+        suffix_2="_2",
+        person_id="puid",
+        hh_id="hid",
+        level="EA",
+    )
+    assert result["True_Pairs"][0] == 0
+    assert np.isnan(result["Recall"][0])
+
+
+def test_matchkey_grid():
+    intended = [
+        {"variables": ["name"], "age_threshold": None},
+        {"variables": ["name"], "age_threshold": True},
+        {"variables": ["dob"], "age_threshold": None},
+        {"variables": ["dob"], "age_threshold": True},
+    ]
+    result = matchkey_grid(variables=[["name"], ["dob"]], age_threshold=[None, True])
+    assert intended == result
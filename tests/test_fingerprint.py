@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pes_match.fingerprint import (
+    column_fingerprints,
+    file_fingerprint,
+    frame_fingerprint,
+)
+
+
+@pytest.fixture(name="df")
+def setup_fixture():
+    return pd.DataFrame(
+        {
+            "puid": ["A1", "A2", "A3", "A4"],
+            "forename": ["JOHN", None, "PAUL", "JOHN"],
+            "age": [20, 35, 40, 60],
+            "score": [0.5, np.nan, 1.0, 0.25],
+            "forename_list": [["JOHN"], ["MARY", "ANN"], [], ["JOHN"]],
+            "sex": pd.Categorical(["1", "2", "1", "1"]),
+        }
+    )
+
+
+def test_column_fingerprints(df):
+    intended = column_fingerprints(df)
+    assert list(intended) == list(df.columns)
+    assert intended == column_fingerprints(df.copy())
+
+    changed = df.copy()
+    changed.loc[1, "forename"] = "MARY"
+    changed.loc[2, "forename_list"] = ["PAUL"]
+    changed["age"] = changed["age"].astype(np.int32)
+    result = column_fingerprints(changed)
+    assert [col for col in df.columns if intended[col] != result[col]] == [
+        "forename",
+        "age",
+        "forename_list",
+    ]
+    assert column_fingerprints(df, ["age"]) == {"age": intended["age"]}
+
+
+def test_frame_fingerprint(df):
+    assert frame_fingerprint(df) == frame_fingerprint(df.copy())
+    assert frame_fingerprint(df) != frame_fingerprint(df.iloc[::-1])
+    assert frame_fingerprint(df) != frame_fingerprint(df.iloc[:3])
+    assert frame_fingerprint(df) != frame_fingerprint(df.rename(columns={"age": "a"}))
+    assert frame_fingerprint(df, ["puid"]) == frame_fingerprint(df[["puid"]])
+
+
+def test_file_fingerprint(df, tmp_path):
+    df.to_csv(tmp_path / "df.csv", index=False)
+    df.to_csv(tmp_path / "copy.csv", index=False)
+    df.iloc[:3].to_csv(tmp_path / "changed.csv", index=False)
+    intended = file_fingerprint(tmp_path / "df.csv")
+    assert intended == file_fingerprint(tmp_path / "copy.csv", chunk_size=7)
+    assert intended != file_fingerprint(tmp_path / "changed.csv")
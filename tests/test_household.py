@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pes_match.cleaning import derive_list
+from pes_match.household import (
+    build_household_lists,
+    join_household_lists,
+    load_household_lists,
+    merge_household_lists,
+    save_household_lists,
+)
+
+
+@pytest.fixture(name="df")
+def setup_fixture():
+    return pd.DataFrame(
+        {
+            "puid": ["A1", "A2", "A3", "A4", "A5", "A6"],
+            "hid": [2, 1, 2, np.nan, 3, 2],
+            "forename": ["JOHN", "STEVE", np.nan, "SAM", "PAUL", "JAMES"],
+        }
+    )
+
+
+def test_household_lists(df, tmp_path):
+    intended = derive_list(
+        df.copy(), partition_var="hid", list_var="forename", output_col="names"
+    )
+    lists = build_household_lists(
+        df, hh_id="hid", list_var="forename", output_col="names"
+    )
+    assert lists["offsets"].tolist() == [0, 1, 4, 5]
+
+    save_household_lists(lists, str(tmp_path / "lists.npz"))
+    lists = load_household_lists(str(tmp_path / "lists.npz"))
+    records = df[["puid", "hid"]].copy()
+    records["hid"] = records["hid"].map("{:.1f}".format)
+    result = join_household_lists(records, lists, hh_id="hid")
+    pd.testing.assert_series_equal(intended["names"], result["names"])
+    assert result["names"][2] == ["JOHN", np.nan, "JAMES"]
+    assert np.isnan(result["names"][3])
+
+
+def test_merge_household_lists(df):
+    intended = build_household_lists(
+        df, hh_id="hid", list_var="forename", output_col="names"
+    )
+    chunks = [df[:2], df[2:5], df[5:]]
+    result = merge_household_lists(
+        [
+            build_household_lists(
+                chunk, hh_id="hid", list_var="forename", output_col="names"
+            )
+            for chunk in chunks
+        ]
+    )
+    for key in ["name", "keys", "offsets", "values", "missing"]:
+        np.testing.assert_array_equal(intended[key], result[key])
+
+
+def test_household_lists_key_dtypes(df):
+    intended = build_household_lists(
+        df, hh_id="hid", list_var="forename", output_col="names"
+    )
+    assert intended["keys"].tolist() == ["1", "2", "3"]
+    records = df.copy()
+    records["hid"] = df["hid"].map("{:.1f}".format).where(df["hid"].notna())
+    records["hid"] = records["hid"].mask(df["hid"] == 2, "2")
+    result = merge_household_lists(
+        [
+            build_household_lists(
+                chunk, hh_id="hid", list_var="forename", output_col="names"
+            )
+            for chunk in [df[:2], records[2:]]
+        ]
+    )
+    for key in ["name", "keys", "offsets", "values", "missing"]:
+        np.testing.assert_array_equal(intended[key], result[key])
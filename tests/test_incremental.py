@@ -0,0 +1,188 @@
+import pandas as pd
+import pytest
+
+from pes_match.crow import collect_conflicts, collect_uniques
+from pes_match.incremental import (
+    build_matchkey_index,
+    load_matchkey_index,
+    match_delta,
+    save_matchkey_index,
+    update_matches,
+)
+from pes_match.matching import combine, run_single_matchkey
+
+
+@pytest.fixture(name="data")
+def setup_fixture():
+    test_1 = pd.DataFrame(
+        {
+            "puid_1": [1, 2, 3, 4, 5],
+            "EA_1": [1, 1, 1, 2, 2],
+            "name_1": ["JOHN", "JOHN", "STEVE", "SAM", "PAUL"],
+            "dob_1": ["01/2000", "02/2000", "03/1990", "04/1980", "05/1950"],
+            "age_1": [20, 20, 30, 40, 70],
+        }
+    )
+    test_2 = pd.DataFrame(
+        {
+            "puid_2": [21, 22, 23, 24, 25, 26],
+            "EA_2": [1, 1, 1, 2, 2, 1],
+            "name_2": ["JOHN", "STEVE", "STEVE", "SAM", "PAUL", "JOHN"],
+            "dob_2": ["01/2000", "03/1990", "06/1990", "04/1980", "05/1950", "02/2000"],
+            "age_2": [20, 30, 38, 40, 70, 20],
+        }
+    )
+    matchkeys = [
+        {"variables": ["name", "dob"]},
+        {"variables": ["name"], "age_threshold": True},
+    ]
+    return test_1, test_2, matchkeys
+
+
+def run_matchkeys(df1, df2, matchkeys):
+    matches = [
+        run_single_matchkey(
+            df1, df2, suffix_1="_1", suffix_2="_2", hh_id="hid", level="EA", **spec
+        )
+        for spec in matchkeys
+    ]
+    return combine(
+        matches, person_id="puid", suffix_1="_1", suffix_2="_2", keep=["puid"]
+    )
+
+
+def test_incremental(data, tmp_path):
+    test_1, test_2, matchkeys = data
+    index = build_matchkey_index(
+        test_1,
+        suffix_1="_1",
+        suffix_2="_2",
+        hh_id="hid",
+        level="EA",
+        matchkeys=matchkeys,
+    )
+    save_matchkey_index(index, tmp_path / "index.npz")
+    index = load_matchkey_index(tmp_path / "index.npz")
+
+    matches = run_matchkeys(test_1, test_2[:3], matchkeys)
+    delta_matches = match_delta(
+        test_1,
+        test_2[3:],
+        index,
+        suffix_1="_1",
+        suffix_2="_2",
+        hh_id="hid",
+        level="EA",
+        matchkeys=matchkeys,
+    )
+    result = update_matches(
+        matches,
+        delta_matches,
+        person_id="puid",
+        suffix_1="_1",
+        suffix_2="_2",
+        keep=["puid"],
+    )
+    intended = run_matchkeys(test_1, test_2, matchkeys)
+
+    def sort(df):
+        return df.sort_values(["puid_1", "puid_2"]).reset_index(drop=True)
+
+    pd.testing.assert_frame_equal(sort(intended), sort(result))
+    for collect in [collect_conflicts, lambda df, a, b: collect_uniques(df, a, b, "X")]:
+        pd.testing.assert_frame_equal(
+            sort(collect(intended.copy(), "puid_1", "puid_2")),
+            sort(collect(result.copy(), "puid_1", "puid_2")),
+        )
+
+    # New record 26 only adds conflicts
+    uniques = collect_uniques(result.copy(), "puid_1", "puid_2", "X")
+    previous = collect_uniques(matches.copy(), "puid_1", "puid_2", "X")
+    assert set(uniques["puid_2"]) - set(previous["puid_2"]) == {24, 25}
+
+
+def test_incremental_errors(data):
+    test_1, test_2, matchkeys = data
+    with pytest.raises(ValueError):
+        build_matchkey_index(
+            test_1,
+            suffix_1="_1",
+            suffix_2="_2",
+            hh_id="hid",
+            level="associative",
+            matchkeys=matchkeys,
+        )
+    index = build_matchkey_index(
+        test_1,
+        suffix_1="_1",
+        suffix_2="_2",
+        hh_id="hid",
+        level="EA",
+        matchkeys=matchkeys,
+    )
+    with pytest.raises(ValueError):
+        match_delta(
+            test_1[:4],
+            test_2,
+            index,
+            suffix_1="_1",
+            suffix_2="_2",
+            hh_id="hid",
+            level="EA",
+            matchkeys=matchkeys,
+        )
+    matches = run_matchkeys(test_1, test_2, matchkeys)
+    with pytest.raises(ValueError):
+        update_matches(
+            matches,
+            [matches],
+            person_id="puid",
+            suffix_1="_1",
+            suffix_2="_2",
+            keep=["puid"],
+        )
+
+
+def test_incremental_key_dtypes(data):
+    test_1, test_2, matchkeys = data
+    intended = match_delta(
+        test_1,
+        test_2,
+        build_matchkey_index(
+            test_1,
+            suffix_1="_1",
+            suffix_2="_2",
+            hh_id="hid",
+            level="EA",
+            matchkeys=matchkeys,
+        ),
+        suffix_1="_1",
+        suffix_2="_2",
+        hh_id="hid",
+        level="EA",
+        matchkeys=matchkeys,
+    )
+    for dtype_1, dtype_2 in [("float64", "int64"), ("int64", "object")]:
+        df1 = test_1.astype({"EA_1": dtype_1})
+        df2 = test_2.astype({"EA_2": dtype_2})
+        index = build_matchkey_index(
+            df1,
+            suffix_1="_1",
+            suffix_2="_2",
+            hh_id="hid",
+            level="EA",
+            matchkeys=matchkeys,
+        )
+        result = match_delta(
+            df1,
+            df2,
+            index,
+            suffix_1="_1",
+            suffix_2="_2",
+            hh_id="hid",
+            level="EA",
+            matchkeys=matchkeys,
+        )
+        for df, intended_df in zip(result, intended):
+            assert list(df["puid_1"]) == list(intended_df["puid_1"])
+            assert list(df["puid_2"]) == list(intended_df["puid_2"])
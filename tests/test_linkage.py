@@ -0,0 +1,112 @@
+import itertools
+
+import pandas as pd
+import pytest
+
+from pes_match.linkage import link_sources, source_clusters
+from pes_match.matching import combine, run_single_matchkey
+
+
+@pytest.fixture(name="sources")
+def setup_fixture():
+    sources = {}
+    for suffix, ids in [("_cen", [1, 2, 3, 4]), ("_pes", [1, 2, 3]), ("_hlt", [1, 2])]:
+        sources[suffix] = pd.DataFrame(
+            {
+                "puid" + suffix: [f"{suffix[1]}{i}" for i in ids],
+                "EA" + suffix: [1, 1, 2, 2][: len(ids)],
+                "forename" + suffix: ["JOHN", "SAM", "PAUL", None][: len(ids)],
+                "surname" + suffix: ["SMITH", "JONES", "BROWN", "GREEN"][: len(ids)],
+                "age" + suffix: [30, 40, 50, 60][: len(ids)],
+            }
+        )
+    # Forename and surname swapped on the health register
+    sources["_hlt"].loc[1, ["forename_hlt", "surname_hlt"]] = ["JONES", "SAM"]
+    sources["_pes"].loc[2, "forename_pes"] = "PAULL"
+    return sources
+
+
+def test_link_sources(sources):
+    matchkeys = [
+        {"variables": ["forename", "surname"]},
+        {
+            "variables": [],
+            "swap_variables": [("forename", "surname"), ("surname", "forename")],
+        },
+        {
+            "variables": ["surname"],
+            "lev_variables": [("forename", "forename", 0.7)],
+            "age_threshold": True,
+        },
+    ]
+    result = link_sources(
+        sources, matchkeys, person_id="puid", hh_id="hid", level="EA", n_jobs=2
+    )
+    for suffix_1, suffix_2 in itertools.combinations(sources, 2):
+        intended = combine(
+            [
+                run_single_matchkey(
+                    sources[suffix_1],
+                    sources[suffix_2],
+                    suffix_1,
+                    suffix_2,
+                    hh_id="hid",
+                    level="EA",
+                    variables=spec["variables"],
+                    swap_variables=[
+                        (var_1 + suffix_1, var_2 + suffix_2)
+                        for var_1, var_2 in spec.get("swap_variables", [])
+                    ],
+                    lev_variables=[
+                        (var_1 + suffix_1, var_2 + suffix_2, threshold)
+                        for var_1, var_2, threshold in spec.get("lev_variables", [])
+                    ],
+                    age_threshold=spec.get("age_threshold"),
+                )
+                for spec in matchkeys
+            ],
+            person_id="puid",
+            suffix_1=suffix_1,
+            suffix_2=suffix_2,
+            keep=["puid"],
+        )
+        pair = result[
+            (result["Source_1"] == suffix_1) & (result["Source_2"] == suffix_2)
+        ]
+        assert pair["puid_1"].tolist() == intended["puid" + suffix_1].tolist()
+        assert pair["puid_2"].tolist() == intended["puid" + suffix_2].tolist()
+        assert pair["MK"].tolist() == intended["MK"].tolist()
+    assert set(result.loc[result["Source_2"] == "_hlt", "MK"]) == {1, 2}
+
+    with pytest.raises(ValueError):
+        link_sources(
+            sources,
+            [{"variables": ["forename"], "level": "associative"}],
+            person_id="puid",
+            hh_id="hid",
+            level="EA",
+        )
+
+
+def test_source_clusters():
+    matches = pd.DataFrame(
+        {
+            "Source_1": ["_cen", "_cen", "_pes", "_cen"],
+            "puid_1": ["1", "2", "1", "3"],
+            "Source_2": ["_pes", "_hlt", "_hlt", "_pes"],
+            "puid_2": ["1", "1", "3", "3"],
+            "MK": [1, 1, 2, 1],
+        }
+    )
+    result = source_clusters(matches, person_id="puid")
+    intended = pd.DataFrame(
+        {
+            "Source_Dataset": ["_cen", "_pes", "_cen", "_hlt", "_hlt", "_cen", "_pes"],
+            "puid": ["1", "1", "2", "3", "1", "3", "3"],
+            "Cluster_Number": [1, 1, 2, 1, 2, 3, 3],
+        }
+    )
+    intended = intended.sort_values("Cluster_Number", kind="stable").reset_index(
+        drop=True
+    )
+    pd.testing.assert_frame_equal(result, intended)
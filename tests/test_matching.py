@@ -1,8 +1,15 @@
+import numpy as np
 import pandas as pd
 import pytest
+from pes_match.cluster import cluster_number
 from pes_match.matching import (age_diff_filter, age_tolerance, combine,
-                                get_assoc_candidates, get_residuals, mult_match,
-                                run_single_matchkey, std_lev, std_lev_filter)
+                                combine_stream, filter_matches,
+                                get_assoc_candidates, get_residuals,
+                                iter_single_matchkey, mult_match,
+                                plan_matchkeys, run_matchkey_lattice,
+                                run_self_matchkey, run_single_matchkey,
+                                std_lev, std_lev_filter, std_lev_score,
+                                std_lev_sweep)
 
 
 @pytest.fixture(name="df")
@@ -99,6 +106,48 @@ def test_combine():
     pd.testing.assert_frame_equal(intended, result)
 
 
+def test_filter_matches(df):
+    lev_variables = [("name_1", "name_2", 0.5), ("name_2", "name_1", 0.3)]
+    intended = age_diff_filter(
+        std_lev_filter(
+            std_lev_filter(df.copy(), "name_1", "name_2", 0.5),
+            "name_2", "name_1", 0.3,
+        ),
+        "age_1", "age_2",
+    )
+    result = filter_matches(
+        df, suffix_1="_1", suffix_2="_2", lev_variables=lev_variables,
+        age_threshold=True,
+    )
+    pd.testing.assert_frame_equal(intended, result)
+
+    result = filter_matches(
+        df, suffix_1="_1", suffix_2="_2", lev_variables=lev_variables,
+        keep_scores=True,
+    )
+    assert list(result.columns[-2:]) == ["EDIT_name_1", "EDIT_name_2"]
+    assert list(result["puid_1"]) == [1, 2, 3, 5]
+
+
+def test_filter_matches_no_pairs_left(df):
+    # The age filter removes every pair before the edit distance filters
+    df = df.assign(age_2=df["age_1"] + 30)
+    lev_variables = [("name_1", "name_2", 0.5), ("name_2", "name_1", 0.3)]
+    result = filter_matches(
+        df, suffix_1="_1", suffix_2="_2", lev_variables=lev_variables,
+        age_threshold=True, keep_scores=True,
+    )
+    assert result.empty
+    assert list(result.columns) == list(df.columns) + ["EDIT_name_1", "EDIT_name_2"]
+
+    # An edit distance filter removes every pair before the next one
+    result = filter_matches(
+        df, suffix_1="_1", suffix_2="_2",
+        lev_variables=[("name_1", "name_2", 1.1), ("name_2", "name_1", 0.3)],
+    )
+    assert result.empty
+
+
 def test_get_assoc_candidates():
     intended_1 = pd.DataFrame(
         {
@@ -184,6 +233,78 @@ def test_mult_match():
     pd.testing.assert_frame_equal(intended, result)
 
 
+@pytest.fixture(name="lattice_data")
+def setup_lattice_fixture():
+    test_1 = pd.DataFrame(
+        {
+            "puid_1": [1, 2, 3, 4, 5],
+            "EA_1": [1, 1, 1, 2, 2],
+            "name_1": ["JOHN", "JOHN", "STEVE", "SAM", "PAUL"],
+            "dob_1": ["01/2000", "02/2000", "03/1990", "04/1980", "05/1950"],
+            "year_1": ["2000", "2000", "1990", "1980", "1950"],
+            "age_1": [20, 20, 30, 40, 70],
+        }
+    )
+    test_2 = pd.DataFrame(
+        {
+            "puid_2": [21, 22, 23, 24, 25],
+            "EA_2": [1, 1, 1, 2, 2],
+            "name_2": ["JOHN", "STEVE", "STEVE", "SAM", "PAUL"],
+            "dob_2": ["01/2000", "03/1990", "06/1990", "04/1980", "05/1950"],
+            "year_2": ["2000", "1990", "1990", "1980", "1950"],
+            "age_2": [20, 30, 38, 40, 70],
+        }
+    )
+    matchkeys = [
+        {"variables": ["name", "dob"]},
+        {"variables": ["name", "year"], "age_threshold": True},
+        {"variables": ["dob"], "lev_variables": [("name_1", "name_2", 0.5)]},
+    ]
+    return test_1, test_2, matchkeys
+
+
+def test_plan_matchkeys(lattice_data):
+    test_1, test_2, matchkeys = lattice_data
+    result = plan_matchkeys(
+        test_1, test_2, suffix_1="_1", suffix_2="_2", hh_id="hhid",
+        level="EA", matchkeys=matchkeys,
+    )
+    assert [group["matchkeys"] for group in result] == [[0, 1, 2]]
+    assert result[0]["block"] == [("EA_1", "EA_2")]
+    assert result[0]["candidates"] == 13
+
+    result = plan_matchkeys(
+        test_1, test_2, suffix_1="_1", suffix_2="_2", hh_id="hhid",
+        level="EA", matchkeys=matchkeys, max_candidates=10,
+    )
+    assert [group["matchkeys"] for group in result] == [[0, 1], [2]]
+    assert result[0]["block"] == [("name_1", "name_2"), ("EA_1", "EA_2")]
+    assert result[0]["candidates"] == 6
+
+    result = plan_matchkeys(
+        test_1, test_2, suffix_1="_1", suffix_2="_2", hh_id="hhid",
+        level="EA", matchkeys=matchkeys, max_candidates=5,
+    )
+    assert [group["matchkeys"] for group in result] == [[0, 2], [1]]
+
+
+def test_run_matchkey_lattice(lattice_data):
+    test_1, test_2, matchkeys = lattice_data
+    result = run_matchkey_lattice(
+        test_1, test_2, suffix_1="_1", suffix_2="_2", hh_id="hhid",
+        level="EA", matchkeys=matchkeys,
+    )
+    for spec, matches in zip(matchkeys, result):
+        intended = run_single_matchkey(
+            test_1, test_2, suffix_1="_1", suffix_2="_2", hh_id="hhid",
+            level="EA", **spec,
+        )
+        pd.testing.assert_frame_equal(
+            intended.sort_values(["puid_1", "puid_2"]).reset_index(drop=True),
+            matches.sort_values(["puid_1", "puid_2"]).reset_index(drop=True),
+        )
+
+
 def test_run_single_matchkey():
     intended = pd.DataFrame(
         {
@@ -259,3 +380,318 @@ def test_std_lev_filter(df):
     )
     result = std_lev_filter(df, column1="name_1", column2="name_2", threshold=0.7)
     pd.testing.assert_frame_equal(intended, result)
+
+
+def test_combine_flags():
+    intended = pd.DataFrame(
+        {
+            "puid_1": [1, 2, 3, 4, 3, 6],
+            "puid_2": [21, 22, 23, 24, 30, 31],
+            "MK": [1, 1, 1, 2, 2, 3],
+            "MK_Flags": np.array([7, 1, 3, 2, 6, 4], dtype=np.uint32),
+        }
+    )
+    test_1 = pd.DataFrame({"puid_1": [1, 2, 3], "puid_2": [21, 22, 23]})
+    test_2 = pd.DataFrame({"puid_1": [1, 3, 4, 3], "puid_2": [21, 23, 24, 30]})
+    test_3 = pd.DataFrame({"puid_1": [1, 3, 6], "puid_2": [21, 30, 31]})
+    result = combine(
+        matchkeys=[test_1, test_2, test_3],
+        suffix_1="_1",
+        suffix_2="_2",
+        person_id="puid",
+        keep=["puid"],
+        flags=True,
+    )
+    pd.testing.assert_frame_equal(intended, result)
+
+
+def test_combine_flags_no_matchkeys():
+    result = combine(
+        matchkeys=[],
+        suffix_1="_1",
+        suffix_2="_2",
+        person_id="puid",
+        keep=["puid"],
+        flags=True,
+    )
+    assert result.empty
+
+
+def test_std_lev_filter_score_column(df):
+    result = std_lev_filter(
+        df, column1="name_1", column2="name_2", threshold=0.7, score_column="EDIT"
+    )
+    assert result["EDIT"].dtype == np.float32
+    np.testing.assert_allclose(result["EDIT"], [0.7142857, 1.0], rtol=1e-6)
+
+
+def test_std_lev_filter_empty(df):
+    empty = df[:0]
+    result = std_lev_filter(
+        empty, column1="name_1", column2="name_2", threshold=0.7, score_column="EDIT"
+    )
+    assert result.empty
+    assert list(result.columns) == list(df.columns) + ["EDIT"]
+    result = std_lev_score(empty, column1="name_1", column2="name_2", output_col="lev")
+    assert result["lev"].dtype == np.float32
+
+    # No candidate pairs from the matchkey join
+    test_1 = pd.DataFrame({"puid_1": [1], "EA_1": [1], "name_1": ["JON"]})
+    test_2 = pd.DataFrame({"puid_2": [21], "EA_2": [2], "name_2": ["JOHN"]})
+    result = run_single_matchkey(
+        test_1, test_2, suffix_1="_1", suffix_2="_2", hh_id="hhid", level="EA",
+        variables=[], lev_variables=[("name_1", "name_2", 0.5)], keep_scores=True,
+    )
+    assert result.empty
+    assert "EDIT_name_1" in result.columns
+
+
+def test_std_lev_score(df):
+    result = std_lev_score(df, column1="name_1", column2="name_2", output_col="lev")
+    assert result["lev"].dtype == np.float32
+    np.testing.assert_allclose(
+        result["lev"], [0.7142857, 0.5714286, 0.5714286, 0.3333333, 1.0], rtol=1e-6
+    )
+
+
+def test_std_lev_sweep(df):
+    df = std_lev_score(df, column1="name_1", column2="name_2", output_col="lev_1")
+    df = std_lev_score(df, column1="name_2", column2="name_2", output_col="lev_2")
+    intended = pd.DataFrame({"Threshold": [0.0, 0.5, 0.7, 1.0], "Pairs": [5, 4, 2, 1]})
+    counts, views = std_lev_sweep(
+        df, score_columns=["lev_1", "lev_2"], thresholds=[0.0, 0.5, 0.7, 1.0]
+    )
+    pd.testing.assert_frame_equal(intended, counts)
+    assert list(views[0.5]["puid_1"]) == [1, 2, 3, 5]
+    pd.testing.assert_frame_equal(
+        std_lev_filter(df, column1="name_1", column2="name_2", threshold=0.7),
+        views[0.7].reset_index(drop=True),
+    )
+
+    counts, views = std_lev_sweep(
+        df, score_columns=["lev_1", "lev_2"], thresholds=[(0.5, 1.0), (0.5, 1.1)]
+    )
+    assert list(counts["Pairs"]) == [4, 0]
+
+
+def test_std_lev_sweep_agrees_with_filter():
+    df = pd.DataFrame(
+        {
+            "name_1": ["ABCDEFGHIJ", "ABCDEFGXYZ", "ABCDEFGHXY", "ABCXYZ"],
+            "name_2": ["ABCDEFGHIJ", "ABCDEFGHIJ", "ABCDEFGHIJ", "ABCDEF"],
+        }
+    )
+    df = std_lev_score(df, column1="name_1", column2="name_2", output_col="lev")
+    thresholds = [0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0]
+    _, views = std_lev_sweep(df, score_columns="lev", thresholds=thresholds)
+    for threshold in thresholds:
+        intended = std_lev_filter(
+            df.drop(columns="lev"), column1="name_1", column2="name_2",
+            threshold=threshold,
+        )
+        pd.testing.assert_frame_equal(
+            intended, views[threshold].drop(columns="lev").reset_index(drop=True)
+        )
+
+    df["lev"] = df["lev"].astype(np.float64).round(1)
+    counts, _ = std_lev_sweep(df, score_columns="lev", thresholds=[0.7, 0.7 + 1e-9])
+    assert list(counts["Pairs"]) == [3, 2]
+
+
+def test_run_single_matchkey_keep_scores():
+    test_1 = pd.DataFrame({"puid_1": [1, 2], "EA_1": [1, 1], "name_1": ["JON", "X"]})
+    test_2 = pd.DataFrame({"puid_2": [21], "EA_2": [1], "name_2": ["JOHN"]})
+    result = run_single_matchkey(
+        test_1, test_2, suffix_1="_1", suffix_2="_2", hh_id="hhid", level="EA",
+        variables=[], lev_variables=[("name_1", "name_2", 0.5)], keep_scores=True,
+    )
+    assert list(result["puid_1"]) == [1]
+    np.testing.assert_allclose(result["EDIT_name_1"], [0.75])
+
+
+def test_run_single_matchkey_symmetric_swap():
+    test_1 = pd.DataFrame(
+        {
+            "puid_1": [1, 2, 3, 4],
+            "EA_1": [1, 1, 1, 2],
+            "forename_1": ["JOHN", "SMITH", "ANN", "JOHN"],
+            "surname_1": ["SMITH", "JOHN", "ANN", "SMITH"],
+        }
+    )
+    test_2 = pd.DataFrame(
+        {
+            "puid_2": [21, 22, 23],
+            "EA_2": [1, 1, 2],
+            "forename_2": ["JOHN", "ANN", "SMITH"],
+            "surname_2": ["SMITH", "ANN", "JOHN"],
+        }
+    )
+    swap_variables = [("forename_1", "surname_2"), ("surname_1", "forename_2")]
+    result = run_single_matchkey(
+        test_1, test_2, suffix_1="_1", suffix_2="_2", hh_id="hhid", level="EA",
+        variables=[], swap_variables=swap_variables, symmetric_swap=True,
+    )
+    assert list(zip(result["puid_1"], result["puid_2"], result["Orientation"])) == [
+        (1, 21, "normal"),
+        (2, 21, "swapped"),
+        (3, 22, "both"),
+        (4, 23, "swapped"),
+    ]
+
+    # Same pairs as separate normal and swapped runs
+    normal = run_single_matchkey(
+        test_1, test_2, suffix_1="_1", suffix_2="_2", hh_id="hhid", level="EA",
+        variables=["forename", "surname"],
+    )
+    swapped = run_single_matchkey(
+        test_1, test_2, suffix_1="_1", suffix_2="_2", hh_id="hhid", level="EA",
+        variables=[], swap_variables=swap_variables,
+    )
+    pd.testing.assert_frame_equal(
+        result.drop("Orientation", axis=1),
+        pd.concat([normal, swapped])
+        .drop_duplicates()
+        .sort_values(["puid_1", "puid_2"])
+        .reset_index(drop=True),
+    )
+
+
+def test_run_single_matchkey_symmetric_swap_keys():
+    test_1 = pd.DataFrame(
+        {
+            "puid_1": [1, 2, 3],
+            "EA_1": [1, 1, 1],
+            "forename_1": ["JOHN", "JOHN", "ANN"],
+            "surname_1": ["JOHN", "SMITH", "JOHN"],
+        }
+    )
+    test_2 = pd.DataFrame(
+        {
+            "puid_2": [21, 22],
+            "EA_2": [1, 1],
+            "forename_2": ["JOHN", "ANN"],
+            "surname_2": ["JOHN", "JOHN"],
+        }
+    )
+    # forename is both a plain key and a swap variable
+    swap_variables = [("forename_1", "surname_2")]
+    result = run_single_matchkey(
+        test_1, test_2, suffix_1="_1", suffix_2="_2", hh_id="hhid", level="EA",
+        variables=["forename"], swap_variables=swap_variables, symmetric_swap=True,
+    )
+    normal = run_single_matchkey(
+        test_1, test_2, suffix_1="_1", suffix_2="_2", hh_id="hhid", level="EA",
+        variables=["forename"],
+    )
+    swapped = run_single_matchkey(
+        test_1, test_2, suffix_1="_1", suffix_2="_2", hh_id="hhid", level="EA",
+        variables=["forename"], swap_variables=swap_variables,
+    )
+    pd.testing.assert_frame_equal(
+        result.drop("Orientation", axis=1),
+        pd.concat([normal, swapped])
+        .drop_duplicates()
+        .sort_values(["puid_1", "puid_2"])
+        .reset_index(drop=True),
+    )
+
+    with pytest.raises(ValueError):
+        run_single_matchkey(
+            test_1, test_2, suffix_1="_1", suffix_2="_2", hh_id="hhid", level="EA",
+            variables=["forename"], symmetric_swap=True,
+        )
+    with pytest.raises(ValueError):
+        run_single_matchkey(
+            test_1, test_2, suffix_1="_1", suffix_2="_2", hh_id="hhid", level="EA",
+            variables=[], swap_variables=[("forename_1", "surname_1")],
+            symmetric_swap=True,
+        )
+
+
+def test_iter_single_matchkey(lattice_data):
+    test_1, test_2, _ = lattice_data
+    intended = run_single_matchkey(
+        test_1, test_2, suffix_1="_1", suffix_2="_2", hh_id="hhid", level="EA",
+        variables=["name"], age_threshold=True,
+    )
+    for chunk_size in [1, 2, 100]:
+        chunks = list(
+            iter_single_matchkey(
+                test_1, test_2, suffix_1="_1", suffix_2="_2", hh_id="hhid",
+                level="EA", variables=["name"], age_threshold=True,
+                chunk_size=chunk_size,
+            )
+        )
+        pd.testing.assert_frame_equal(
+            intended.sort_values(["puid_1", "puid_2"]).reset_index(drop=True),
+            pd.concat(chunks).sort_values(["puid_1", "puid_2"]).reset_index(drop=True),
+        )
+    assert len(chunks) == 1
+
+
+def test_combine_stream():
+    test_1 = pd.DataFrame({"puid_1": [1, 2, 3], "puid_2": [21, 22, 23]})
+    test_2 = pd.DataFrame({"puid_1": [1, 3, 4, 3], "puid_2": [21, 23, 24, 30]})
+    test_3 = pd.DataFrame({"puid_1": [1, 3, 6], "puid_2": [21, 30, 31]})
+    intended = combine(
+        matchkeys=[test_1.copy(), test_2.copy(), test_3.copy()],
+        suffix_1="_1",
+        suffix_2="_2",
+        person_id="puid",
+        keep=["puid"],
+    )
+    chunks = list(
+        combine_stream(
+            matchkeys=[[test_1[:1], test_1[1:]], [test_2[:2], test_2[2:]], [test_3]],
+            suffix_1="_1",
+            suffix_2="_2",
+            person_id="puid",
+            keep=["puid"],
+        )
+    )
+    assert [len(chunk) for chunk in chunks] == [1, 2, 2, 1]
+    pd.testing.assert_frame_equal(intended, pd.concat(chunks, ignore_index=True))
+
+
+def test_run_self_matchkey():
+    test = pd.DataFrame(
+        {
+            "puid_cen": ["C1", "C2", "C3", "C4", "C5"],
+            "Eaid_cen": [1, 1, 1, 1, 2],
+            "name_cen": ["JOHN", "JOHN", "JON", "JOHN", "JOHN"],
+            "age_cen": [20, 21, 20, 60, 20],
+        }
+    )
+    intended = pd.DataFrame(
+        {
+            "puid_cen_1": ["C1", "C1", "C2"],
+            "Eaid_cen_1": [1, 1, 1],
+            "name_cen_1": ["JOHN", "JOHN", "JOHN"],
+            "age_cen_1": [20, 20, 21],
+            "puid_cen_2": ["C2", "C3", "C3"],
+            "Eaid_cen_2": [1, 1, 1],
+            "name_cen_2": ["JOHN", "JON", "JON"],
+            "age_cen_2": [21, 20, 20],
+        }
+    )
+    result = run_self_matchkey(
+        test, suffix="_cen", level="Eaid", variables=[],
+        lev_variables=[("name_cen_1", "name_cen_2", 0.7)], age_threshold=True,
+    )
+    pd.testing.assert_frame_equal(intended, result)
+
+    # Duplicates are clustered from the combined pairs
+    matches = combine(
+        matchkeys=[result],
+        suffix_1="_cen_1",
+        suffix_2="_cen_2",
+        person_id="puid",
+        keep=["puid"],
+    )
+    clusters = cluster_number(
+        matches, id_column="puid", suffix_1="_cen_1", suffix_2="_cen_2"
+    )
+    assert clusters["Cluster_Number"].nunique() == 1
+
+    with pytest.raises(ValueError):
+        run_self_matchkey(test, suffix="_cen", level="associative", variables=[])
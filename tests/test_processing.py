@@ -0,0 +1,150 @@
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pes_match.cleaning import clean_name, concat, derive_list, n_gram, replace_vals
+from pes_match.processing import (
+    cleaning_step,
+    plan_cleaning,
+    read_partitions,
+    run_cleaning,
+    stream_cleaning,
+    write_partitions,
+)
+
+
+@pytest.fixture(name="df")
+def setup_fixture():
+    return pd.DataFrame(
+        {
+            "hid": [1, 1, 2, 3],
+            "forename": ["Charlie!", "  rachel ", None, "James"],
+            "last_name": ["Tomlin", None, "Smith", "Brown-Jones"],
+        }
+    )
+
+
+@pytest.fixture(name="steps")
+def setup_steps():
+    names = ["forename_clean", "last_name_clean"]
+    return [
+        cleaning_step(clean_name, "forename", "forename_clean", name_column="forename"),
+        cleaning_step(
+            clean_name, "last_name", "last_name_clean", name_column="last_name"
+        ),
+        cleaning_step(
+            concat, names, "fullname", columns=names, output_col="fullname", sep=" "
+        ),
+        cleaning_step(replace_vals, names, names, dic={"-9": np.NaN}, subset=names),
+        cleaning_step(
+            derive_list,
+            ["hid", "forename_clean"],
+            "forename_list",
+            partition_var="hid",
+            list_var="forename_clean",
+            output_col="forename_list",
+        ),
+        cleaning_step(
+            n_gram,
+            "forename_clean",
+            "forename_init",
+            input_col="forename_clean",
+            output_col="forename_init",
+            missing_value="-9",
+            n=1,
+        ),
+    ]
+
+
+def test_plan_cleaning(steps):
+    plan = plan_cleaning(
+        steps, columns=["forename_init"], available=["hid", "forename", "last_name"]
+    )
+    assert plan["waves"] == [[0, 1], [3], [5]]
+    assert plan["sources"][5] == {"forename_clean": 3}
+    assert plan["sources"][3] == {"forename_clean": 0, "last_name_clean": 1}
+
+    with pytest.raises(ValueError):
+        plan_cleaning(steps, columns=["forename_init"], available=["forename"])
+    with pytest.raises(ValueError):
+        plan_cleaning(
+            steps, columns=["sex"], available=["hid", "forename", "last_name"]
+        )
+
+
+def test_run_cleaning(df, steps):
+    intended = df.copy()
+    for step in steps:
+        intended = step["function"](intended, **step["kwargs"])
+    columns = ["hid", "forename_clean", "fullname", "forename_list", "forename_init"]
+    timings = {}
+    start = time.perf_counter()
+    result = run_cleaning(df, steps, columns=columns, timings=timings)
+    elapsed = time.perf_counter() - start
+    pd.testing.assert_frame_equal(intended[columns], result)
+    # Steps run one at a time, so their times do not overlap
+    functions = ["clean_name", "concat", "derive_list", "n_gram", "replace_vals"]
+    assert sorted(timings) == functions
+    assert sum(timings.values()) <= elapsed
+    # Raw data is unchanged
+    assert df["forename"].tolist() == ["Charlie!", "  rachel ", None, "James"]
+
+
+def test_stream_cleaning(df, steps, tmp_path):
+    df["Eaid"] = ["A1", "A1", "B/1", "A2"]
+    df.to_csv(tmp_path / "raw.csv", index=False)
+    columns = ["hid", "Eaid", "forename_clean", "fullname", "forename_init"]
+    intended = run_cleaning(df, steps, columns=columns)
+
+    chunks = stream_cleaning(
+        tmp_path / "raw.csv",
+        steps,
+        columns=columns,
+        chunksize=3,
+        dtype={"forename": str, "last_name": str},
+    )
+    for i, chunk in enumerate(chunks):
+        write_partitions(
+            chunk, tmp_path / "clean", partition_cols=["Eaid"], name=f"part-{i}"
+        )
+    assert sorted(p.name for p in (tmp_path / "clean").iterdir()) == [
+        "Eaid=A1",
+        "Eaid=A2",
+        "Eaid=B%2F1",
+    ]
+    result = read_partitions(tmp_path / "clean", dtype=str).astype({"hid": int})
+    pd.testing.assert_frame_equal(
+        intended.sort_values("hid", ignore_index=True),
+        result.sort_values("hid", ignore_index=True),
+    )
+
+
+def test_stream_cleaning_processes(df, steps, tmp_path):
+    df = pd.concat([df, df.assign(hid=df["hid"] + 3)], ignore_index=True)
+    df.to_csv(tmp_path / "raw.csv", index=False)
+    columns = ["hid", "forename_clean", "forename_list", "forename_init"]
+    intended = run_cleaning(df, steps, columns=columns)
+
+    # Households are not split, so household lists match the full data
+    timings = {}
+    chunks = stream_cleaning(
+        tmp_path / "raw.csv",
+        steps,
+        columns=columns,
+        chunksize=3,
+        hh_id="hid",
+        processes=2,
+        timings=timings,
+        dtype={"forename": str, "last_name": str},
+    )
+    chunks = list(chunks)
+    assert [chunk["hid"].tolist() for chunk in chunks] == [
+        [1, 1],
+        [2, 3],
+        [4, 4, 5],
+        [6],
+    ]
+    pd.testing.assert_frame_equal(intended, pd.concat(chunks))
+    assert sorted(timings) == ["clean_name", "derive_list", "n_gram", "replace_vals"]
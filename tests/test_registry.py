@@ -0,0 +1,117 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pes_match.matching import get_residuals
+from pes_match.registry import (
+    create_registry,
+    load_registry,
+    registry_mask,
+    registry_residuals,
+    save_registry,
+    update_registry,
+)
+
+
+@pytest.fixture(name="data")
+def setup_fixture():
+    records = pd.DataFrame(
+        {
+            "puid_1": ["A1", "A2", "A3", "A4", "A5"],
+            "name_1": ["JOHN", "STEVE", "SAM", "PAUL", "JANE"],
+        }
+    )
+    stage_1 = pd.DataFrame(
+        {
+            "puid_1": ["A1", "A3", "A3"],
+            "puid_2": ["B1", "B3", "B4"],
+            "Match_Type": [
+                "Stage_1_Matchkeys",
+                "Stage_1_Conflicts",
+                "Stage_1_Conflicts",
+            ],
+            "CLERICAL": [0, 1, 1],
+        }
+    )
+    stage_2 = pd.DataFrame(
+        {
+            "puid_1": ["A4"],
+            "puid_2": ["B5"],
+            "Match_Type": ["Stage_2_Matchkeys"],
+            "CLERICAL": [0],
+        }
+    )
+    registry = update_registry(
+        create_registry(records["puid_1"]), stage_1, "puid_1", stage="Stage_1"
+    )
+    registry = update_registry(registry, stage_2, "puid_1", stage="Stage_2")
+    return records, stage_1, stage_2, registry
+
+
+def test_update_registry(data):
+    _, stage_1, _, registry = data
+    assert registry["stages"] == ["Stage_1", "Stage_2"]
+    np.testing.assert_array_equal(registry["stage"], [1, 0, 1, 2, 0])
+    np.testing.assert_array_equal(registry["match_type"], [1, 0, 2, 4, 0])
+    np.testing.assert_array_equal(
+        registry["clerical"], [False, False, True, False, False]
+    )
+
+    # Original registry is not changed by updates
+    empty = create_registry(["A1", "A2"])
+    update_registry(empty, stage_1.iloc[:1], "puid_1", stage="Stage_1")
+    assert empty["stages"] == []
+    assert not empty["stage"].any()
+
+    with pytest.raises(ValueError):
+        update_registry(empty, stage_1, "puid_1", stage="Stage_1")
+
+
+def test_registry_mask(data):
+    records, _, _, registry = data
+    np.testing.assert_array_equal(
+        registry_mask(records, registry, "puid_1"), [True, False, True, True, False]
+    )
+    np.testing.assert_array_equal(
+        registry_mask(records, registry, "puid_1", stages=["Stage_2"]),
+        [False, False, False, True, False],
+    )
+    np.testing.assert_array_equal(
+        registry_mask(records, registry, "puid_1", match_types=["Stage_1_Conflicts"]),
+        [False, False, True, False, False],
+    )
+
+    # IDs not in the registry are unmatched
+    new_records = pd.DataFrame({"puid_1": ["A9", "A1"]})
+    np.testing.assert_array_equal(
+        registry_mask(new_records, registry, "puid_1"), [False, True]
+    )
+
+    with pytest.raises(ValueError):
+        registry_mask(records, registry, "puid_1", stages=["Stage_3"])
+
+
+def test_registry_residuals(data):
+    records, stage_1, stage_2, registry = data
+    pd.testing.assert_frame_equal(
+        registry_residuals(records, registry, "puid_1", stages=["Stage_1"]),
+        get_residuals(records, stage_1, "puid_1"),
+    )
+    pd.testing.assert_frame_equal(
+        registry_residuals(records, registry, "puid_1"),
+        get_residuals(records, pd.concat([stage_1, stage_2]), "puid_1"),
+    )
+
+
+def test_save_registry(data, tmp_path):
+    records, _, _, registry = data
+    save_registry(registry, tmp_path / "registry.npz")
+    loaded = load_registry(tmp_path / "registry.npz")
+    assert loaded["stages"] == registry["stages"]
+    assert loaded["match_types"] == registry["match_types"]
+    for key in ["ids", "stage", "match_type", "clerical"]:
+        np.testing.assert_array_equal(loaded[key], registry[key])
+    np.testing.assert_array_equal(
+        registry_mask(records, loaded, "puid_1"),
+        registry_mask(records, registry, "puid_1"),
+    )
@@ -0,0 +1,68 @@
+import pandas as pd
+import pytest
+
+from pes_match.crow import collect_conflicts, collect_uniques
+from pes_match.matching import combine
+from pes_match.store import (
+    create_store,
+    merge_store,
+    store_conflicts,
+    store_matches,
+    store_uniques,
+)
+
+
+@pytest.fixture(name="matchkeys")
+def setup_fixture():
+    mk1 = pd.DataFrame(
+        {"puid_1": ["A1", "A2", "A3", "A5"], "puid_2": ["B1", "B2", "B2", "B6"]}
+    )
+    mk2 = pd.DataFrame(
+        {"puid_1": ["A1", "A4", "A5", "A6"], "puid_2": ["B1", "B4", "B5", "B6"]}
+    )
+    mk3 = pd.DataFrame({"puid_1": ["A7", "A2"], "puid_2": ["B7", "B2"]})
+    return [mk1, mk2, mk3]
+
+
+@pytest.mark.parametrize("memory_limit", [1, 50, 1000000])
+def test_store(matchkeys, tmp_path, memory_limit):
+    store = create_store(
+        [f"A{i}" for i in range(1, 8)],
+        [f"B{i}" for i in range(1, 8)],
+        path=str(tmp_path),
+        memory_limit=memory_limit,
+    )
+    for i, matches in enumerate(matchkeys):
+        store_matches(store, matches, id_1="puid_1", id_2="puid_2", mk=i + 1)
+    merge_store(store, batch_size=2)
+
+    combined = combine(
+        [matches.copy() for matches in matchkeys],
+        person_id="puid",
+        suffix_1="_1",
+        suffix_2="_2",
+        keep=["puid"],
+    )
+    intended = collect_uniques(combined.copy(), "puid_1", "puid_2", "Matchkeys")
+    result = store_uniques(store, "puid_1", "puid_2", match_type="Matchkeys")
+    pd.testing.assert_frame_equal(intended, result)
+
+    intended = collect_conflicts(combined.copy(), "puid_1", "puid_2")
+    result = store_conflicts(store, "puid_1", "puid_2")
+    pd.testing.assert_frame_equal(
+        intended.sort_values(["puid_1", "puid_2"]).reset_index(drop=True), result
+    )
+
+
+def test_store_errors(matchkeys, tmp_path):
+    store = create_store(["A1"], ["B1"], path=str(tmp_path))
+    with pytest.raises(ValueError):
+        store_matches(store, matchkeys[0], id_1="puid_1", id_2="puid_2", mk=1)
+    with pytest.raises(ValueError):
+        store_matches(store, matchkeys[0][:1], id_1="puid_1", id_2="puid_2", mk=0)
+    store_matches(store, matchkeys[0][:1], id_1="puid_1", id_2="puid_2", mk=1)
+    with pytest.raises(ValueError):
+        store_uniques(store, "puid_1", "puid_2", match_type="Matchkeys")
+    merge_store(store)
+    assert store_uniques(store, "puid_1", "puid_2", "Matchkeys")["MK"].tolist() == [1]
+    assert len(store_conflicts(store, "puid_1", "puid_2")) == 0